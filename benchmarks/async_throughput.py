@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+# -*- coding: utf-8
+"""
+Throughput of the async soft delete API under concurrent requests, compared to
+wrapping the sync methods with sync_to_async() like views had to before.
+
+    python benchmarks/async_throughput.py --rows 2000 --concurrency 50
+"""
+from __future__ import unicode_literals, absolute_import
+
+import argparse
+import asyncio
+import tempfile
+import time
+
+from common import setup_django
+
+
+async def run(name, operation, pks, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def request(pk):
+        async with semaphore:
+            await operation(pk)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(request(pk) for pk in pks))
+    elapsed = time.perf_counter() - started
+    print("%-32s %8.0f requests/s" % (name, len(pks) / elapsed))
+
+
+async def main(rows, concurrency):
+    from asgiref.sync import sync_to_async
+    from django.db.models.signals import post_delete
+    from test_app.models import Author
+
+    await Author.data.abulk_create(
+        [Author(name="author %s" % i) for i in range(rows)]
+    )
+    pks = [pk async for pk in Author.data.values_list("pk", flat=True)]
+
+    async def queryset_sync(pk):
+        await sync_to_async(Author.data.filter(pk=pk).delete)()
+
+    async def queryset_async(pk):
+        await Author.data.filter(pk=pk).adelete()
+
+    async def instance_sync(pk):
+        author = await Author.data.aget(pk=pk)
+        await sync_to_async(author.undelete)()
+
+    async def instance_async(pk):
+        author = await Author.data.aget(pk=pk)
+        await author.aundelete()
+
+    await run("sync_to_async(qs.delete)", queryset_sync, pks, concurrency)
+    await run("sync_to_async(obj.undelete)", instance_sync, pks, concurrency)
+    await run("qs.adelete()", queryset_async, pks, concurrency)
+    await run("obj.aundelete()", instance_async, pks, concurrency)
+
+    async def receiver(sender, instance, **kwargs):
+        await asyncio.sleep(0.001)
+
+    # sync delete() has to run async receivers with async_to_sync
+    post_delete.connect(receiver, sender=Author)
+    await Author.data.deleted().aundelete()
+    await run("sync_to_async(qs.delete) + rcv", queryset_sync, pks, concurrency)
+    await Author.data.deleted().aundelete()
+    await run("qs.adelete() + rcv", queryset_async, pks, concurrency)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.NamedTemporaryFile(suffix=".sqlite3") as db:
+        setup_django(db.name)
+        asyncio.run(main(args.rows, args.concurrency))
@@ -0,0 +1,26 @@
+# -*- coding: utf-8
+"""
+Helpers shared by the benchmark scripts - they run on a temporary SQLite file
+with the models of test_app and need nothing else.
+"""
+from __future__ import unicode_literals, absolute_import
+
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "tests.settings")
+
+
+def setup_django(path):
+    import django
+    from django.conf import settings
+    from django.core.management import call_command
+
+    # a file, so every thread sees the same database
+    settings.DATABASES["default"]["NAME"] = path
+    settings.DEBUG = False
+    settings.SILENCED_SYSTEM_CHECKS = ["models.W042"]
+    django.setup()
+    call_command("migrate", run_syncdb=True, verbosity=0)
@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+# -*- coding: utf-8
+"""
+Startup cost of the package: the time django.setup() and the import take in a
+fresh interpreter, and whether django.contrib.auth got loaded along.
+"models" is what a project only using BaseModel pays, "users" also imports
+the user model - which every import of django_undeletable.models cost before
+the package was split up.
+
+    python benchmarks/import_time.py --runs 20
+"""
+from __future__ import unicode_literals, absolute_import
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+from common import ROOT
+
+SCENARIOS = {
+    "models": (["django_undeletable"], "django_undeletable.models"),
+    "users": (
+        ["django.contrib.auth", "django.contrib.contenttypes", "django_undeletable"],
+        "django_undeletable.users",
+    ),
+}
+
+CODE = """
+import json, sys, time
+started = time.perf_counter()
+import django
+from django.conf import settings
+settings.configure(INSTALLED_APPS=%r, USE_TZ=True)
+django.setup()
+import %s
+elapsed = time.perf_counter() - started
+print(json.dumps({
+    "ms": elapsed * 1000,
+    "modules": len(sys.modules),
+    "auth": "django.contrib.auth.models" in sys.modules,
+}))
+"""
+
+
+def measure(apps, module):
+    output = subprocess.check_output(
+        [sys.executable, "-c", CODE % (apps, module)], cwd=ROOT
+    )
+    return json.loads(output.decode())
+
+
+def main(runs):
+    for name, (apps, module) in SCENARIOS.items():
+        results = [measure(apps, module) for _ in range(runs)]
+        print(
+            "%-8s %8.1f ms  %5d modules  auth: %s"
+            % (
+                name,
+                statistics.median(result["ms"] for result in results),
+                results[0]["modules"],
+                results[0]["auth"],
+            )
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    main(parser.parse_args().runs)
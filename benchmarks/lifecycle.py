@@ -0,0 +1,227 @@
+#!/usr/bin/env python
+# -*- coding: utf-8
+"""
+Time the soft delete lifecycle on datasets of different sizes and write the
+results as JSON, so runs against different versions can be compared.
+
+    python benchmarks/lifecycle.py --sizes 10000 100000 1000000 --output results.json
+    python benchmarks/lifecycle.py --compare results.json
+
+Every size seeds that many authors and books (half of them already deleted,
+each book with a co author), a tenth as many cover books and users.
+"""
+from __future__ import unicode_literals, absolute_import
+
+import argparse
+import json
+import platform
+import sqlite3
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+from common import setup_django
+
+SEED_BATCH_SIZE = 5000
+
+
+def chunks(start, stop):
+    for offset in range(start, stop, SEED_BATCH_SIZE):
+        yield range(offset, min(offset + SEED_BATCH_SIZE, stop))
+
+
+def seed(size):
+    from django.core.management import call_command
+    from django.utils.timezone import now
+    from test_app.models import Author, Book, CoverBook, TestUser
+
+    call_command("flush", interactive=False, verbosity=0)
+    timestamp = now()
+    deleted = timestamp - timedelta(days=1)
+    through = Book.co_authors.through
+
+    for ids in chunks(1, size + 1):
+        Author.data.bulk_create(
+            [
+                Author(id=i, name="author %s" % i, deleted=deleted if i % 2 else None)
+                for i in ids
+            ]
+        )
+    for ids in chunks(1, size + 1):
+        Book.data.bulk_create(
+            [
+                Book(
+                    id=i,
+                    name="book %s" % i,
+                    author_id=i,
+                    deleted=deleted if i % 2 else None,
+                )
+                for i in ids
+            ]
+        )
+        through.objects.bulk_create(
+            [through(book_id=i, author_id=size + 1 - i) for i in ids]
+        )
+
+    # bulk_create() can't handle multi table inheritance - add the child rows only
+    ptr = CoverBook._meta.get_field("book_ptr")
+    for ids in chunks(1, size // 10 + 1):
+        CoverBook.data._insert(
+            [CoverBook(book_ptr_id=i * 10) for i in ids], fields=[ptr], raw=True
+        )
+
+    for ids in chunks(1, size // 10 + 1):
+        TestUser.data.bulk_create(
+            [
+                TestUser(username="user%s" % i, email="user%s@example.com" % i)
+                for i in ids
+            ]
+        )
+
+
+class Benchmark(object):
+    def __init__(self, size, sample):
+        self.size = size
+        self.sample = sample
+        self.results = []
+
+    @contextmanager
+    def measure(self, operation, rows):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            yield
+            seconds = time.perf_counter() - started
+        self.results.append(
+            {
+                "size": self.size,
+                "operation": operation,
+                "rows": rows,
+                "seconds": round(seconds, 6),
+                "queries": len(queries),
+            }
+        )
+        print(
+            "%9s  %-24s %8s rows %10.4fs %6s queries"
+            % (self.size, operation, rows, seconds, len(queries))
+        )
+
+    def run(self):
+        from test_app.models import Author, Book, CoverBook, TestUser
+
+        size, sample = self.size, self.sample
+        live_pks = list(range(2, size + 1, 2))
+        deleted_pks = list(range(1, size + 1, 2))
+
+        with self.measure("visible_listing", 100):
+            list(Book.data.visible()[:100])
+            Book.data.visible().count()
+
+        with self.measure("pk_lookup_deleted", sample):
+            for pk in deleted_pks[:sample]:
+                Book.data.get(pk=pk)
+
+        with self.measure("m2m_traversal", sample):
+            for author in Author.data.filter(pk__in=live_pks[:sample]):
+                list(author.featured_books.all())
+            Book.data.filter(co_authors__name__startswith="author 1").count()
+
+        with self.measure("single_delete", sample):
+            for book in Book.data.filter(pk__in=live_pks[:sample]):
+                book.delete()
+
+        with self.measure("single_undelete", sample):
+            for book in Book.data.deleted().filter(pk__in=live_pks[:sample]):
+                book.undelete()
+
+        tenth = len(live_pks) // 10
+        bulk = Book.data.filter(pk__in=live_pks[:tenth])
+        with self.measure("bulk_delete", tenth):
+            bulk.delete()
+
+        with self.measure("bulk_undelete", tenth):
+            Book.data.deleted().filter(pk__in=live_pks[:tenth]).undelete()
+
+        chunked = Book.data.filter(
+            pk__gt=live_pks[tenth], pk__lte=live_pks[2 * tenth]
+        )
+        with self.measure("bulk_delete_chunked", tenth):
+            chunked.delete(batch_size=1000)
+
+        concealed = Book.data.filter(
+            pk__gt=live_pks[2 * tenth], pk__lte=live_pks[3 * tenth]
+        )
+        with self.measure("conceal", tenth):
+            concealed.conceal()
+
+        with self.measure("cover_book_delete", size // 20):
+            CoverBook.data.filter(pk__lte=size // 2).delete()
+
+        with self.measure("user_single_delete", sample):
+            for user in TestUser.data.all()[:sample]:
+                user.delete()
+
+        return self.results
+
+
+def compare(old, new):
+    previous = {
+        (result["size"], result["operation"]): result for result in old["results"]
+    }
+    for result in new["results"]:
+        before = previous.get((result["size"], result["operation"]))
+        if before is None or not before["seconds"]:
+            continue
+        print(
+            "%9s  %-24s %+7.1f%% time %+5d queries"
+            % (
+                result["size"],
+                result["operation"],
+                (result["seconds"] / before["seconds"] - 1) * 100,
+                result["queries"] - before["queries"],
+            )
+        )
+
+
+def main(args):
+    import django
+
+    output = {
+        "django": django.get_version(),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "started": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "results": [],
+    }
+    for size in args.sizes:
+        print("seeding %s rows ..." % size)
+        seed(size)
+        output["results"].extend(Benchmark(size, min(args.sample, size // 2)).run())
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(output, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), output)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000])
+    parser.add_argument(
+        "--sample",
+        type=int,
+        default=200,
+        help="Number of rows for the operations working on one row at a time.",
+    )
+    parser.add_argument("--output", help="Write the results to this JSON file.")
+    parser.add_argument("--compare", help="Compare the results to a previous run.")
+    args = parser.parse_args()
+
+    with tempfile.NamedTemporaryFile(suffix=".sqlite3") as db:
+        setup_django(db.name)
+        main(args)
@@ -0,0 +1,264 @@
+# coding=utf-8
+"""
+Admin integration for undeletable models:
+
+    from django_undeletable.admin import SoftDeleteAdmin
+
+    @admin.register(Book)
+    class BookAdmin(SoftDeleteAdmin):
+        list_display = ["name", "deleted", "concealed"]
+
+The changelist gets a state filter (live by default, deleted, concealed or all
+rows), actions to undelete, conceal, reveal and purge the selected rows and a
+paginator that doesn't count big tables row by row. Deleted rows can be opened
+and changed as well. Rows moved into the archive (see archive_deleted) aren't
+listed, they can be restored with restore_batch().
+"""
+from __future__ import absolute_import, unicode_literals
+
+import json
+from datetime import timedelta
+
+from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models.query import QuerySet
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _, ngettext
+
+from . import counters
+from .state import concealed_q, deleted_q, live_q
+
+STATES = (
+    ("deleted", _("deleted")),
+    ("concealed", _("concealed")),
+    ("all", _("all")),
+)
+
+# the parameters of a changelist that don't filter its rows
+UNFILTERED_PARAMETERS = {"state", "p", "o", "_popup", "_to_field"}
+
+
+class StateFilter(admin.SimpleListFilter):
+    """Live rows unless the deleted, concealed or all rows are asked for."""
+
+    title = _("state")
+    parameter_name = "state"
+
+    def lookups(self, request, model_admin):
+        return STATES
+
+    def choices(self, changelist):
+        yield {
+            "selected": self.value() is None,
+            "query_string": changelist.get_query_string(remove=[self.parameter_name]),
+            "display": _("live"),
+        }
+        for lookup, title in self.lookup_choices:
+            yield {
+                "selected": self.value() == str(lookup),
+                "query_string": changelist.get_query_string(
+                    {self.parameter_name: lookup}
+                ),
+                "display": title,
+            }
+
+    def queryset(self, request, queryset):
+        state = self.value()
+        if state == "all":
+            return queryset
+        if state == "deleted":
+            return queryset.filter(deleted_q(queryset.model))
+        if state == "concealed":
+            return queryset.filter(concealed_q(queryset.model))
+        return queryset.filter(live_q(queryset.model))
+
+
+def table_estimate(model, using):
+    """
+    The approximate number of rows in the table of model from the planner
+    statistics on PostgreSQL - None elsewhere or if there are none yet.
+    """
+    connection = connections[using]
+    if connection.vendor != "postgresql":
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(%s)",
+            [connection.ops.quote_name(model._meta.db_table)],
+        )
+        row = cursor.fetchone()
+    # -1 for tables that haven't been analyzed yet
+    if row is not None and row[0] >= 0:
+        return row[0]
+    return None
+
+
+def planner_estimate(queryset):
+    """The number of rows the PostgreSQL planner expects queryset to return."""
+    sql, params = queryset.query.sql_with_params()
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute("EXPLAIN (FORMAT JSON) " + sql, params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def cached_count(model, state, using):
+    """The count of a state from the counters of tracked models, or None."""
+    if not counters.is_tracked(model):
+        return None
+    if state in ("deleted", "all") and getattr(model, "archive_model", None):
+        # the counters include the archived rows the changelist doesn't list
+        return None
+    if state in ("live", "deleted"):
+        return counters.fast_count(model, state, using)
+    live = counters.fast_count(model, "live", using)
+    if state == "concealed":
+        return live - counters.fast_count(model, "visible", using)
+    return live + counters.fast_count(model, "deleted", using)
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Counts exactly below threshold rows. Above it the count comes from the
+    cached counters (for an unfiltered state of a model with
+    track_counts = True) or from the planner estimate of the query on
+    PostgreSQL - the exact COUNT(*) is the last resort.
+    The threshold is checked with the table statistics on PostgreSQL and
+    with a count stopping at threshold rows elsewhere, which already is the
+    exact count of a small result.
+    """
+
+    def __init__(
+        self, object_list, per_page, *args, threshold=10000, state=None, **kwargs
+    ):
+        super().__init__(object_list, per_page, *args, **kwargs)
+        self.threshold = threshold
+        self.state = state
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not isinstance(queryset, QuerySet) or queryset.query.combinator:
+            return super().count
+        model = queryset.model
+        using = queryset.db
+        postgresql = connections[using].vendor == "postgresql"
+        if postgresql:
+            estimate = table_estimate(model, using)
+            if estimate is None or estimate < self.threshold:
+                return super().count
+        else:
+            count = queryset.order_by()[: self.threshold].count()
+            if count < self.threshold:
+                return count
+        if self.state is not None:
+            count = cached_count(model, self.state, using)
+            if count is not None:
+                return count
+        if postgresql:
+            return planner_estimate(queryset.order_by())
+        return super().count
+
+
+class SoftDeleteAdmin(admin.ModelAdmin):
+    """ModelAdmin listing live, deleted or concealed rows, see above."""
+
+    actions = [
+        "undelete_selected",
+        "conceal_selected",
+        "reveal_selected",
+        "purge_selected",
+    ]
+    paginator = EstimatedCountPaginator
+    # tables with this many rows aren't counted exactly any more
+    count_threshold = 10000
+    # the count of the whole table would be another full COUNT(*)
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        # deleted rows are left out by the state filter, so they can be changed
+        manager = self.model._default_manager
+        qs = getattr(manager, "get_full_queryset", manager.get_queryset)()
+        ordering = self.get_ordering(request)
+        if ordering:
+            qs = qs.order_by(*ordering)
+        return qs
+
+    def save_model(self, request, obj, form, change):
+        if not change or obj.deleted is None:
+            return super().save_model(request, obj, form, change)
+        # save() only updates live rows (the base manager) and would INSERT
+        # the deleted row another time, so it is updated through the full queryset
+        values = {
+            field.attname: field.pre_save(obj, False)
+            for field in obj._meta.concrete_fields
+            if not field.primary_key
+        }
+        self.model._default_manager.get_full_queryset().using(obj._state.db).filter(
+            pk=obj.pk
+        ).update(**values)
+
+    def get_list_filter(self, request):
+        list_filter = list(super().get_list_filter(request))
+        if StateFilter not in list_filter:
+            list_filter.insert(0, StateFilter)
+        return list_filter
+
+    def get_paginator(
+        self, request, queryset, per_page, orphans=0, allow_empty_first_page=True
+    ):
+        state = None
+        if set(request.GET) <= UNFILTERED_PARAMETERS:
+            state = request.GET.get("state") or "live"
+        return self.paginator(
+            queryset,
+            per_page,
+            orphans,
+            allow_empty_first_page,
+            threshold=self.count_threshold,
+            state=state,
+        )
+
+    @admin.action(
+        permissions=["change"],
+        description=_("Undelete selected %(verbose_name_plural)s"),
+    )
+    def undelete_selected(self, request, queryset):
+        count = queryset.filter(deleted_q(queryset.model)).undelete()
+        message = ngettext(
+            "%(count)d row undeleted.", "%(count)d rows undeleted.", count
+        )
+        self.message_user(request, message % {"count": count})
+
+    @admin.action(
+        permissions=["change"],
+        description=_("Conceal selected %(verbose_name_plural)s"),
+    )
+    def conceal_selected(self, request, queryset):
+        count = queryset.conceal()
+        message = ngettext(
+            "%(count)d row concealed.", "%(count)d rows concealed.", count
+        )
+        self.message_user(request, message % {"count": count})
+
+    @admin.action(
+        permissions=["change"],
+        description=_("Reveal selected %(verbose_name_plural)s"),
+    )
+    def reveal_selected(self, request, queryset):
+        count = queryset.reveal()
+        message = ngettext("%(count)d row revealed.", "%(count)d rows revealed.", count)
+        self.message_user(request, message % {"count": count})
+
+    @admin.action(
+        permissions=["delete"],
+        description=_("Purge selected deleted %(verbose_name_plural)s"),
+    )
+    def purge_selected(self, request, queryset):
+        # only rows that are deleted already, regardless of the retention
+        count = queryset.purge(older_than=timedelta(0))
+        message = ngettext("%(count)d row purged.", "%(count)d rows purged.", count)
+        self.message_user(request, message % {"count": count})
@@ -0,0 +1,194 @@
+# coding=utf-8
+from __future__ import absolute_import, unicode_literals
+
+import uuid
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db import models, transaction
+from django.db.models import Exists, OuterRef
+from django.db.models.deletion import get_candidate_relations_to_delete
+from django.db.models.fields.related import resolve_relation
+from django.db.models.query import QuerySet
+
+from . import caching
+from .instrumentation import send
+from .signals import bulk_undeleted
+from .state import deleted_q, state_of
+from .triggers import bypass_triggers
+
+
+def archive_field(field):
+    """
+    Copy a field of the live model for its archive model: same column and type,
+    but without uniqueness, auto values or database constraints.
+    """
+    if field.is_relation:
+        # deconstruct() would need the app registry to be ready - and "self"
+        # has to stay the live model
+        return models.ForeignKey(
+            resolve_relation(field.model, field.remote_field.model),
+            on_delete=models.DO_NOTHING,
+            to_field=field.remote_field.field_name,
+            related_name="+",
+            db_constraint=False,
+            db_column=field.db_column,
+            null=field.null,
+            blank=field.blank,
+            verbose_name=field.verbose_name,
+        )
+
+    name, path, args, kwargs = field.deconstruct()
+    for key in ("auto_now", "auto_now_add", "unique", "auto_created"):
+        kwargs.pop(key, None)
+
+    field_class = field.__class__
+    if isinstance(field, models.fields.AutoFieldMixin):
+        # keep the primary key values of the live table
+        field_class = {
+            "BigAutoField": models.BigIntegerField,
+            "SmallAutoField": models.SmallIntegerField,
+        }.get(field_class.__name__, models.IntegerField)
+    return field_class(*args, **kwargs)
+
+
+def make_archive_model(model):
+    """
+    Create the archive model of an undeletable model with archive_deleted = True.
+    It lives in the same app with the table <db_table>_archive and gets picked up
+    by makemigrations like any other model.
+    """
+    opts = model._meta
+    if opts.parents:
+        raise ImproperlyConfigured(
+            "%s: archiving deleted rows is not supported for multi table inheritance."
+            % opts.label
+        )
+
+    attrs = {
+        "__module__": model.__module__,
+        "Meta": type(
+            str("Meta"),
+            (),
+            {
+                "app_label": opts.app_label,
+                "db_table": "%s_archive" % opts.db_table,
+                "managed": opts.managed,
+                "verbose_name": "%s archive" % opts.verbose_name,
+            },
+        ),
+    }
+    for field in opts.local_concrete_fields:
+        attrs[field.name] = archive_field(field)
+    return type(str("%sArchive" % model.__name__), (models.Model,), attrs)
+
+
+def add_archive_model(sender, **kwargs):
+    if not getattr(sender, "archive_deleted", False):
+        return
+    opts = sender._meta
+    if opts.abstract or opts.proxy or "archive_model" in sender.__dict__:
+        return
+    sender.archive_model = make_archive_model(sender)
+
+
+def unreferenced(queryset):
+    """
+    Rows nothing points to anymore - only these can leave the live table without
+    breaking foreign keys (including the ones of many to many tables).
+    """
+    model = queryset.model
+    for related in get_candidate_relations_to_delete(model._meta):
+        field = related.field
+        references = QuerySet(related.related_model).filter(
+            **{field.attname: OuterRef(field.target_field.attname)}
+        )
+        queryset = queryset.filter(~Exists(references))
+    return queryset
+
+
+def archive(queryset, batch_size=1000):
+    """
+    Move the soft deleted rows of queryset into the archive table, batch_size rows
+    per transaction. Rows that are still referenced by other rows stay where they are.
+    Returns the number of archived rows.
+    """
+    model = queryset.model
+    archive_model = model.archive_model
+    fields = [f.attname for f in model._meta.local_concrete_fields]
+    queryset = unreferenced(queryset.filter(deleted_q(model))).order_by("pk")
+
+    count = 0
+    last_pk = None
+    while True:
+        chunk = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+        rows = list(chunk.values_list(*fields)[:batch_size])
+        if not rows:
+            break
+
+        pks = [row[0] for row in rows]
+        with transaction.atomic(using=queryset.db), bypass_triggers(model, queryset.db):
+            archive_model._base_manager.using(queryset.db).bulk_create(
+                [archive_model(**dict(zip(fields, row))) for row in rows]
+            )
+            QuerySet(model, using=queryset.db).filter(pk__in=pks)._raw_delete(
+                queryset.db
+            )
+        count += len(rows)
+        last_pk = pks[-1]
+
+        if len(rows) < batch_size:
+            break
+
+    return count
+
+
+def restore_archived(model, queryset, batch_size=1000, **values):
+    """
+    Move the rows of an archive queryset back into the live table, updating
+    them with values on the way (deleted=None to undelete them).
+    Sends bulk_undeleted per chunk, returns the number of restored rows.
+    """
+    fields = list(model._meta.local_concrete_fields)
+    names = [f.attname for f in fields]
+    queryset = queryset.order_by("pk")
+
+    count = 0
+    last_pk = None
+    operation = uuid.uuid4()
+    while True:
+        chunk = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+        rows = list(chunk.values_list(*names)[:batch_size])
+        if not rows:
+            break
+
+        objs = []
+        for row in rows:
+            data = dict(zip(names, row))
+            data.update(values)
+            if "state" in data:
+                data["state"] = state_of(data["deleted"], data["concealed"])
+            objs.append(model(**data))
+        pks = [row[0] for row in rows]
+        with transaction.atomic(using=queryset.db):
+            # a raw insert keeps created and modified as they were
+            model._base_manager.using(queryset.db)._insert(
+                objs, fields=fields, raw=True, using=queryset.db
+            )
+            QuerySet(queryset.model, using=queryset.db).filter(
+                pk__in=pks
+            )._raw_delete(queryset.db)
+            send(
+                bulk_undeleted,
+                sender=model,
+                pks=pks,
+                using=queryset.db,
+                operation=operation,
+            )
+        caching.invalidate(model, queryset.db)
+        count += len(rows)
+        last_pk = pks[-1]
+
+        if len(rows) < batch_size:
+            break
+
+    return count
@@ -0,0 +1,25 @@
+# coding=utf-8
+"""
+An audit log of who deleted, undeleted, concealed, revealed or purged which rows.
+
+Add "django_undeletable.audit" to INSTALLED_APPS (it needs
+django.contrib.contenttypes), migrate and set audit_log = True on the models to
+log. Every operation becomes one AuditEntry - however many rows it touched - with
+their primary keys stored as ranges ("1-500,502"). Entries are buffered and
+written with bulk_create once the transaction commits. Operations outside of
+transactions wait in the buffer until it is full or old enough:
+
+    UNDELETABLE_AUDIT = {
+        "BUFFER_SIZE": 100,       # entries
+        "FLUSH_INTERVAL": 5,      # seconds
+    }
+
+There is no timer - the age is checked when the next entry comes in. So the
+buffer is also written at the end of every request and when the process exits;
+long running workers and management commands should call
+django_undeletable.audit.log.flush() when they are done with a unit of work.
+
+The actor is whatever is set with django_undeletable.audit.log.actor() -
+AuditActorMiddleware sets the username of the current user. Force deletes are
+not logged, purges are.
+"""
@@ -0,0 +1,14 @@
+# -*- coding: utf-8
+from django.apps import AppConfig
+
+
+class AuditConfig(AppConfig):
+    name = "django_undeletable.audit"
+    label = "undeletable_audit"
+    verbose_name = "Django undeletable audit log"
+    default_auto_field = "django.db.models.BigAutoField"
+
+    def ready(self):
+        from .log import connect_models
+
+        connect_models()
@@ -0,0 +1,264 @@
+# coding=utf-8
+"""
+Collecting and writing the audit log, see django_undeletable.audit.
+"""
+from __future__ import absolute_import, unicode_literals
+
+import atexit
+import threading
+import time
+import weakref
+from collections import namedtuple
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.apps import apps
+from django.conf import settings
+from django.core.signals import request_finished
+from django.db import connections, transaction
+from django.utils.timezone import now
+
+from django_undeletable.signals import (
+    bulk_concealed,
+    bulk_purged,
+    bulk_revealed,
+    bulk_soft_deleted,
+    bulk_undeleted,
+)
+
+DEFAULTS = {"BUFFER_SIZE": 100, "FLUSH_INTERVAL": 5}
+
+current_actor = ContextVar("undeletable_audit_actor", default=None)
+
+Entry = namedtuple(
+    "Entry",
+    [
+        "using",
+        "model",
+        "action",
+        "pks",
+        "actor",
+        "deletion_batch",
+        "timestamp",
+        "operation",
+    ],
+)
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, "UNDELETABLE_AUDIT", None) or {})
+    return config
+
+
+def is_audited(model):
+    return getattr(model, "audit_log", False)
+
+
+@contextmanager
+def actor(name):
+    """Log everything within the block as done by name."""
+    token = current_actor.set(name)
+    try:
+        yield
+    finally:
+        current_actor.reset(token)
+
+
+class AuditActorMiddleware(object):
+    """Log the username of the current user as the actor."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def get_actor(self, request):
+        user = getattr(request, "user", None)
+        if user is None or not user.is_authenticated:
+            return None
+        return user.get_username()
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with actor(self.get_actor(request)):
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        user = await request.auser() if hasattr(request, "auser") else None
+        name = user.get_username() if user and user.is_authenticated else None
+        with actor(name):
+            return await self.get_response(request)
+
+
+def merge(entries, entry):
+    """
+    Add entry, extending the last one if it is another chunk of the same
+    operation. Entries without one are never merged.
+    """
+    if entries and entry.operation is not None:
+        last = entries[-1]
+        if last.operation == entry.operation and (
+            last[:3] == entry[:3] and last[4:6] == entry[4:6]
+        ):
+            entries[-1] = last._replace(pks=last.pks + entry.pks)
+            return
+    entries.append(entry)
+
+
+def write(entries):
+    """Store entries with one bulk_create per database."""
+    from django.contrib.contenttypes.models import ContentType
+
+    from .models import AuditEntry, compact_ids
+
+    by_using = {}
+    for entry in entries:
+        by_using.setdefault(entry.using, []).append(entry)
+    for using, chunk in by_using.items():
+        content_types = ContentType.objects.db_manager(using).get_for_models(
+            *{entry.model for entry in chunk}, for_concrete_models=False
+        )
+        AuditEntry.objects.using(using).bulk_create(
+            [
+                AuditEntry(
+                    content_type=content_types[entry.model],
+                    object_ids=compact_ids(entry.pks),
+                    count=len(set(entry.pks)),
+                    action=entry.action,
+                    actor=entry.actor or "",
+                    timestamp=entry.timestamp,
+                    deletion_batch=entry.deletion_batch,
+                )
+                for entry in chunk
+            ]
+        )
+
+
+class AuditBuffer(object):
+    """Committed entries waiting to be written, shared by all threads."""
+
+    def __init__(self):
+        self.entries = []
+        self.started = None
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, entries):
+        """Add entries, writing all of them once the buffer is full or old enough."""
+        config = get_config()
+        with self.lock:
+            for entry in entries:
+                merge(self.entries, entry)
+            if self.started is None:
+                self.started = time.monotonic()
+            due = (
+                len(self.entries) >= config["BUFFER_SIZE"]
+                or time.monotonic() - self.started >= config["FLUSH_INTERVAL"]
+            )
+        if due:
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            entries, self.entries, self.started = self.entries, [], None
+        if entries:
+            write(entries)
+
+
+buffer = AuditBuffer()
+
+
+def flush(**kwargs):
+    """
+    Write the buffered entries now - at the end of a management command e.g.
+    Connected to request_finished, so no request leaves its entries behind.
+    """
+    buffer.flush()
+
+
+class PendingEntries(object):
+    """The entries of a transaction (or savepoint), flushed once it commits."""
+
+    def __init__(self):
+        self.entries = []
+        self.done = False
+
+    def __call__(self):
+        self.done = True
+        buffer.add(self.entries)
+        buffer.flush()
+
+
+def pending_entries(connection):
+    """
+    The entries of the current savepoint level, registered with on_commit() at
+    the first one. Django drops the callbacks of rolled back savepoints and
+    transactions - and with them the last reference to their entries, so the
+    registry only keeps weak references and forgets them as well.
+    """
+    registry = getattr(connection, "undeletable_audit", None)
+    if registry is None:
+        registry = connection.undeletable_audit = weakref.WeakValueDictionary()
+    key = tuple(connection.savepoint_ids)
+    callback = registry.get(key)
+    if callback is None or callback.done:
+        callback = registry[key] = PendingEntries()
+        transaction.on_commit(callback, using=connection.alias)
+    return callback
+
+
+def record(model, action, pks, using, deletion_batch=None, operation=None):
+    entry = Entry(
+        using,
+        model,
+        action,
+        list(pks),
+        current_actor.get(),
+        deletion_batch,
+        now(),
+        operation,
+    )
+    connection = connections[using]
+    if connection.in_atomic_block:
+        merge(pending_entries(connection).entries, entry)
+    else:
+        buffer.add([entry])
+
+
+def receiver(action):
+    def receive(sender, pks, using, deletion_batch=None, operation=None, **kwargs):
+        record(sender, action, pks, using, deletion_batch, operation)
+
+    return receive
+
+
+RECEIVERS = (
+    (bulk_soft_deleted, receiver("delete")),
+    (bulk_undeleted, receiver("undelete")),
+    (bulk_concealed, receiver("conceal")),
+    (bulk_revealed, receiver("reveal")),
+    (bulk_purged, receiver("purge")),
+)
+
+
+def connect_models():
+    """Connect the receivers for every model with audit_log = True."""
+    for model in apps.get_models():
+        if not is_audited(model):
+            continue
+        for signal, receive in RECEIVERS:
+            signal.connect(receive, sender=model)
+        archive_model = getattr(model, "archive_model", None)
+        if archive_model is not None:
+            # purge() of the archive
+            bulk_purged.connect(RECEIVERS[-1][1], sender=archive_model)
+    request_finished.connect(flush, dispatch_uid="undeletable_audit_flush")
+    atexit.register(flush)
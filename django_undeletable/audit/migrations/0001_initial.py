@@ -0,0 +1,79 @@
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ("contenttypes", "0002_remove_content_type_name"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AuditEntry",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("object_ids", models.TextField(verbose_name="object ids")),
+                ("count", models.PositiveIntegerField(verbose_name="count")),
+                (
+                    "action",
+                    models.CharField(
+                        choices=[
+                            ("delete", "deleted"),
+                            ("undelete", "undeleted"),
+                            ("conceal", "concealed"),
+                            ("reveal", "revealed"),
+                            ("purge", "purged"),
+                        ],
+                        max_length=10,
+                        verbose_name="action",
+                    ),
+                ),
+                (
+                    "actor",
+                    models.CharField(blank=True, max_length=150, verbose_name="actor"),
+                ),
+                (
+                    "timestamp",
+                    models.DateTimeField(
+                        default=django.utils.timezone.now, verbose_name="timestamp"
+                    ),
+                ),
+                (
+                    "deletion_batch",
+                    models.UUIDField(
+                        blank=True, null=True, verbose_name="deletion batch"
+                    ),
+                ),
+                (
+                    "content_type",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.PROTECT,
+                        related_name="+",
+                        to="contenttypes.contenttype",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "audit entry",
+                "verbose_name_plural": "audit entries",
+                "ordering": ["-timestamp"],
+                "indexes": [
+                    models.Index(
+                        fields=["content_type", "timestamp"], name="audit_ct_ts"
+                    )
+                ],
+            },
+        ),
+    ]
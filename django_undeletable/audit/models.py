@@ -0,0 +1,73 @@
+# coding=utf-8
+from __future__ import absolute_import, unicode_literals
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import models
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+
+ACTIONS = (
+    ("delete", _("deleted")),
+    ("undelete", _("undeleted")),
+    ("conceal", _("concealed")),
+    ("reveal", _("revealed")),
+    ("purge", _("purged")),
+)
+
+
+def compact_ids(pks):
+    """Integer primary keys as sorted ranges ("1-3,7"), all others comma separated."""
+    if not all(isinstance(pk, int) for pk in pks):
+        return ",".join(str(pk) for pk in pks)
+    parts = []
+    start = end = None
+    for pk in sorted(set(pks)):
+        if end is not None and pk == end + 1:
+            end = pk
+            continue
+        if start is not None:
+            parts.append(str(start) if start == end else "%s-%s" % (start, end))
+        start = end = pk
+    if start is not None:
+        parts.append(str(start) if start == end else "%s-%s" % (start, end))
+    return ",".join(parts)
+
+
+def expand_ids(value):
+    """The primary keys of compact_ids() - as strings unless they are integers."""
+    pks = []
+    for part in value.split(",") if value else []:
+        start, sep, end = part.partition("-")
+        if sep and start.isdigit() and end.isdigit():
+            pks.extend(range(int(start), int(end) + 1))
+        else:
+            pks.append(int(part) if part.isdigit() else part)
+    return pks
+
+
+class AuditEntry(models.Model):
+    """One delete, undelete, conceal, reveal or purge operation."""
+
+    content_type = models.ForeignKey(
+        ContentType, related_name="+", on_delete=models.PROTECT
+    )
+    object_ids = models.TextField(_("object ids"))
+    count = models.PositiveIntegerField(_("count"))
+    action = models.CharField(_("action"), max_length=10, choices=ACTIONS)
+    actor = models.CharField(_("actor"), max_length=150, blank=True)
+    timestamp = models.DateTimeField(_("timestamp"), default=timezone.now)
+    deletion_batch = models.UUIDField(_("deletion batch"), null=True, blank=True)
+
+    class Meta:
+        verbose_name = _("audit entry")
+        verbose_name_plural = _("audit entries")
+        ordering = ["-timestamp"]
+        indexes = [
+            models.Index(fields=["content_type", "timestamp"], name="audit_ct_ts"),
+        ]
+
+    def __str__(self):
+        return "%s %s %s row(s)" % (self.actor or "-", self.action, self.count)
+
+    def pks(self):
+        return expand_ids(self.object_ids)
@@ -0,0 +1,504 @@
+# coding=utf-8
+"""The abstract base models - without anything of django.contrib.auth."""
+from __future__ import absolute_import, unicode_literals
+
+import uuid
+
+from asgiref.sync import sync_to_async
+from django.db import models, router, transaction
+from django.db.models import Q
+from django.db.models.signals import (
+    class_prepared,
+    pre_delete,
+    post_delete,
+    pre_save,
+    post_save,
+)
+from django.utils.timezone import now
+from django.utils.translation import gettext_lazy as _
+
+from . import caching, counters, identity
+from .archive import add_archive_model, restore_archived
+from .deletion import SoftDeleteCollector
+from .instrumentation import asend, instrumented, one_row, send
+from .managers import DataManager
+from .signals import bulk_soft_deleted, bulk_undeleted, bulk_concealed, bulk_revealed
+from .state import (
+    CHOICES as STATE_CHOICES,
+    LIVE,
+    deleted_q,
+    is_compact,
+    live_q,
+    state_of,
+)
+from .triggers import bypass_triggers
+from .utils import live_index_name, live_index_fields
+
+
+# base model with useful stuff
+##########################################
+class BaseModel(models.Model):
+    created = models.DateTimeField(
+        _("created"), auto_now_add=True, editable=False, db_index=True
+    )
+    modified = models.DateTimeField(auto_now=True, editable=False)
+    deleted = models.DateTimeField(editable=False, null=True)
+    # groups rows deleted by the same operation (see DataManager.restore_batch)
+    deletion_batch = models.UUIDField(editable=False, null=True, db_index=True)
+
+    # ability to hide stuff publicly
+    concealed = models.BooleanField(default=False, editable=False)
+
+    # add partial indexes covering only live rows (see add_live_indexes)
+    live_indexes = True
+    # move deleted rows into a separate archive table (see DataManager.archive)
+    archive_deleted = False
+    # keep the row counts in the cache (see DataManager.fast_count)
+    track_counts = False
+    # unique fields only need to be unique among live rows (see add_live_unique)
+    live_unique = False
+    # index created and deleted for as_of() and between() (see add_history_index)
+    history_index = False
+    # a database trigger turns DELETEs into soft deletes (see django_undeletable.triggers)
+    delete_trigger = False
+    # keep rows and querysets in the cache, True or a timeout in seconds
+    # (see django_undeletable.caching)
+    cache_rows = False
+
+    # access non deleted data only
+    data = DataManager()
+    # fallback for 3rd party libs not respecting the default manager
+    objects = DataManager()
+
+    class Meta:
+        abstract = True
+        ordering = ["-created"]
+        get_latest_by = "created"
+        base_manager_name = "data"
+        default_manager_name = "data"
+
+    # deleted data is bad - doing it you shouldn't! (but if u really want, u can)
+    @instrumented("delete", rows=one_row)
+    def delete(
+        self,
+        using=None,
+        force=False,
+        touch=True,
+        save_signals=True,
+        cascade=False,
+        batch=None,
+    ):
+        """
+        Soft delete this row with a single UPDATE writing only the deleted
+        timestamp and deletion batch (and modified unless touch is False)
+        instead of a full save().
+        pre_save/post_save are still sent with the written update_fields
+        unless save_signals is False.
+        With cascade the on_delete handlers of related rows are honoured as well.
+        Deleting a deleted row again does nothing (unless force is given).
+        """
+        model_class = type(self)
+        using = using or router.db_for_write(model_class, instance=self)
+        if force:
+            with bypass_triggers(model_class, using):
+                super(BaseModel, self).delete(using=using)
+            caching.invalidate(model_class, using)
+            # the cascade might have deleted rows of any model
+            identity.clear()
+            counters.adjust_row(model_class, using, -1, self.deleted, self.concealed)
+            return
+        if self.deleted is not None:
+            return
+
+        if cascade:
+            collector = SoftDeleteCollector(using=using)
+            collector.collect(model_class, [self.pk])
+            with transaction.atomic(using=using, savepoint=False):
+                if self._soft_delete(using, touch, save_signals, batch):
+                    collector.delete(self.deleted, self.deletion_batch)
+        else:
+            self._soft_delete(using, touch, save_signals, batch)
+
+    @instrumented("adelete", rows=one_row)
+    async def adelete(
+        self,
+        using=None,
+        force=False,
+        touch=True,
+        save_signals=True,
+        cascade=False,
+        batch=None,
+    ):
+        """
+        Async version of delete() sending the signals with asend().
+        force and cascade need a transaction and run in a thread as a whole.
+        """
+        if force or cascade:
+            return await sync_to_async(self.delete)(
+                using=using,
+                force=force,
+                touch=touch,
+                save_signals=save_signals,
+                cascade=cascade,
+                batch=batch,
+            )
+
+        if self.deleted is not None:
+            return
+        model_class = type(self)
+        using = using or router.db_for_write(model_class, instance=self)
+        await asend(pre_delete, sender=model_class, instance=self, using=using)
+
+        previous, values = self._stamp_deletion(touch, batch)
+        update_fields = frozenset(values)
+        if save_signals:
+            await asend(
+                pre_save,
+                sender=model_class,
+                instance=self,
+                raw=False,
+                using=using,
+                update_fields=update_fields,
+            )
+        updated = await sync_to_async(self._write_deletion)(using, previous, values)
+        if not updated:
+            return
+        if save_signals:
+            await asend(
+                post_save,
+                sender=model_class,
+                instance=self,
+                created=False,
+                raw=False,
+                using=using,
+                update_fields=update_fields,
+            )
+
+        await asend(post_delete, sender=model_class, instance=self, using=using)
+
+    def _soft_delete(self, using, touch, save_signals, batch):
+        model_class = type(self)
+        send(pre_delete, sender=model_class, instance=self, using=using)
+
+        previous, values = self._stamp_deletion(touch, batch)
+        update_fields = frozenset(values)
+        if save_signals:
+            send(
+                pre_save,
+                sender=model_class,
+                instance=self,
+                raw=False,
+                using=using,
+                update_fields=update_fields,
+            )
+        updated = self._write_deletion(using, previous, values)
+        if not updated:
+            return updated
+        if save_signals:
+            send(
+                post_save,
+                sender=model_class,
+                instance=self,
+                created=False,
+                raw=False,
+                using=using,
+                update_fields=update_fields,
+            )
+
+        send(post_delete, sender=model_class, instance=self, using=using)
+        return updated
+
+    def _stamp_deletion(self, touch, batch):
+        """Set the deletion fields, returns their previous and their new values."""
+        previous = {
+            "deleted": self.deleted,
+            "deletion_batch": self.deletion_batch,
+            "modified": self.modified,
+        }
+        self.deleted = now()
+        self.deletion_batch = batch or uuid.uuid4()
+        values = {"deleted": self.deleted, "deletion_batch": self.deletion_batch}
+        if touch:
+            self.modified = self.deleted
+            values["modified"] = self.modified
+        return previous, values
+
+    def _write_deletion(self, using, previous, values):
+        """
+        Write values unless the row is deleted already (by someone else) - in
+        that case the instance gets its previous values back and nothing is
+        sent. Returns the number of updated rows.
+        """
+        model_class = type(self)
+        updated = (
+            model_class.data.get_full_queryset()
+            .using(using)
+            .filter(live_q(model_class), pk=self.pk)
+            .update(**values)
+        )
+        if not updated:
+            for attname, value in previous.items():
+                setattr(self, attname, value)
+            return updated
+        send(
+            bulk_soft_deleted,
+            sender=model_class,
+            pks=[self.pk],
+            using=using,
+            deletion_batch=self.deletion_batch,
+            operation=uuid.uuid4(),
+        )
+        counters.count_deletion(model_class, using, self.concealed)
+        return updated
+
+    @instrumented("undelete", rows=one_row)
+    def undelete(self):
+        # the model cannot just be saved since its not visible to Django
+        # and thus it will come to the conclusion that new data has to be inserted
+        model = self._meta.model
+        using = self._state.db or router.db_for_write(model, instance=self)
+        # modified is set, so incremental exports pick the undeletion up
+        modified = now()
+        updated = (
+            model.data.get_full_queryset()
+            .using(using)
+            .filter(deleted_q(model), pk=self.pk)
+            .update(deleted=None, deletion_batch=None, modified=modified)
+        )
+        if updated:
+            send(
+                bulk_undeleted,
+                sender=model,
+                pks=[self.pk],
+                using=using,
+                operation=uuid.uuid4(),
+            )
+        archive_model = getattr(model, "archive_model", None)
+        if not updated and archive_model is not None:
+            # sends bulk_undeleted itself
+            updated = restore_archived(
+                model,
+                archive_model._base_manager.using(using).filter(pk=self.pk),
+                deleted=None,
+                deletion_batch=None,
+                modified=modified,
+            )
+        if updated:
+            counters.count_undeletion(model, using, self.concealed)
+            self.modified = modified
+        self.deleted = self.deletion_batch = None
+
+    @instrumented("aundelete", rows=one_row)
+    async def aundelete(self):
+        await sync_to_async(self.undelete)()
+
+    @instrumented("conceal", rows=one_row)
+    def conceal(self):
+        """Hide this row from visible() - only concealed and modified are written."""
+        self._set_concealed(True)
+
+    @instrumented("reveal", rows=one_row)
+    def reveal(self):
+        self._set_concealed(False)
+
+    @instrumented("aconceal", rows=one_row)
+    async def aconceal(self):
+        await sync_to_async(self._set_concealed)(True)
+
+    @instrumented("areveal", rows=one_row)
+    async def areveal(self):
+        await sync_to_async(self._set_concealed)(False)
+
+    def _set_concealed(self, concealed):
+        model = self._meta.model
+        using = self._state.db or router.db_for_write(model, instance=self)
+        modified = now()
+        updated = (
+            model.data.get_full_queryset()
+            .using(using)
+            .filter(pk=self.pk)
+            .exclude(concealed=concealed)
+            .update(concealed=concealed, modified=modified)
+        )
+        if updated:
+            self.modified = modified
+            signal = bulk_concealed if concealed else bulk_revealed
+            send(
+                signal,
+                sender=model,
+                pks=[self.pk],
+                using=using,
+                operation=uuid.uuid4(),
+            )
+        if updated and self.deleted is None:
+            counters.adjust(model, using, visible=-1 if concealed else 1)
+        self.concealed = concealed
+
+    def pprint(self):
+        from pprint import pprint
+
+        pprint(self.__dict__)
+
+
+def add_live_indexes(sender, **kwargs):
+    """
+    Default queries only ever look at live rows (deleted IS NULL) and visible()
+    additionally at concealed = false. Most rows of an undeletable table tend to be
+    dead ones, so every concrete BaseModel gets partial indexes on its ordering
+    columns restricted to exactly those subsets. Set live_indexes = False on a
+    model to opt out. The indexes are declared whatever the database is, so
+    the migrations don't depend on the settings - backends without partial
+    indexes (MySQL, MariaDB) skip them and report models.W037.
+    """
+    if not issubclass(sender, BaseModel) or not sender.live_indexes:
+        return
+    if is_compact(sender):
+        # the index of the state column covers both
+        return
+    opts = sender._meta
+    if opts.abstract or opts.proxy or not opts.managed:
+        return
+    local_fields = {f.name for f in opts.local_concrete_fields}
+    if not {"deleted", "concealed"} <= local_fields:
+        # multi table inheritance - the parent table already got the indexes
+        return
+    fields = live_index_fields(sender)
+    if not fields:
+        return
+
+    existing = {index.name for index in opts.indexes}
+    indexes = list(opts.indexes)
+    for suffix, condition in (
+        ("lv", Q(deleted__isnull=True)),
+        ("vs", Q(deleted__isnull=True, concealed=False)),
+    ):
+        name = live_index_name(sender, fields, suffix)
+        if name not in existing:
+            indexes.append(models.Index(fields=fields, name=name, condition=condition))
+    opts.indexes = indexes
+
+
+def add_history_index(sender, **kwargs):
+    """
+    With history_index = True a model gets an index on (created, deleted) for
+    as_of() and a partial one on deleted for the deleted events of between().
+    """
+    if not issubclass(sender, BaseModel) or not sender.history_index:
+        return
+    opts = sender._meta
+    if opts.abstract or opts.proxy or not opts.managed:
+        return
+    if "deleted" not in {f.name for f in opts.local_concrete_fields}:
+        # multi table inheritance - the parent table has the columns
+        return
+
+    existing = {index.name for index in opts.indexes}
+    indexes = list(opts.indexes)
+    for fields, suffix, condition in (
+        (["created", "deleted"], "hc", None),
+        (["deleted"], "hd", Q(deleted__isnull=False)),
+    ):
+        name = live_index_name(sender, fields, suffix)
+        if name not in existing:
+            indexes.append(models.Index(fields=fields, name=name, condition=condition))
+    opts.indexes = indexes
+
+
+def add_live_unique(sender, **kwargs):
+    """
+    With live_unique = True (or a list of field names) the unique fields of a model
+    only have to be unique among the live rows: their unique index is replaced by a
+    conditional unique constraint (and a plain index), so a deleted row no longer
+    blocks creating a new one with the same value.
+    """
+    if not issubclass(sender, BaseModel) or not sender.live_unique:
+        return
+    opts = sender._meta
+    if opts.abstract or opts.proxy:
+        return
+
+    if sender.live_unique is True:
+        names = [
+            f.name for f in opts.local_concrete_fields if f.unique and not f.primary_key
+        ]
+    else:
+        names = list(sender.live_unique)
+
+    existing = {constraint.name for constraint in opts.constraints}
+    constraints = list(opts.constraints)
+    for name in names:
+        field = opts.get_field(name)
+        field._unique = False
+        # unique is a cached property in newer Django versions
+        field.__dict__.pop("unique", None)
+        field.db_index = True
+        constraint_name = live_index_name(sender, [name], "lu")
+        if constraint_name not in existing:
+            constraints.append(
+                models.UniqueConstraint(
+                    fields=[name],
+                    condition=Q(deleted__isnull=True),
+                    name=constraint_name,
+                )
+            )
+    opts.constraints = constraints
+
+
+class_prepared.connect(add_live_indexes)
+class_prepared.connect(add_live_unique)
+class_prepared.connect(add_history_index)
+class_prepared.connect(add_archive_model)
+class_prepared.connect(counters.add_count_tracking)
+class_prepared.connect(caching.add_row_caching)
+
+
+class NamedModel(BaseModel):
+    name = models.CharField(_("Name"), max_length=150, db_index=True)
+
+    class Meta(BaseModel.Meta):
+        ordering = ["name"]
+        abstract = True
+
+    def __str__(self):
+        return self.name
+
+
+class CompactBaseModel(BaseModel):
+    """
+    BaseModel with an additional indexed state column (live, concealed or deleted)
+    the managers filter on instead of deleted and concealed (see
+    django_undeletable.state). Use the BackfillState migration operation when
+    switching an existing model.
+    """
+
+    state = models.PositiveSmallIntegerField(
+        _("state"), choices=STATE_CHOICES, default=LIVE, editable=False, db_index=True
+    )
+
+    compact_state = True
+
+    class Meta(BaseModel.Meta):
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        self.state = state_of(self.deleted, self.concealed)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and {"deleted", "concealed"} & set(update_fields):
+            kwargs["update_fields"] = set(update_fields) | {"state"}
+        super(CompactBaseModel, self).save(*args, **kwargs)
+
+    # the database is updated by DataQuerySet.update(), the instance here
+    def _write_deletion(self, using, previous, values):
+        updated = super(CompactBaseModel, self)._write_deletion(
+            using, previous, values
+        )
+        self.state = state_of(self.deleted, self.concealed)
+        return updated
+
+    def undelete(self):
+        super(CompactBaseModel, self).undelete()
+        self.state = state_of(self.deleted, self.concealed)
+
+    def _set_concealed(self, concealed):
+        super(CompactBaseModel, self)._set_concealed(concealed)
+        self.state = state_of(self.deleted, self.concealed)
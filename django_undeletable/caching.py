@@ -0,0 +1,168 @@
+# coding=utf-8
+"""
+A read-through cache for models with cache_rows = True (or a timeout in seconds):
+
+    Tag.data.cached_get(pk)                  # like Tag.data.get(pk=pk)
+    Tag.data.visible().order_by("name").cached()   # a list of the rows
+
+All keys of a model contain its version, which every write through the
+undeletable managers (delete, undelete, conceal, reveal, update, save, purge,
+archive, ...) increases - invalidating all cached rows and lists of the model
+at once. Old keys are never deleted, they expire or get evicted by the cache.
+
+    UNDELETABLE_CACHE = {
+        "ALIAS": "default",       # the Django cache to use
+        "TIMEOUT": 300,           # unless the model sets cache_rows = <seconds>
+        "KEY_PREFIX": "undeletable",
+    }
+
+A cached queryset only changes its key with the version of its own model,
+filters on or selects from related models don't invalidate it.
+"""
+from __future__ import absolute_import, unicode_literals
+
+import hashlib
+import time
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import EmptyResultSet
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models.signals import post_save
+
+DEFAULTS = {"ALIAS": "default", "TIMEOUT": 300, "KEY_PREFIX": "undeletable"}
+
+
+def is_cached(model):
+    return bool(getattr(model, "cache_rows", False))
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, "UNDELETABLE_CACHE", None) or {})
+    return config
+
+
+def get_cache():
+    return caches[get_config()["ALIAS"]]
+
+
+def get_timeout(model):
+    # True is an int as well
+    if model.cache_rows is not True:
+        return model.cache_rows
+    return get_config()["TIMEOUT"]
+
+
+def root_model(model):
+    # all models of an inheritance tree share the rows of the root table
+    model = model._meta.concrete_model
+    while model._meta.parents:
+        model = next(iter(model._meta.parents))
+    return model
+
+
+def version_key(model, using):
+    return "%s:version:%s:%s" % (
+        get_config()["KEY_PREFIX"],
+        using,
+        root_model(model)._meta.label_lower,
+    )
+
+
+def get_version(model, using):
+    cache = get_cache()
+    key = version_key(model, using)
+    version = cache.get(key)
+    if version is None:
+        # an evicted version must not start over with keys cached before
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump(model, using):
+    cache = get_cache()
+    try:
+        cache.incr(version_key(model, using))
+    except ValueError:
+        # never read - nothing to invalidate
+        pass
+
+
+def invalidate(model, using):
+    """
+    Increase the version of model right away and once more after the commit,
+    so rows read by others before the commit don't stay in the cache.
+    """
+    if not is_cached(model):
+        return
+    using = using or DEFAULT_DB_ALIAS
+    bump(model, using)
+    if transaction.get_connection(using).in_atomic_block:
+        transaction.on_commit(partial(bump, model, using), using=using)
+
+
+def row_key(model, using, pk):
+    return "%s:row:%s:%s:%s:%s" % (
+        get_config()["KEY_PREFIX"],
+        using,
+        model._meta.label_lower,
+        get_version(model, using),
+        pk,
+    )
+
+
+def cached_get(queryset, pk):
+    """queryset.get(pk=pk) - from the cache if possible."""
+    model = queryset.model
+    if not is_cached(model):
+        return queryset.get(pk=pk)
+    cache = get_cache()
+    key = row_key(model, queryset.db, pk)
+    obj = cache.get(key)
+    if obj is None:
+        obj = queryset.get(pk=pk)
+        cache.set(key, obj, get_timeout(model))
+    return obj
+
+
+def queryset_key(queryset):
+    sql, params = queryset.query.get_compiler(queryset.db).as_sql()
+    digest = hashlib.md5(repr((sql, params)).encode("utf-8")).hexdigest()
+    return "%s:list:%s:%s:%s:%s" % (
+        get_config()["KEY_PREFIX"],
+        queryset.db,
+        queryset.model._meta.label_lower,
+        get_version(queryset.model, queryset.db),
+        digest,
+    )
+
+
+def cached_list(queryset, timeout=None):
+    """The results of queryset as a list - from the cache if possible."""
+    model = queryset.model
+    if not is_cached(model):
+        return list(queryset)
+    try:
+        key = queryset_key(queryset)
+    except EmptyResultSet:
+        return []
+    cache = get_cache()
+    results = cache.get(key)
+    if results is None:
+        results = list(queryset)
+        cache.set(key, results, timeout or get_timeout(model))
+    return results
+
+
+def invalidate_saved(sender, instance, using, **kwargs):
+    invalidate(sender, using)
+
+
+def add_row_caching(sender, **kwargs):
+    """Invalidate the cache of models with cache_rows whenever a row gets saved."""
+    if not is_cached(sender) or sender._meta.abstract:
+        return
+    post_save.connect(invalidate_saved, sender=sender)
@@ -0,0 +1,166 @@
+# coding=utf-8
+from __future__ import absolute_import, unicode_literals
+
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models.signals import post_save
+
+STATES = ("live", "deleted", "visible")
+
+
+def is_tracked(model):
+    return getattr(model, "track_counts", False)
+
+
+def get_cache():
+    return caches[getattr(settings, "UNDELETABLE_COUNTS_CACHE", "default")]
+
+
+def counter_key(model, state, using):
+    # proxy models share the counters of their concrete model
+    label = model._meta.concrete_model._meta.label_lower
+    return "undeletable:count:%s:%s:%s" % (using, label, state)
+
+
+def state_queryset(model, state, using):
+    manager = model.data.db_manager(using)
+    if state == "live":
+        return manager.get_queryset()
+    if state == "deleted":
+        # archived rows are deleted rows as well
+        return manager.deleted(include_archived=True)
+    if state == "visible":
+        return manager.visible()
+    raise ValueError("Unknown state %r, use one of %s." % (state, ", ".join(STATES)))
+
+
+def fast_count(model, state="live", using=None):
+    """
+    The number of live, deleted or visible rows of model. Models with
+    track_counts = True only count once and keep the result in the cache
+    (see UNDELETABLE_COUNTS_CACHE), all others are counted every time.
+    """
+    using = using or DEFAULT_DB_ALIAS
+    if not is_tracked(model):
+        return state_queryset(model, state, using).count()
+
+    cache = get_cache()
+    key = counter_key(model, state, using)
+    count = cache.get(key)
+    if count is None:
+        count = state_queryset(model, state, using).count()
+        cache.add(key, count, timeout=None)
+    return count
+
+
+def _incr(deltas):
+    cache = get_cache()
+    for key, delta in deltas:
+        try:
+            cache.incr(key, delta)
+        except ValueError:
+            # not counted yet - the next read does that
+            pass
+
+
+def adjust(model, using, **deltas):
+    """
+    Change the cached counters once the transaction is committed,
+    e.g. adjust(model, using, live=-1, deleted=1).
+    """
+    if not is_tracked(model):
+        return
+    using = using or DEFAULT_DB_ALIAS
+    deltas = [
+        (counter_key(model, state, using), delta)
+        for state, delta in deltas.items()
+        if delta
+    ]
+    if deltas:
+        transaction.on_commit(partial(_incr, deltas), using=using)
+
+
+def adjust_row(model, using, row_delta, deleted, concealed):
+    """Count a single row into (row_delta=1) or out of (-1) the states it is in."""
+    if deleted is not None:
+        adjust(model, using, deleted=row_delta)
+    else:
+        adjust(model, using, live=row_delta, visible=0 if concealed else row_delta)
+
+
+def count_deletion(model, using, concealed):
+    adjust_row(model, using, -1, None, concealed)
+    adjust(model, using, deleted=1)
+
+
+def count_undeletion(model, using, concealed):
+    adjust(model, using, deleted=-1)
+    adjust_row(model, using, 1, None, concealed)
+
+
+def count_bulk_deletion(model, using, count, visible):
+    """
+    Count rows soft deleted by a bulk operation - visible is how many of them
+    were visible, None if that isn't known (which forgets the visible counter).
+    """
+    if not count:
+        return
+    adjust(model, using, live=-count, deleted=count)
+    if visible is None:
+        invalidate(model, using, ("visible",))
+    else:
+        adjust(model, using, visible=-visible)
+
+
+def count_bulk_undeletion(model, using, count, visible):
+    """The opposite of count_bulk_deletion()."""
+    if not count:
+        return
+    adjust(model, using, live=count, deleted=-count)
+    if visible is None:
+        invalidate(model, using, ("visible",))
+    else:
+        adjust(model, using, visible=visible)
+
+
+def invalidate(model, using, states=STATES):
+    """
+    Forget counters once the transaction is committed - bulk operations
+    can't tell which state their rows were in before.
+    """
+    if not is_tracked(model):
+        return
+    using = using or DEFAULT_DB_ALIAS
+    keys = [counter_key(model, state, using) for state in states]
+    transaction.on_commit(partial(get_cache().delete_many, keys), using=using)
+
+
+def reconcile(model, using=None):
+    """Count all states of model again and store the results."""
+    using = using or DEFAULT_DB_ALIAS
+    counts = dict(
+        (state, state_queryset(model, state, using).count()) for state in STATES
+    )
+    get_cache().set_many(
+        dict(
+            (counter_key(model, state, using), count)
+            for state, count in counts.items()
+        ),
+        timeout=None,
+    )
+    return counts
+
+
+def count_created(sender, instance, created, raw, using, **kwargs):
+    if created and not raw:
+        adjust_row(sender, using, 1, instance.deleted, instance.concealed)
+
+
+def add_count_tracking(sender, **kwargs):
+    """Count new rows of models with track_counts = True."""
+    if not is_tracked(sender) or sender._meta.abstract:
+        return
+    post_save.connect(count_created, sender=sender)
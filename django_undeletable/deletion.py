@@ -0,0 +1,229 @@
+# coding=utf-8
+from __future__ import absolute_import, unicode_literals
+
+import uuid
+from collections import Counter, OrderedDict
+
+from django.apps import apps
+from django.db import connections, models
+from django.db.models.deletion import (
+    RestrictedError,
+    get_candidate_relations_to_delete,
+)
+from django.db.models.signals import pre_delete, post_delete
+from django.utils.timezone import now
+
+from . import counters
+from .archive import restore_archived
+from .instrumentation import send
+from .signals import bulk_soft_deleted, bulk_undeleted
+from .state import live_q
+
+
+def is_undeletable(model):
+    from .base import BaseModel
+
+    return issubclass(model, BaseModel)
+
+
+def has_delete_receivers(model):
+    return pre_delete.has_listeners(model) or post_delete.has_listeners(model)
+
+
+def pk_batches(pks, using):
+    """Split pks into chunks small enough for a single pk__in lookup."""
+    batch_size = max(connections[using].ops.bulk_batch_size(["pk"], pks), 1)
+    return [pks[i : i + batch_size] for i in range(0, len(pks), batch_size)]
+
+
+class SoftDeleteCollector(object):
+    """
+    The soft deleting counterpart of django.db.models.deletion.Collector.
+
+    Starting from a list of primary keys it walks the reverse relations and honours
+    their on_delete handlers: CASCADE soft deletes dependent undeletable rows,
+    PROTECT and RESTRICT raise, SET_NULL, SET_DEFAULT and SET() update the foreign
+    key. Only primary keys are loaded - dependent instances are only fetched if
+    there are receivers for the delete signals - and every model is updated with
+    one UPDATE per batch.
+    """
+
+    def __init__(self, using):
+        self.using = using
+        # model -> primary keys already handled (including the starting rows)
+        self.seen = {}
+        # model -> primary keys of dependent rows to soft delete
+        self.data = OrderedDict()
+        # (field, value, queryset) of dependent rows keeping their rows alive
+        self.field_updates = []
+        # (field, queryset) of dependent rows only deletable through a cascade
+        self.restricted = []
+
+    def collect(self, model, pks):
+        """
+        Collect everything depending on the given rows of model.
+        Raises ProtectedError / RestrictedError before anything has been written.
+        """
+        self.seen.setdefault(model, set()).update(pks)
+        self._collect(model, list(pks))
+
+        for field, dependents in self.restricted:
+            collected = self.seen.get(field.model, ())
+            blocking = dependents.exclude(pk__in=list(collected))
+            if blocking.exists():
+                raise RestrictedError(
+                    "Cannot delete some instances of model %r because they are "
+                    "referenced through restricted foreign keys: '%s.%s'."
+                    % (model.__name__, field.model.__name__, field.name),
+                    set(blocking),
+                )
+
+    def _collect(self, model, pks):
+        if not pks:
+            return
+
+        for related in get_candidate_relations_to_delete(model._meta):
+            field = related.field
+            if field.remote_field.parent_link:
+                # the child row shares the deleted column of its parent
+                continue
+            on_delete = field.remote_field.on_delete
+            if on_delete is models.DO_NOTHING:
+                continue
+
+            related_model = related.related_model
+            dependents = self.related_queryset(model, field, pks)
+
+            if on_delete is models.CASCADE:
+                if not is_undeletable(related_model):
+                    # the referenced row still exists - nothing to do
+                    continue
+                seen = self.seen.setdefault(related_model, set())
+                new_pks = [
+                    pk
+                    for pk in dependents.values_list("pk", flat=True)
+                    if pk not in seen
+                ]
+                seen.update(new_pks)
+                self.data.setdefault(related_model, []).extend(new_pks)
+                self._collect(related_model, new_pks)
+                continue
+
+            if not dependents.exists():
+                continue
+            if on_delete is models.RESTRICT:
+                self.restricted.append((field, dependents))
+            else:
+                # PROTECT raises, the SET_* handlers call add_field_update()
+                on_delete(self, field, dependents, self.using)
+
+    def related_queryset(self, model, field, pks):
+        """All live rows pointing to the given rows of model through field."""
+        related_model = field.model
+        values = pks
+        if not field.target_field.primary_key:
+            values = list(
+                model.data.get_full_queryset()
+                .using(self.using)
+                .filter(pk__in=pks)
+                .values_list(field.target_field.attname, flat=True)
+            )
+        if is_undeletable(related_model):
+            queryset = related_model.data.get_full_queryset().filter(
+                live_q(related_model)
+            )
+        else:
+            queryset = related_model._base_manager.all()
+        return (
+            queryset.using(self.using)
+            .filter(**{"%s__in" % field.attname: values})
+            .order_by()
+        )
+
+    def add_field_update(self, field, value, objs):
+        """Called by the SET_NULL, SET_DEFAULT and SET() handlers."""
+        self.field_updates.append((field, value, objs))
+
+    def delete(self, timestamp, deletion_batch=None, operation=None):
+        """
+        Write everything collected, returns the number of soft deleted rows per model.
+        operation is sent with bulk_soft_deleted, a new one unless given.
+        """
+        counter = Counter()
+        if operation is None:
+            operation = uuid.uuid4()
+
+        for field, value, queryset in self.field_updates:
+            queryset.update(**{field.name: value})
+
+        for model, pks in self.data.items():
+            notify = has_delete_receivers(model)
+            for chunk in pk_batches(pks, self.using):
+                queryset = model.data.get_full_queryset().using(self.using)
+                queryset = queryset.filter(live_q(model), pk__in=chunk)
+                to_be_notified = []
+                if notify:
+                    to_be_notified = list(queryset)
+                for obj in to_be_notified:
+                    send(pre_delete, sender=model, instance=obj, using=self.using)
+
+                counter[model._meta.label] += queryset.update(
+                    deleted=timestamp, deletion_batch=deletion_batch
+                )
+                send(
+                    bulk_soft_deleted,
+                    sender=model,
+                    pks=chunk,
+                    using=self.using,
+                    deletion_batch=deletion_batch,
+                    operation=operation,
+                )
+
+                for obj in to_be_notified:
+                    send(post_delete, sender=model, instance=obj, using=self.using)
+            counters.count_bulk_deletion(
+                model, self.using, counter[model._meta.label], None
+            )
+
+        return dict(counter)
+
+
+def restore_batch(batch, using=None):
+    """
+    Undelete all rows of all undeletable models stamped with the given deletion batch,
+    using one UPDATE per table. Returns the total and the number of rows per model
+    like QuerySet.delete() does.
+    Foreign keys changed by SET_NULL & co. during a cascade are not restored.
+    """
+    counter = Counter()
+    timestamp = now()
+    for model in apps.get_models():
+        if not is_undeletable(model):
+            continue
+        local_fields = [f.name for f in model._meta.local_concrete_fields]
+        if "deletion_batch" not in local_fields:
+            # the parent table gets restored on its own
+            continue
+        count = (
+            model.data.get_full_queryset()
+            .using(using)
+            .filter(deletion_batch=batch)
+            ._update_and_send(
+                bulk_undeleted,
+                None,
+                {"deleted": None, "deletion_batch": None, "modified": timestamp},
+            )
+        )
+        archive_model = getattr(model, "archive_model", None)
+        if archive_model is not None:
+            count += restore_archived(
+                model,
+                archive_model._base_manager.using(using).filter(deletion_batch=batch),
+                deleted=None,
+                deletion_batch=None,
+                modified=timestamp,
+            )
+        if count:
+            counters.count_bulk_undeletion(model, using, count, None)
+            counter[model._meta.label] += count
+    return sum(counter.values()), dict(counter)
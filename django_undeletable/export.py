@@ -0,0 +1,109 @@
+# coding=utf-8
+"""
+Streaming exports of undeletable tables as JSON lines or CSV.
+
+    with open("tags.jsonl", "w") as f:
+        rows, mark = Tag.data.deleted().export(f, since=last_mark)
+
+Rows are fetched as tuples with iterator(chunk_size) - using server-side cursors
+where the database supports them - so the memory needed doesn't depend on the
+size of the table. With since only rows modified or deleted after that moment
+are written; the returned high water mark is the since of the next run.
+Undeleting, concealing and revealing set modified as well, so these changes
+are picked up too.
+"""
+from __future__ import absolute_import, unicode_literals
+
+import csv
+import json
+
+from django.db.models import Q
+
+FORMATS = ("jsonl", "csv")
+
+
+def changed_since(queryset, since):
+    """The rows of queryset modified or deleted after since."""
+    q = Q(modified__gt=since) | Q(deleted__gt=since)
+    if not queryset.query.combinator:
+        return queryset.filter(q)
+    # deleted(include_archived=True) is a union - filter every part of it
+    queryset = queryset.all()
+    parts = []
+    for query in queryset.query.combined_queries:
+        query = query.chain()
+        query.add_q(q)
+        parts.append(query)
+    queryset.query.combined_queries = tuple(parts)
+    return queryset
+
+
+def export_fields(queryset, fields=None):
+    if fields:
+        return list(fields)
+    return [f.attname for f in queryset.model._meta.concrete_fields]
+
+
+def export_value(value):
+    """Dates and times with microseconds (unlike DjangoJSONEncoder), UUIDs etc. as str."""
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return str(value)
+
+
+def jsonl_writer(stream, fields):
+    def write(row):
+        stream.write(json.dumps(dict(zip(fields, row)), default=export_value) + "\n")
+
+    return write
+
+
+def csv_writer(stream, fields):
+    writer = csv.writer(stream)
+    writer.writerow(fields)
+
+    def write(row):
+        writer.writerow(
+            [
+                value if value is None or isinstance(value, (str, int, float))
+                else export_value(value)
+                for value in row
+            ]
+        )
+
+    return write
+
+
+def export(queryset, stream, format="jsonl", fields=None, since=None, chunk_size=2000):
+    """
+    Write the rows of queryset to a text stream, returns the number of rows
+    and the high water mark - the latest modified or deleted timestamp
+    written (None without rows).
+    """
+    if format not in FORMATS:
+        raise ValueError(
+            "Unknown format %r, use one of %s." % (format, ", ".join(FORMATS))
+        )
+    fields = export_fields(queryset, fields)
+    if queryset.query.combinator:
+        # a union can only be ordered by the selected columns
+        queryset = queryset.order_by()
+    if since is not None:
+        queryset = changed_since(queryset, since)
+
+    write = (jsonl_writer if format == "jsonl" else csv_writer)(stream, fields)
+    # the timestamps are needed for the mark, whatever fields are exported
+    columns = fields + [name for name in ("modified", "deleted") if name not in fields]
+    positions = [columns.index("modified"), columns.index("deleted")]
+    width = len(fields)
+
+    count = 0
+    mark = None
+    for row in queryset.values_list(*columns).iterator(chunk_size=chunk_size):
+        write(row[:width])
+        count += 1
+        for position in positions:
+            timestamp = row[position]
+            if timestamp is not None and (mark is None or timestamp > mark):
+                mark = timestamp
+    return count, mark
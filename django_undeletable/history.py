@@ -0,0 +1,58 @@
+# coding=utf-8
+"""
+Rebuilding the past from the created and deleted timestamps.
+
+A row was live at a moment if it was created before and not deleted yet,
+Model.data.as_of(timestamp) returns these rows. Model.data.between(start, end)
+yields an Event for every row created or deleted within start < t <= end in
+the order they happened, so consecutive calls can continue where the last one
+stopped.
+
+The deletion of an undeleted row is forgotten, and rows moved into the archive
+table are only in there - pass Model.archive_model.objects.all() to as_of() and
+between() of this module to include them.
+Set history_index = True on big models to index created and deleted for this.
+"""
+from __future__ import absolute_import, unicode_literals
+
+from collections import namedtuple
+from heapq import merge
+
+from django.db.models import Q
+
+CREATED = "created"
+DELETED = "deleted"
+
+Event = namedtuple("Event", "timestamp action instance")
+
+
+def as_of_q(timestamp):
+    return Q(created__lte=timestamp) & (
+        Q(deleted__isnull=True) | Q(deleted__gt=timestamp)
+    )
+
+
+def as_of(queryset, timestamp):
+    """The rows of queryset that were live at timestamp."""
+    return queryset.filter(as_of_q(timestamp))
+
+
+def _events(queryset, action, start, end, chunk_size):
+    queryset = queryset.filter(
+        **{"%s__gt" % action: start, "%s__lte" % action: end}
+    ).order_by(action, "pk")
+    for obj in queryset.iterator(chunk_size=chunk_size):
+        yield Event(getattr(obj, action), action, obj)
+
+
+def between(queryset, start, end, chunk_size=2000):
+    """
+    Generate an Event(timestamp, action, instance) for every row of queryset
+    created or deleted within start < timestamp <= end, ordered by timestamp.
+    Both kinds are streamed in chunks with one query each.
+    """
+    return merge(
+        _events(queryset, CREATED, start, end, chunk_size),
+        _events(queryset, DELETED, start, end, chunk_size),
+        key=lambda event: event.timestamp,
+    )
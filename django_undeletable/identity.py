@@ -0,0 +1,167 @@
+# coding=utf-8
+"""
+An identity map for primary key lookups.
+
+Within identity_map() (or a request handled by IdentityMapMiddleware)
+Model.data.get(pk=...) and Model.data.in_bulk([...]) load every row only once
+and return the same instance for it afterwards:
+
+    with identity_map():
+        for book in books:
+            book.author_id and Author.data.get(pk=book.author_id)
+
+Every update of an undeletable model (delete, undelete, conceal, reveal, ...),
+save(), archive() and the real deletes drop the affected entries. Outside of a
+map nothing is cached.
+"""
+from __future__ import absolute_import, unicode_literals
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.core.exceptions import ValidationError
+from django.db.models.signals import post_save
+
+# the map of the current request or identity_map() block
+current_map = ContextVar("undeletable_identity_map", default=None)
+
+
+class IdentityMap(object):
+    """The instances loaded so far, per database and model."""
+
+    def __init__(self):
+        self.instances = {}
+
+    def get(self, model, using, pk):
+        return self.instances.get((using, model), {}).get(pk)
+
+    def add(self, obj, using):
+        self.instances.setdefault((using, type(obj)), {})[obj.pk] = obj
+
+    def discard(self, model, using, pk):
+        for key, instances in self.instances.items():
+            if key[0] == using and related(key[1], model):
+                instances.pop(pk, None)
+
+    def forget(self, model, using):
+        for key in list(self.instances):
+            if key[0] == using and related(key[1], model):
+                del self.instances[key]
+
+    def clear(self):
+        self.instances.clear()
+
+
+def related(model, other):
+    # proxies and multi-table children share rows with their parents
+    return (
+        model._meta.concrete_model is other._meta.concrete_model
+        or issubclass(model, other)
+        or issubclass(other, model)
+    )
+
+
+@contextmanager
+def identity_map():
+    """Use an identity map within the block - the outer one when nested."""
+    if current_map.get() is not None:
+        yield current_map.get()
+        return
+    token = current_map.set(IdentityMap())
+    try:
+        yield current_map.get()
+    finally:
+        current_map.reset(token)
+
+
+def lookup_pk(model, args, kwargs):
+    """The primary key of a lookup like get(pk=1) or get(id=1), None for anything else."""
+    if args or len(kwargs) != 1:
+        return None
+    (name, value), = kwargs.items()
+    if name not in ("pk", model._meta.pk.attname):
+        return None
+    try:
+        return model._meta.pk.to_python(value)
+    except (ValidationError, TypeError, ValueError):
+        return None
+
+
+def get(queryset, pk):
+    """Get the row with pk from the map or queryset (adding it to the map)."""
+    identities = current_map.get()
+    obj = identities.get(queryset.model, queryset.db, pk)
+    if obj is None:
+        obj = queryset.get(pk=pk)
+        identities.add(obj, queryset.db)
+    return obj
+
+
+def in_bulk(queryset, pks):
+    """
+    in_bulk() only loading the rows missing in the map - with one query.
+    Rows in the map not matching queryset (like deleted ones) are left out.
+    """
+    identities = current_map.get()
+    model, using = queryset.model, queryset.db
+    found = {}
+    missing = []
+    for pk in pks:
+        obj = identities.get(model, using, pk)
+        if obj is None:
+            missing.append(pk)
+        elif obj.deleted is None:
+            found[pk] = obj
+    if missing:
+        loaded = queryset.in_bulk(missing)
+        for obj in loaded.values():
+            identities.add(obj, using)
+        found.update(loaded)
+    return found
+
+
+def forget(model, using):
+    """Drop all rows of model (and the models sharing its tables)."""
+    identities = current_map.get()
+    if identities is not None:
+        identities.forget(model, using)
+
+
+def clear():
+    identities = current_map.get()
+    if identities is not None:
+        identities.clear()
+
+
+def discard_instance(sender, instance, using, **kwargs):
+    identities = current_map.get()
+    if identities is not None:
+        identities.discard(sender, using, instance.pk)
+
+
+# a post_delete receiver would turn off the fast deletes of all models,
+# the real deletes drop their entries themselves
+post_save.connect(discard_instance)
+
+
+class IdentityMapMiddleware(object):
+    """Use one identity map per request."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with identity_map():
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        with identity_map():
+            return await self.get_response(request)
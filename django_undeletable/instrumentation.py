@@ -0,0 +1,267 @@
+# coding=utf-8
+"""
+Timers and counters around the soft delete operations.
+
+Enable them with a backend receiving one Record per operation:
+
+    UNDELETABLE_INSTRUMENTATION = {
+        "BACKEND": "django_undeletable.instrumentation.LoggingBackend",
+        "OPTIONS": {"level": logging.DEBUG},
+    }
+
+Without the setting every instrumented method only costs one extra function call.
+"""
+from __future__ import absolute_import, unicode_literals
+
+import logging
+from contextvars import ContextVar
+from functools import wraps
+from inspect import iscoroutine, iscoroutinefunction
+from time import perf_counter
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import connections, models
+from django.db.backends.signals import connection_created
+from django.utils.module_loading import import_string
+
+# the record of the operation running right now
+current_record = ContextVar("undeletable_record", default=None)
+
+_NOT_LOADED = object()
+_backend = _NOT_LOADED
+
+
+class Record(object):
+    """What a single operation did and how long it took."""
+
+    def __init__(self, operation, model):
+        self.operation = operation
+        self.model = model
+        self.rows = None
+        self.queries = 0
+        self.seconds = 0.0
+        self.signal_seconds = 0.0
+
+    def as_dict(self):
+        return dict(self.__dict__)
+
+    def __repr__(self):
+        return "<Record %s %s: %s rows, %s queries>" % (
+            self.model,
+            self.operation,
+            self.rows,
+            self.queries,
+        )
+
+
+class BaseBackend(object):
+    def __init__(self, **options):
+        pass
+
+    def record(self, record):
+        raise NotImplementedError
+
+
+class LoggingBackend(BaseBackend):
+    def __init__(self, logger="django_undeletable", level=logging.INFO, **options):
+        super(LoggingBackend, self).__init__(**options)
+        self.logger = logging.getLogger(logger)
+        self.level = level
+
+    def record(self, record):
+        self.logger.log(
+            self.level,
+            "%s %s: %s rows, %s queries in %.2f ms (%.2f ms in signal receivers)",
+            record.model,
+            record.operation,
+            record.rows,
+            record.queries,
+            record.seconds * 1000,
+            record.signal_seconds * 1000,
+            extra={"undeletable": record.as_dict()},
+        )
+
+
+class CallbackBackend(BaseBackend):
+    """
+    Statsd style metrics: callback(name, value, tags) is called for every metric,
+    e.g. undeletable.delete.ms with tags {"model": "shop.Basket"}.
+    """
+
+    def __init__(self, callback, prefix="undeletable", **options):
+        super(CallbackBackend, self).__init__(**options)
+        if isinstance(callback, str):
+            callback = import_string(callback)
+        self.callback = callback
+        self.prefix = prefix
+
+    def record(self, record):
+        name = "%s.%s" % (self.prefix, record.operation)
+        tags = {"model": record.model}
+        self.callback(name + ".ms", record.seconds * 1000, tags)
+        self.callback(name + ".signal_ms", record.signal_seconds * 1000, tags)
+        self.callback(name + ".queries", record.queries, tags)
+        if record.rows is not None:
+            self.callback(name + ".rows", record.rows, tags)
+
+
+class MemoryBackend(BaseBackend):
+    """Keeps all records in a list, e.g. for tests."""
+
+    def __init__(self, **options):
+        super(MemoryBackend, self).__init__(**options)
+        self.records = []
+
+    def record(self, record):
+        self.records.append(record)
+
+
+def load_backend(config):
+    if not config:
+        return None
+    backend_class = import_string(config["BACKEND"])
+    return backend_class(**config.get("OPTIONS", {}))
+
+
+def get_backend():
+    global _backend
+    if _backend is _NOT_LOADED:
+        _backend = load_backend(getattr(settings, "UNDELETABLE_INSTRUMENTATION", None))
+    return _backend
+
+
+def reset_backend(setting, **kwargs):
+    global _backend
+    if setting == "UNDELETABLE_INSTRUMENTATION":
+        _backend = _NOT_LOADED
+
+
+setting_changed.connect(reset_backend)
+
+
+def count_query(execute, sql, params, many, context):
+    record = current_record.get()
+    if record is not None:
+        record.queries += 1
+    return execute(sql, params, many, context)
+
+
+def install_query_counter(connection):
+    if count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(count_query)
+
+
+def install_query_counters():
+    for connection in connections.all(initialized_only=True):
+        install_query_counter(connection)
+
+
+def add_query_counter(sender, connection, **kwargs):
+    if get_backend() is not None:
+        install_query_counter(connection)
+
+
+connection_created.connect(add_query_counter)
+
+
+def count_rows(result):
+    # update() returns a number, Django's delete() a tuple
+    if isinstance(result, tuple):
+        result = result[0]
+    return result if isinstance(result, int) else None
+
+
+def one_row(result):
+    return 1
+
+
+def instrumented(operation, rows=count_rows):
+    """
+    Record the wrapped method (of a queryset, manager or model instance)
+    as operation. Operations called by an instrumented operation are part
+    of its record.
+    """
+
+    def start(obj):
+        if isinstance(obj, models.Model):
+            model = obj._meta.label
+        else:
+            model = obj.model._meta.label
+        record = Record(operation, model)
+        return record, current_record.set(record), perf_counter()
+
+    def finish(record, token, started, result):
+        record.seconds = perf_counter() - started
+        current_record.reset(token)
+        record.rows = rows(result)
+        get_backend().record(record)
+
+    def decorator(method):
+        if iscoroutinefunction(method):
+
+            @wraps(method)
+            async def async_wrapper(self, *args, **kwargs):
+                if get_backend() is None or current_record.get() is not None:
+                    return await method(self, *args, **kwargs)
+                # the queries run in the thread owning the connections
+                await sync_to_async(install_query_counters)()
+                record, token, started = start(self)
+                try:
+                    result = await method(self, *args, **kwargs)
+                except BaseException:
+                    current_record.reset(token)
+                    raise
+                finish(record, token, started, result)
+                return result
+
+            return async_wrapper
+
+        @wraps(method)
+        def wrapper(self, *args, **kwargs):
+            if get_backend() is None or current_record.get() is not None:
+                return method(self, *args, **kwargs)
+            install_query_counters()
+            record, token, started = start(self)
+            try:
+                result = method(self, *args, **kwargs)
+            except BaseException:
+                current_record.reset(token)
+                raise
+            finish(record, token, started, result)
+            return result
+
+        return wrapper
+
+    return decorator
+
+
+def send(signal, **kwargs):
+    """Send a signal, adding the time spent in its receivers to the current record."""
+    record = current_record.get()
+    if record is None:
+        return signal.send(**kwargs)
+    started = perf_counter()
+    try:
+        return signal.send(**kwargs)
+    finally:
+        record.signal_seconds += perf_counter() - started
+
+
+async def asend(signal, **kwargs):
+    """Async version of send(), Signal.asend() is new in Django 5.0."""
+    record = current_record.get()
+    started = perf_counter()
+    try:
+        if hasattr(signal, "asend"):
+            return await signal.asend(**kwargs)
+        # the coroutines of async receivers are returned by send(), not awaited
+        responses = await sync_to_async(signal.send)(**kwargs)
+        return [
+            (receiver, await response if iscoroutine(response) else response)
+            for receiver, response in responses
+        ]
+    finally:
+        if record is not None:
+            record.signal_seconds += perf_counter() - started
@@ -0,0 +1,120 @@
+# coding=utf-8
+from __future__ import absolute_import, unicode_literals
+
+import json
+import os
+
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from django_undeletable.counters import state_queryset
+from django_undeletable.deletion import is_undeletable
+from django_undeletable.export import FORMATS
+
+STATES = ("all", "live", "deleted", "visible")
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream the rows of an undeletable model as JSON lines or CSV, optionally "
+        "only the ones changed since the last run (see --state-file)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("model", metavar="app_label.ModelName")
+        parser.add_argument("--state", choices=STATES, default="all")
+        parser.add_argument("--format", choices=FORMATS, default="jsonl")
+        parser.add_argument(
+            "--output", help="Write into this file instead of the standard output."
+        )
+        parser.add_argument(
+            "--fields", help="Comma separated columns (defaults to all of them)."
+        )
+        parser.add_argument("--chunk-size", type=int, default=2000)
+        parser.add_argument("--database", default=DEFAULT_DB_ALIAS)
+        parser.add_argument(
+            "--since",
+            help="Only rows modified or deleted after this ISO 8601 timestamp.",
+        )
+        parser.add_argument(
+            "--state-file",
+            help="JSON file keeping the high water mark of every export: "
+            "only rows changed since the last run get exported.",
+        )
+
+    def handle(self, *args, **options):
+        model = self.get_model(options["model"])
+        using = options["database"]
+        key = "%s:%s:%s" % (using, model._meta.label, options["state"])
+        marks = self.read_marks(options["state_file"])
+
+        since = options["since"] or marks.get(key)
+        if since is not None:
+            since = self.parse_timestamp(since)
+
+        queryset = self.get_queryset(model, options["state"], using)
+        fields = options["fields"].split(",") if options["fields"] else None
+        stream = self.stdout
+        if options["output"]:
+            stream = open(options["output"], "w", encoding="utf-8", newline="")
+        try:
+            count, mark = queryset.export(
+                stream,
+                format=options["format"],
+                fields=fields,
+                since=since,
+                chunk_size=options["chunk_size"],
+            )
+        finally:
+            if options["output"]:
+                stream.close()
+
+        if options["state_file"] and mark is not None:
+            marks[key] = mark.isoformat()
+            self.write_marks(options["state_file"], marks)
+        self.stderr.write(
+            "%s: %s rows exported (high water mark %s)"
+            % (model._meta.label, count, mark.isoformat() if mark else since)
+        )
+
+    def get_model(self, label):
+        try:
+            model = apps.get_model(label)
+        except (LookupError, ValueError) as e:
+            raise CommandError(str(e))
+        if not is_undeletable(model):
+            raise CommandError("%s is not an undeletable model." % label)
+        return model
+
+    def get_queryset(self, model, state, using):
+        if state != "all":
+            return state_queryset(model, state, using)
+        queryset = model.data.db_manager(using).get_full_queryset()
+        archive_model = getattr(model, "archive_model", None)
+        if archive_model is not None:
+            archived = archive_model._base_manager.using(using).order_by()
+            queryset = queryset.order_by().union(archived, all=True)
+        return queryset
+
+    def parse_timestamp(self, value):
+        timestamp = parse_datetime(value)
+        if timestamp is None:
+            raise CommandError("%r is not an ISO 8601 timestamp." % value)
+        if timezone.is_naive(timestamp):
+            timestamp = timezone.make_aware(timestamp)
+        return timestamp
+
+    def read_marks(self, path):
+        if not path or not os.path.exists(path):
+            return {}
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def write_marks(self, path, marks):
+        # never leave a half written file behind
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(marks, f, indent=2, sort_keys=True)
+        os.replace(path + ".tmp", path)
@@ -0,0 +1,105 @@
+# coding=utf-8
+from __future__ import absolute_import, unicode_literals
+
+from datetime import timedelta
+
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+
+from django_undeletable.deletion import is_undeletable
+from django_undeletable.purge import get_retention
+
+
+class Command(BaseCommand):
+    help = (
+        "Really delete soft deleted rows older than their retention "
+        "(see the UNDELETABLE_RETENTION setting) in small chunks."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "models",
+            nargs="*",
+            metavar="app_label.ModelName",
+            help="Only purge these models (defaults to all models with a retention).",
+        )
+        parser.add_argument(
+            "--days",
+            type=float,
+            help="Purge rows deleted more than this many days ago, "
+            "overriding the configured retention.",
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=0,
+            help="Seconds to sleep between two chunks.",
+        )
+        parser.add_argument(
+            "--after",
+            help="Resume an interrupted run after this primary key (single model only).",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only count the rows that would be purged.",
+        )
+
+    def handle(self, *args, **options):
+        labels = options["models"]
+        if options["after"] is not None and len(labels) != 1:
+            raise CommandError("--after can only be used for a single model.")
+
+        older_than = None
+        if options["days"] is not None:
+            older_than = timedelta(days=options["days"])
+
+        for model in self.get_models(labels):
+            retention = older_than
+            if retention is None:
+                retention = get_retention(model)
+            if retention is None:
+                if labels:
+                    raise CommandError(
+                        "No retention configured for %s, use --days."
+                        % model._meta.label
+                    )
+                continue
+
+            label = model._meta.label
+            count = model.data.purge(
+                retention,
+                batch_size=options["batch_size"],
+                sleep=options["sleep"],
+                dry_run=options["dry_run"],
+                after=options["after"],
+                progress=lambda purged, last_pk: self.stdout.write(
+                    "%s: %s rows purged (last pk %s)" % (label, purged, last_pk)
+                ),
+            )
+            if options["dry_run"]:
+                self.stdout.write("%s: %s rows would be purged" % (label, count))
+            else:
+                self.stdout.write(
+                    self.style.SUCCESS("%s: %s rows purged" % (label, count))
+                )
+
+    def get_models(self, labels):
+        if not labels:
+            return [
+                model
+                for model in apps.get_models()
+                if is_undeletable(model) and not model._meta.proxy
+            ]
+
+        models = []
+        for label in labels:
+            try:
+                model = apps.get_model(label)
+            except (LookupError, ValueError) as e:
+                raise CommandError(str(e))
+            if not is_undeletable(model):
+                raise CommandError("%s is not an undeletable model." % label)
+            models.append(model)
+        return models
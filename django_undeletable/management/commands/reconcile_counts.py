@@ -0,0 +1,67 @@
+# coding=utf-8
+from __future__ import absolute_import, unicode_literals
+
+import time
+
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from django_undeletable.counters import is_tracked, reconcile
+from django_undeletable.deletion import is_undeletable
+
+
+class Command(BaseCommand):
+    help = (
+        "Count the live, deleted and visible rows of models with track_counts = True "
+        "again and store the results, fixing counters that drifted."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "models",
+            nargs="*",
+            metavar="app_label.ModelName",
+            help="Only reconcile these models (defaults to all models tracking counts).",
+        )
+        parser.add_argument("--database", default=DEFAULT_DB_ALIAS)
+        parser.add_argument(
+            "--interval",
+            type=float,
+            help="Keep running and reconcile every this many seconds.",
+        )
+
+    def handle(self, *args, **options):
+        models = self.get_models(options["models"])
+        while True:
+            for model in models:
+                counts = reconcile(model, using=options["database"])
+                self.stdout.write(
+                    "%s: %s"
+                    % (
+                        model._meta.label,
+                        ", ".join("%s %s" % item for item in sorted(counts.items())),
+                    )
+                )
+            if not options["interval"]:
+                break
+            time.sleep(options["interval"])
+
+    def get_models(self, labels):
+        if not labels:
+            return [
+                model
+                for model in apps.get_models()
+                if is_undeletable(model) and is_tracked(model) and not model._meta.proxy
+            ]
+
+        models = []
+        for label in labels:
+            try:
+                model = apps.get_model(label)
+            except (LookupError, ValueError) as e:
+                raise CommandError(str(e))
+            if not is_undeletable(model) or not is_tracked(model):
+                raise CommandError("%s does not track its counts." % label)
+            models.append(model)
+        return models
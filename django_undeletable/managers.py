@@ -0,0 +1,552 @@
+# coding=utf-8
+"""The querysets and managers of undeletable models."""
+from __future__ import absolute_import, unicode_literals
+
+import uuid
+
+from asgiref.sync import sync_to_async
+from django.db import models, transaction
+from django.db.models import Q
+from django.db.models.query import QuerySet
+from django.db.models.signals import pre_delete, post_delete
+from django.utils.timezone import now
+
+from . import caching, counters, history, identity
+from .archive import archive, restore_archived
+from .deletion import (
+    SoftDeleteCollector,
+    has_delete_receivers,
+    pk_batches,
+    restore_batch,
+)
+from .export import export
+from .instrumentation import asend, instrumented, send
+from .prefetch import live_prefetches
+from .purge import get_retention, purge
+from .revive import get_or_revive, revive_or_create
+from .query import DataQuery
+from .signals import bulk_soft_deleted, bulk_undeleted, bulk_concealed, bulk_revealed
+from .state import deleted_q, is_compact, live_q, state_of, state_update, visible_q
+from .triggers import bypass_triggers
+
+
+# basic model managers
+##########################################
+class DataQuerySet(QuerySet):
+    def __init__(self, model=None, query=None, using=None, hints=None):
+        if query is None:
+            # hides deleted rows of related models in joins
+            query = DataQuery(model)
+        super(DataQuerySet, self).__init__(model, query, using, hints)
+
+    @instrumented("delete")
+    def delete(self, force=False, batch_size=None, cascade=False, batch=None):
+        """
+        Soft delete all matching rows.
+        With a batch_size the rows are handled in chunks walking the primary key,
+        so neither the instances nor the UPDATE lock have to cover everything at once.
+        With cascade the on_delete handlers of related rows are honoured as well
+        (see SoftDeleteCollector).
+        All rows get stamped with the same deletion batch (a new UUID unless given),
+        which restore_batch() can undo in one go. Rows that are deleted already
+        are left alone, they keep their deletion batch.
+        """
+        if force:
+            with bypass_triggers(self.model, self.db):
+                result = super(DataQuerySet, self).delete()
+            counters.invalidate(self.model, self.db)
+            caching.invalidate(self.model, self.db)
+            identity.clear()
+            return result
+        live = self.filter(live_q(self.model))
+        batch = batch or uuid.uuid4()
+        if batch_size or cascade:
+            return live._delete_in_batches(batch_size, cascade, batch)
+        if not has_delete_receivers(self.model):
+            # nobody is listening - no need to load anything
+            return live._mark_deleted(now(), batch)
+
+        # otherwise this list will be different in the next loop :)
+        to_be_notified = list(live)
+        for obj in to_be_notified:
+            send(pre_delete, sender=self.model, instance=obj, using=self._db)
+
+        qs = live._mark_deleted(now(), batch, [obj.pk for obj in to_be_notified])
+
+        for obj in to_be_notified:
+            send(post_delete, sender=self.model, instance=obj, using=self._db)
+
+        return qs
+
+    @instrumented("adelete")
+    async def adelete(self, force=False, batch_size=None, cascade=False, batch=None):
+        """
+        Async version of delete() sending the delete signals with asend().
+        Chunked and cascading deletes need a transaction, so they run in a
+        thread as a whole - just like force, which is Django's delete().
+        """
+        if force or batch_size or cascade:
+            return await sync_to_async(self.delete)(
+                force=force, batch_size=batch_size, cascade=cascade, batch=batch
+            )
+        live = self.filter(live_q(self.model))
+        batch = batch or uuid.uuid4()
+        if not has_delete_receivers(self.model):
+            return await sync_to_async(live._mark_deleted)(now(), batch)
+
+        to_be_notified = [obj async for obj in live]
+        for obj in to_be_notified:
+            await asend(pre_delete, sender=self.model, instance=obj, using=self._db)
+
+        qs = await sync_to_async(live._mark_deleted)(
+            now(), batch, [obj.pk for obj in to_be_notified]
+        )
+
+        for obj in to_be_notified:
+            await asend(post_delete, sender=self.model, instance=obj, using=self._db)
+
+        return qs
+
+    def _mark_deleted(self, timestamp, batch, pks=None, operation=None):
+        live = live_q(self.model)
+        count, visible = self.filter(live)._update_split(
+            bulk_soft_deleted,
+            pks,
+            {"deleted": timestamp, "deletion_batch": batch},
+            Q(concealed=False),
+            where=live,
+            deletion_batch=batch,
+            operation=operation,
+        )
+        counters.count_bulk_deletion(self.model, self.db, count, visible)
+        return count
+
+    def _update_and_send(self, signal, pks, values, where=None, **kwargs):
+        """
+        update() sending signal with the primary keys of the updated rows
+        (loaded first unless given) - once per chunk of rows. Given pks are
+        only updated if they match where. The chunks share one operation
+        unless it is given.
+        """
+        if not signal.has_listeners(self.model):
+            return self.update(**values)
+
+        if kwargs.get("operation") is None:
+            kwargs["operation"] = uuid.uuid4()
+        count = 0
+        with transaction.atomic(using=self.db, savepoint=False):
+            if pks is None:
+                pks = list(self.values_list("pk", flat=True))
+            for chunk in pk_batches(pks, self.db):
+                count += self._for_pks(chunk).filter(where or Q()).update(**values)
+                send(signal, sender=self.model, pks=chunk, using=self.db, **kwargs)
+        return count
+
+    def _update_split(self, signal, pks, values, split, where=None, **kwargs):
+        """
+        _update_and_send() with one UPDATE for the rows matching split and one
+        for the others on models with track_counts, so their counters can be
+        adjusted instead of counted again. split mustn't depend on values.
+        Given pks are counted first instead, so the signals still get every
+        chunk once. Returns the number of updated rows and how many of them
+        matched split - None for other models.
+        """
+        if kwargs.get("operation") is None:
+            kwargs["operation"] = uuid.uuid4()
+        if not counters.is_tracked(self.model):
+            return self._update_and_send(signal, pks, values, where, **kwargs), None
+        if pks is not None:
+            with transaction.atomic(using=self.db, savepoint=False):
+                matching = sum(
+                    self._for_pks(chunk).filter(where or Q(), split).count()
+                    for chunk in pk_batches(pks, self.db)
+                )
+                count = self._update_and_send(signal, pks, values, where, **kwargs)
+            return count, matching
+        with transaction.atomic(using=self.db, savepoint=False):
+            matching = self.filter(split)._update_and_send(
+                signal, None, values, **kwargs
+            )
+            others = self.exclude(split)._update_and_send(
+                signal, None, values, **kwargs
+            )
+        return matching + others, matching
+
+    def _delete_in_batches(self, batch_size, cascade, batch):
+        notify = has_delete_receivers(self.model)
+        queryset = self.order_by("pk")
+        timestamp = now()
+        # the chunks are one operation for the audit log
+        operation = uuid.uuid4()
+        count = 0
+        last_pk = None
+
+        while True:
+            chunk = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+            if notify:
+                to_be_notified = list(chunk[:batch_size])
+                pks = [obj.pk for obj in to_be_notified]
+            else:
+                to_be_notified = []
+                pks = list(chunk.values_list("pk", flat=True)[:batch_size])
+            if not pks:
+                break
+
+            if cascade:
+                collector = SoftDeleteCollector(using=self.db)
+                collector.collect(self.model, pks)
+
+            with transaction.atomic(using=self.db, savepoint=False):
+                for obj in to_be_notified:
+                    send(pre_delete, sender=self.model, instance=obj, using=self.db)
+
+                count += self._for_pks(pks)._mark_deleted(
+                    timestamp, batch, pks, operation
+                )
+                if cascade:
+                    collector.delete(timestamp, batch, operation)
+
+                for obj in to_be_notified:
+                    send(post_delete, sender=self.model, instance=obj, using=self.db)
+
+            if batch_size is None or len(pks) < batch_size:
+                break
+            last_pk = pks[-1]
+
+        return count
+
+    def update(self, **kwargs):
+        if is_compact(self.model):
+            state = state_update(kwargs)
+            if state is not None:
+                kwargs["state"] = state
+        count = super(DataQuerySet, self).update(**kwargs)
+        # every soft delete operation ends up here
+        caching.invalidate(self.model, self.db)
+        identity.forget(self.model, self.db)
+        return count
+
+    def _for_pks(self, pks):
+        # a fresh, unfiltered queryset - the rows might not match self anymore
+        return type(self)(self.model, using=self.db).filter(pk__in=pks)
+
+    @instrumented("undelete")
+    def undelete(self):
+        if self.query.combinator:
+            # deleted(include_archived=True), see DataManager.deleted
+            archive_model = getattr(self.model, "archive_model", None)
+            timestamp = now()
+            count = 0
+            for query in self.query.combined_queries:
+                if query.model is archive_model:
+                    # sends bulk_undeleted itself
+                    archived = restore_archived(
+                        self.model,
+                        QuerySet(archive_model, query=query.chain(), using=self.db),
+                        deleted=None,
+                        deletion_batch=None,
+                        modified=timestamp,
+                    )
+                    # the archive doesn't tell how many of them are concealed
+                    counters.count_bulk_undeletion(self.model, self.db, archived, None)
+                    count += archived
+                else:
+                    count += type(self)(
+                        self.model, query=query.chain(), using=self.db
+                    ).undelete()
+            return count
+        count, visible = self.filter(deleted_q(self.model))._update_split(
+            bulk_undeleted,
+            None,
+            {"deleted": None, "deletion_batch": None, "modified": now()},
+            Q(concealed=False),
+        )
+        counters.count_bulk_undeletion(self.model, self.db, count, visible)
+        return count
+
+    @instrumented("aundelete")
+    async def aundelete(self):
+        return await sync_to_async(self.undelete)()
+
+    def with_deleted_relations(self):
+        """
+        Lookups spanning relations match deleted related rows as well.
+        """
+        clone = self._chain()
+        if isinstance(clone.query, DataQuery):
+            clone.query.include_deleted_relations()
+        return clone
+
+    @instrumented("archive")
+    def archive(self, batch_size=1000):
+        """
+        Move the deleted rows out of the live table into the archive table
+        (see archive_deleted on BaseModel).
+        """
+        count = archive(self, batch_size)
+        caching.invalidate(self.model, self.db)
+        identity.forget(self.model, self.db)
+        return count
+
+    @instrumented("purge")
+    def purge(self, older_than=None, **kwargs):
+        """
+        Really delete the rows that have been soft deleted longer than older_than
+        (or the retention configured in UNDELETABLE_RETENTION) in small chunks.
+        See django_undeletable.purge.purge for the options.
+        """
+        count = purge(self.filter(deleted_q(self.model)), older_than, **kwargs)
+        counters.adjust(self.model, self.db, deleted=-count)
+        caching.invalidate(self.model, self.db)
+        identity.clear()
+        return count
+
+    @instrumented("conceal")
+    def conceal(self):
+        """
+        Some times you just want to be able to hide stuff from the public eye.
+        Use the visible manager method for your views instead to filter the data.
+        Like undelete() and reveal() it sets modified, so incremental exports
+        pick the change up.
+        """
+        return self._set_concealed(bulk_concealed, True)
+
+    @instrumented("reveal")
+    def reveal(self):
+        return self._set_concealed(bulk_revealed, False)
+
+    def _set_concealed(self, signal, concealed):
+        # only the rows that change, the live ones of them change visible()
+        count, live = self.exclude(concealed=concealed)._update_split(
+            signal, None, {"concealed": concealed, "modified": now()}, live_q(self.model)
+        )
+        if live is None:
+            counters.invalidate(self.model, self.db, ("visible",))
+        else:
+            counters.adjust(self.model, self.db, visible=-live if concealed else live)
+        return count
+
+    @instrumented("aconceal")
+    async def aconceal(self):
+        return await sync_to_async(self.conceal)()
+
+    @instrumented("areveal")
+    async def areveal(self):
+        return await sync_to_async(self.reveal)()
+
+    def bulk_create(self, objs, *args, **kwargs):
+        if is_compact(self.model):
+            objs = list(objs)
+            for obj in objs:
+                obj.state = state_of(obj.deleted, obj.concealed)
+        objs = super(DataQuerySet, self).bulk_create(objs, *args, **kwargs)
+        # no post_save signals to count the new rows
+        counters.invalidate(self.model, self.db)
+        caching.invalidate(self.model, self.db)
+        return objs
+
+    def as_of(self, timestamp):
+        """
+        The rows that were live at timestamp - use it on the manager
+        (Model.data.as_of()), the live rows of today would be too few.
+        """
+        return history.as_of(self, timestamp)
+
+    def between(self, start, end, chunk_size=2000):
+        """Generate the created and deleted events of start < t <= end (see history)."""
+        return history.between(self, start, end, chunk_size)
+
+    def export(self, stream, format="jsonl", fields=None, since=None, chunk_size=2000):
+        """
+        Stream the rows into a file as JSON lines or CSV with constant memory,
+        only the ones modified or deleted after since if given.
+        Returns the number of rows and the high water mark for the next since
+        (see django_undeletable.export).
+        """
+        return export(self, stream, format, fields, since, chunk_size)
+
+    def cached(self, timeout=None):
+        """
+        The results as a list, kept in the cache until the next write to
+        the model (for models with cache_rows, see django_undeletable.caching).
+        """
+        return caching.cached_list(self, timeout)
+
+    def prefetch_live(self, *lookups, visible=False):
+        """
+        prefetch_related() leaving out deleted related rows - and concealed ones
+        with visible=True. Forward foreign keys along the lookups are joined with
+        select_related() (see django_undeletable.prefetch). Prefetch objects are
+        passed on as they are.
+        """
+        names = [lookup for lookup in lookups if isinstance(lookup, str)]
+        select, prefetches = live_prefetches(self.model, names, visible)
+        qs = self.select_related(*select) if select else self
+        others = [lookup for lookup in lookups if not isinstance(lookup, str)]
+        return qs.prefetch_related(*prefetches + others)
+
+
+class DataManager(models.Manager):
+    # use_for_related_fields = True
+
+    def get_queryset(self):
+        qs = self.get_full_queryset()
+        return qs.filter(live_q(self.model))
+
+    def get_full_queryset(self):
+        qs = super().get_queryset()
+        if not isinstance(qs, DataQuerySet):
+            qs = DataQuerySet(self.model, using=self._db)
+        return qs
+
+    def get(self, *args, **kwargs):
+        if "pk" in kwargs or "id" in kwargs:
+            # because models are not deleted foreign keys might reference 'deleted data'
+            # to not crash the admin in these cases, we let it still access this data
+            # if explicitly asked for by id
+            if identity.current_map.get() is not None:
+                pk = identity.lookup_pk(self.model, args, kwargs)
+                if pk is not None:
+                    return identity.get(self.get_full_queryset(), pk)
+            return self.get_full_queryset().get(*args, **kwargs)
+        return self.get_queryset().get(*args, **kwargs)
+
+    async def aget(self, *args, **kwargs):
+        return await sync_to_async(self.get)(*args, **kwargs)
+
+    def filter(self, *args, **kwargs):
+        if "pk" in kwargs or "id" in kwargs:
+            return self.get_full_queryset().filter(*args, **kwargs)
+        return self.get_queryset().filter(*args, **kwargs)
+
+    def in_bulk(self, id_list=None, **kwargs):
+        if (
+            identity.current_map.get() is not None
+            and id_list is not None
+            and kwargs.get("field_name", "pk") in ("pk", self.model._meta.pk.name)
+        ):
+            return identity.in_bulk(self.get_queryset(), id_list)
+        return self.get_queryset().in_bulk(id_list, **kwargs)
+
+    def with_deleted_relations(self):
+        return self.get_queryset().with_deleted_relations()
+
+    def prefetch_live(self, *lookups, visible=False):
+        return self.get_queryset().prefetch_live(*lookups, visible=visible)
+
+    def get_or_create(self, defaults=None, revive=False, **kwargs):
+        """
+        With revive a deleted row matching kwargs gets undeleted (and updated
+        with defaults) instead of creating a new one - unless there is a live one.
+        """
+        if revive:
+            return get_or_revive(self, "get_or_create", defaults, kwargs)
+        return super(DataManager, self).get_or_create(defaults=defaults, **kwargs)
+
+    def update_or_create(self, defaults=None, revive=False, **kwargs):
+        """
+        With revive a deleted row matching kwargs gets undeleted and updated
+        with defaults if there is no live one.
+        """
+        if revive:
+            return get_or_revive(self, "update_or_create", defaults, kwargs)
+        return super(DataManager, self).update_or_create(defaults=defaults, **kwargs)
+
+    def revive_or_create(self, defaults=None, **kwargs):
+        """
+        update_or_create() that revives a deleted row matching kwargs instead of
+        creating a new one. If kwargs exactly match a unique field (or constraint),
+        creating, reviving or updating is one INSERT ... ON CONFLICT DO UPDATE on
+        databases supporting it - the only way to bring back deleted rows of
+        unique fields without running into an IntegrityError.
+        Returns (obj, created) like update_or_create().
+        """
+        return revive_or_create(self, defaults, kwargs)
+
+    def deleted(self, include_archived=False):
+        """
+        The deleted rows of the table of the model - not the ones moved into
+        the archive (see archive_deleted) unless include_archived is given.
+        They are added as a union, which can be iterated, counted, ordered and
+        undeleted, but not filtered any further (filter first, or use
+        archived() for that).
+        """
+        qs = self.get_full_queryset().filter(deleted_q(self.model))
+        archive_model = getattr(self.model, "archive_model", None)
+        if include_archived and archive_model is not None:
+            # the archive has the same columns, so its rows become instances of
+            # this model - the union can be iterated, counted, ordered and undeleted
+            archived = archive_model._base_manager.using(qs.db).order_by()
+            ordering = [
+                item
+                for item in self.model._meta.ordering
+                if isinstance(item, str) and "__" not in item
+            ]
+            qs = qs.order_by().union(archived, all=True).order_by(*ordering)
+        return qs
+
+    def archived(self):
+        """
+        The rows moved into the archive table - instances of the archive model,
+        nothing for models without archive_deleted.
+        """
+        archive_model = getattr(self.model, "archive_model", None)
+        if archive_model is None:
+            return self.get_full_queryset().none()
+        return archive_model._base_manager.using(self.db).all()
+
+    def visible(self):
+        return self.get_full_queryset().filter(visible_q(self.model))
+
+    @instrumented("purge")
+    def purge(self, older_than=None, **kwargs):
+        count = self.get_full_queryset().purge(older_than, **kwargs)
+        archive_model = getattr(self.model, "archive_model", None)
+        if archive_model is not None:
+            if older_than is None:
+                older_than = get_retention(self.model)
+            archived = purge(
+                archive_model._base_manager.using(self.db).all(),
+                older_than,
+                **kwargs
+            )
+            # the counters include the archived rows
+            counters.adjust(self.model, self.db, deleted=-archived)
+            count += archived
+        return count
+
+    def archive(self, batch_size=1000):
+        return self.get_full_queryset().archive(batch_size)
+
+    @instrumented("restore_batch")
+    def restore_batch(self, batch):
+        """
+        Undelete everything deleted within the given deletion batch - across all models.
+        """
+        return restore_batch(batch, using=self.db)
+
+    def fast_count(self, state="live"):
+        """
+        Count the live, deleted or visible rows. With track_counts = True on the
+        model the counts are kept in the cache and updated by the soft delete
+        operations instead of running COUNT(*) every time.
+        """
+        return counters.fast_count(self.model, state, using=self.db)
+
+    def as_of(self, timestamp):
+        """The rows that were live at timestamp, deleted rows included."""
+        return self.get_full_queryset().as_of(timestamp)
+
+    def between(self, start, end, chunk_size=2000):
+        """
+        Generate an Event(timestamp, action, instance) for every row created
+        or deleted within start < timestamp <= end, in the order it happened.
+        """
+        return self.get_full_queryset().between(start, end, chunk_size)
+
+    def cached_get(self, pk):
+        """
+        get(pk=pk) served from the cache for models with cache_rows = True,
+        deleted rows included like in get().
+        """
+        return caching.cached_get(self.get_full_queryset(), pk)
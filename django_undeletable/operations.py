@@ -0,0 +1,93 @@
+# coding=utf-8
+from __future__ import absolute_import, unicode_literals
+
+from django.db.migrations.operations.base import Operation
+from django.db.models.query import QuerySet
+
+from .state import backfill
+from .triggers import install_sql, uninstall_sql
+
+
+class BackfillState(Operation):
+    """
+    Fill the state column of a model switched to CompactBaseModel from its
+    deleted and concealed columns - after the AddField of the column:
+
+        operations = [
+            migrations.AddField("tag", "state", models.PositiveSmallIntegerField(...)),
+            BackfillState("tag"),
+        ]
+    """
+
+    reversible = True
+    reduces_to_sql = False
+
+    def __init__(self, model_name, batch_size=1000):
+        self.model_name = model_name
+        self.batch_size = batch_size
+
+    def deconstruct(self):
+        kwargs = {"model_name": self.model_name}
+        if self.batch_size != 1000:
+            kwargs["batch_size"] = self.batch_size
+        return self.__class__.__name__, [], kwargs
+
+    def state_forwards(self, app_label, state):
+        pass
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        model = to_state.apps.get_model(app_label, self.model_name)
+        alias = schema_editor.connection.alias
+        if self.allow_migrate_model(alias, model):
+            backfill(QuerySet(model, using=alias), self.batch_size)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        # the column goes away with the AddField anyway
+        pass
+
+    def describe(self):
+        return "Backfill the lifecycle state of %s" % self.model_name
+
+    @property
+    def migration_name_fragment(self):
+        return "backfill_state_%s" % self.model_name.lower()
+
+
+class InstallDeleteTrigger(Operation):
+    """
+    Install a BEFORE DELETE trigger turning every DELETE of the table of a model
+    into a soft delete (see django_undeletable.triggers), removed when migrating
+    backwards. Set delete_trigger = True on the model as well.
+    """
+
+    reversible = True
+    reduces_to_sql = True
+
+    def __init__(self, model_name):
+        self.model_name = model_name
+
+    def deconstruct(self):
+        return self.__class__.__name__, [], {"model_name": self.model_name}
+
+    def state_forwards(self, app_label, state):
+        pass
+
+    def run(self, sql, app_label, schema_editor, state):
+        model = state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            for statement in sql(model, schema_editor.connection):
+                # no params - the SQL contains % signs
+                schema_editor.execute(statement, params=None)
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        self.run(install_sql, app_label, schema_editor, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        self.run(uninstall_sql, app_label, schema_editor, from_state)
+
+    def describe(self):
+        return "Install the soft delete trigger of %s" % self.model_name
+
+    @property
+    def migration_name_fragment(self):
+        return "delete_trigger_%s" % self.model_name.lower()
@@ -0,0 +1,88 @@
+# coding=utf-8
+"""
+Prefetches leaving out deleted (and optionally concealed) related rows.
+
+    Author.data.prefetch_live("books__chapters", "featured_books__author")
+
+walks every lookup and builds one Prefetch per reverse foreign key, many to many
+or reverse one to one level, its queryset filtered with the live (or visible)
+predicate of the related model. Forward foreign keys and one to one fields along
+the way are joined with select_related() into the query of the level before
+instead of costing a query of their own - and like select_related() they still
+find the deleted rows they point to.
+"""
+from __future__ import absolute_import, unicode_literals
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+
+from .deletion import is_undeletable
+from .state import live_q, visible_q
+
+
+def relation(model, name):
+    """The relation of model reachable through the attribute name."""
+    for field in model._meta.get_fields():
+        if not field.is_relation:
+            continue
+        if field.auto_created and not field.concrete:
+            if field.get_accessor_name() == name:
+                return field
+        elif field.name == name:
+            return field
+    raise FieldDoesNotExist("%s has no relation %r." % (model._meta.label, name))
+
+
+def is_forward(field):
+    """Whether field is a foreign key or one to one field of its model."""
+    return field.concrete and (field.many_to_one or field.one_to_one)
+
+
+def related_queryset(model, visible=False):
+    manager = model._default_manager
+    if not is_undeletable(model):
+        return manager.all()
+    queryset = getattr(manager, "get_full_queryset", manager.all)()
+    return queryset.filter((visible_q if visible else live_q)(model))
+
+
+def live_prefetches(model, lookups, visible=False):
+    """
+    Resolve lookups starting at model. Returns the select_related() paths of
+    the model itself and a list of Prefetch objects (parents before children).
+    """
+    select = []
+    # prefetch path -> (queryset, select_related() paths of that level)
+    levels = {}
+
+    def join(prefix, path):
+        # the foreign keys between the last prefetch and the end of path
+        names = path[len(prefix.split("__")) if prefix else 0 :]
+        if names:
+            paths = levels[prefix][1] if prefix else select
+            if "__".join(names) not in paths:
+                paths.append("__".join(names))
+
+    for lookup in lookups:
+        current = model
+        prefix = None
+        path = []
+        for name in lookup.split("__"):
+            field = relation(current, name)
+            current = field.related_model
+            if is_forward(field):
+                path.append(name)
+                continue
+            join(prefix, path)
+            path.append(name)
+            prefix = "__".join(path)
+            if prefix not in levels:
+                levels[prefix] = (related_queryset(current, visible), [])
+        join(prefix, path)
+
+    prefetches = []
+    for prefetch, (queryset, paths) in levels.items():
+        if paths:
+            queryset = queryset.select_related(*paths)
+        prefetches.append(Prefetch(prefetch, queryset=queryset))
+    return select, prefetches
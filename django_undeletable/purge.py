@@ -0,0 +1,93 @@
+# coding=utf-8
+from __future__ import absolute_import, unicode_literals
+
+import time
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models.query import QuerySet
+from django.utils.timezone import now
+
+from .instrumentation import send
+from .signals import bulk_purged
+from .triggers import bypass_triggers
+
+
+def get_retention(model):
+    """
+    How long deleted rows of model are kept, taken from the UNDELETABLE_RETENTION
+    setting - a dict of model labels (or "default") to a timedelta or a number of days.
+    """
+    retention = getattr(settings, "UNDELETABLE_RETENTION", None) or {}
+    for key in (model._meta.label, model._meta.label_lower, "default"):
+        if key in retention:
+            value = retention[key]
+            if value is None or isinstance(value, timedelta):
+                return value
+            return timedelta(days=value)
+    return None
+
+
+def purge(
+    queryset,
+    older_than=None,
+    batch_size=1000,
+    sleep=0,
+    dry_run=False,
+    after=None,
+    progress=None,
+):
+    """
+    Really delete the soft deleted rows of queryset whose deletion is older than
+    older_than (defaults to the configured retention of the model).
+
+    Rows are deleted in chunks of batch_size walking the primary key, sleeping
+    between the chunks to keep the locks short on busy tables. progress gets
+    called with the number of purged rows and the last primary key after each
+    chunk - pass that key as after to resume an interrupted run (starting over
+    works as well, purged rows are gone after all).
+    Returns the number of purged rows or, for a dry run, the number of rows that
+    would be purged.
+    """
+    model = queryset.model
+    if older_than is None:
+        older_than = get_retention(model)
+    if older_than is None:
+        raise ValueError(
+            "No retention configured for %s, set UNDELETABLE_RETENTION or pass "
+            "older_than." % model._meta.label
+        )
+
+    queryset = queryset.filter(deleted__lt=now() - older_than).order_by("pk")
+    if dry_run:
+        if after is not None:
+            queryset = queryset.filter(pk__gt=after)
+        return queryset.count()
+
+    count = 0
+    last_pk = after
+    operation = uuid.uuid4()
+    while True:
+        chunk = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+        pks = list(chunk.values_list("pk", flat=True)[:batch_size])
+        if not pks:
+            break
+
+        # a plain queryset really deletes and doesn't filter deleted rows
+        with bypass_triggers(model, queryset.db):
+            _, deleted = QuerySet(model, using=queryset.db).filter(pk__in=pks).delete()
+        count += deleted.get(model._meta.label, 0)
+        send(
+            bulk_purged, sender=model, pks=pks, using=queryset.db, operation=operation
+        )
+        last_pk = pks[-1]
+        if progress:
+            progress(count, last_pk)
+
+        if len(pks) < batch_size:
+            break
+        if sleep:
+            time.sleep(sleep)
+
+    return count
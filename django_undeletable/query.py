@@ -0,0 +1,143 @@
+# coding=utf-8
+from __future__ import absolute_import, unicode_literals
+
+import django
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models.expressions import Col
+from django.db.models.lookups import IsNull
+from django.db.models.sql import Query
+from django.db.models.sql.constants import INNER
+from django.db.models.sql.datastructures import Join
+
+from .deletion import is_undeletable
+
+# Query.join_class is looked up since Django 4.2 - before that every join would
+# silently stay a plain one
+if django.VERSION < (4, 2):
+    raise ImproperlyConfigured("django-undeletable needs Django 4.2 or newer.")
+
+
+def joined_deleted_field(join):
+    """
+    The deleted field of the undeletable table a join leads to, if any.
+    Joins between the tables of multi table inheritance are left alone - they
+    share one row after all.
+    """
+    join_field = join.join_field
+    if getattr(join_field, "parent_link", False) or getattr(
+        getattr(join_field, "remote_field", None), "parent_link", False
+    ):
+        return None
+    model = join_field.related_model
+    if model is None or not is_undeletable(model):
+        return None
+    field = model._meta.get_field("deleted")
+    if field.model._meta.db_table != join.table_name:
+        return None
+    return field
+
+
+class LiveJoin(Join):
+    """
+    A join only matching live rows of undeletable models by adding
+    "deleted IS NULL" to its ON clause. Inner joins become LEFT OUTER ones
+    (like those of nullable foreign keys), so ordering by or selecting a column
+    of a deleted row gives NULL instead of dropping the row joining it.
+    """
+
+    def promoted(self, compiler):
+        """Whether this inner join - or one it depends on - leads to live rows only."""
+        if self.join_type != INNER:
+            return False
+        if joined_deleted_field(self) is not None:
+            return True
+        parent = compiler.query.alias_map.get(self.parent_alias)
+        return isinstance(parent, LiveJoin) and parent.promoted(compiler)
+
+    def as_sql(self, compiler, connection):
+        join = self.promote() if self.promoted(compiler) else self
+        sql, params = Join.as_sql(join, compiler, connection)
+        field = joined_deleted_field(self)
+        if field is None:
+            return sql, params
+        condition, condition_params = compiler.compile(
+            IsNull(Col(self.table_alias, field), True)
+        )
+        # extend the parenthesized ON clause
+        return "%s AND %s)" % (sql[:-1], condition), list(params) + list(
+            condition_params
+        )
+
+    def plain(self):
+        return Join(
+            self.table_name,
+            self.parent_alias,
+            self.table_alias,
+            self.join_type,
+            self.join_field,
+            self.nullable,
+            filtered_relation=self.filtered_relation,
+        )
+
+
+class DataQuery(Query):
+    """
+    Query used by DataQuerySet: whenever filter(), exclude(), annotate() or
+    order_by() traverse a relation to an undeletable model, deleted rows are
+    filtered out right in the join. select_related() joins stay as they are,
+    they should still find deleted objects a foreign key points to - just like
+    filtering by primary key (author=obj or author__pk=1) still does.
+    """
+
+    selecting_related = False
+    resolving_ref = False
+
+    @property
+    def join_class(self):
+        return Join if self.selecting_related else LiveJoin
+
+    def resolve_ref(self, *args, **kwargs):
+        resolving_ref = self.resolving_ref
+        self.resolving_ref = True
+        try:
+            return super(DataQuery, self).resolve_ref(*args, **kwargs)
+        finally:
+            self.resolving_ref = resolving_ref
+
+    def trim_joins(self, targets, joins, path):
+        if self.resolving_ref:
+            # F() and aggregates like Count("books") would use the foreign key
+            # column of the previous table - keep the last join leading to an
+            # undeletable table, so its deleted rows are left out
+            live = [
+                pos
+                for pos, alias in enumerate(joins)
+                if isinstance(self.alias_map[alias], LiveJoin)
+                and joined_deleted_field(self.alias_map[alias])
+            ]
+            if live:
+                path = path[len(path) - (len(joins) - 1 - live[-1]) :]
+        return super(DataQuery, self).trim_joins(targets, joins, path)
+
+    def get_compiler(self, *args, **kwargs):
+        compiler = super(DataQuery, self).get_compiler(*args, **kwargs)
+        if self.select_related:
+            get_related_selections = compiler.get_related_selections
+
+            def plain_joins(*args, **kwargs):
+                selecting_related = self.selecting_related
+                self.selecting_related = True
+                try:
+                    return get_related_selections(*args, **kwargs)
+                finally:
+                    self.selecting_related = selecting_related
+
+            compiler.get_related_selections = plain_joins
+        return compiler
+
+    def include_deleted_relations(self):
+        """Turn this into a plain Query with plain joins."""
+        for alias, join in list(self.alias_map.items()):
+            if isinstance(join, LiveJoin):
+                self.alias_map[alias] = join.plain()
+        self.__class__ = Query
@@ -0,0 +1,150 @@
+# coding=utf-8
+from __future__ import absolute_import, unicode_literals
+
+import uuid
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db import connections
+from django.db.models import F
+from django.db.models.utils import resolve_callables
+from django.utils.timezone import now
+
+from . import counters
+from .instrumentation import send
+from .signals import bulk_undeleted
+from .state import deleted_q, is_compact
+
+
+def lookup_fields(model, lookup):
+    """
+    The names of the fields of a lookup only using exact matches on concrete
+    fields (like username="x" or author=obj), None for anything else.
+    """
+    opts = model._meta
+    names = []
+    for key in lookup:
+        if key.endswith("__exact"):
+            key = key[: -len("__exact")]
+        if key == "pk":
+            key = opts.pk.name
+        try:
+            field = opts.get_field(key)
+        except FieldDoesNotExist:
+            return None
+        if not field.concrete or field.many_to_many:
+            return None
+        names.append(field.name)
+    return names
+
+
+def unique_lookup(model, lookup):
+    """The fields of the unique constraint that lookup matches exactly, if any."""
+    names = lookup_fields(model, lookup)
+    if not names:
+        return None
+    opts = model._meta
+    unique_sets = [{f.name} for f in opts.concrete_fields if f.unique]
+    unique_sets += [set(fields) for fields in opts.unique_together]
+    # conditional constraints can't be the target of ON CONFLICT
+    unique_sets += [set(c.fields) for c in opts.total_unique_constraints]
+    if set(names) in unique_sets:
+        return names
+    return None
+
+
+def revive(queryset, pk, values):
+    """
+    Undelete the row with the given pk and update it with values - in one UPDATE.
+    Returns the revived instance, None if the row isn't deleted (anymore).
+    """
+    model = queryset.model
+    values = dict(resolve_callables(values or {}))
+    updated = queryset.filter(deleted_q(model), pk=pk).update(
+        deleted=None, deletion_batch=None, modified=now(), **values
+    )
+    if not updated:
+        return None
+    obj = queryset.get(pk=pk)
+    send(
+        bulk_undeleted,
+        sender=model,
+        pks=[pk],
+        using=queryset.db,
+        operation=uuid.uuid4(),
+    )
+    counters.count_undeletion(model, queryset.db, obj.concealed)
+    return obj
+
+
+def get_or_revive(manager, method, defaults, lookup):
+    """
+    Call get_or_create() or update_or_create() of the live rows - unless there is
+    no live row matching lookup but a deleted one, which gets revived and updated
+    with defaults instead of creating a new row.
+    """
+    lookup = dict(lookup)
+    # Django 5.0+, only used when creating
+    extra = {}
+    if "create_defaults" in lookup:
+        extra["create_defaults"] = lookup.pop("create_defaults")
+
+    queryset = manager.get_full_queryset()
+    match = (
+        queryset.filter(**lookup)
+        .order_by(F("deleted").desc(nulls_first=True))
+        .values_list("pk", "deleted")
+        .first()
+    )
+    if match is not None and match[1] is not None:
+        obj = revive(queryset, match[0], defaults)
+        if obj is not None:
+            return obj, False
+    return getattr(manager.get_queryset(), method)(
+        defaults=defaults, **dict(lookup, **extra)
+    )
+
+
+def upsert(manager, defaults, lookup, unique_fields, update_fields):
+    """
+    Create, revive or update the row matching lookup with one
+    INSERT ... ON CONFLICT (unique_fields) DO UPDATE.
+    """
+    model = manager.model
+    values = dict(zip(unique_fields, lookup.values()))
+    for name, (key, value) in zip(update_fields, resolve_callables(defaults)):
+        values[name] = value
+
+    obj = model(**values)
+    manager.get_full_queryset().bulk_create(
+        [obj],
+        update_conflicts=True,
+        unique_fields=unique_fields,
+        update_fields=update_fields + ["deleted", "deletion_batch", "modified"],
+    )
+    # set while inserting, an existing row keeps its own
+    created = obj.created
+    obj = manager.get_queryset().get(**lookup)
+    return obj, obj.created == created
+
+
+def revive_or_create(manager, defaults, lookup):
+    model = manager.model
+    defaults = defaults or {}
+    unique_fields = unique_lookup(model, lookup)
+    update_fields = lookup_fields(model, defaults)
+    if (
+        unique_fields
+        and update_fields is not None
+        and not model._meta.parents
+        # the upsert can't compute the state of a revived concealed row
+        and not is_compact(model)
+        and getattr(
+            connections[manager.db].features,
+            "supports_update_conflicts_with_target",
+            False,
+        )
+        # the upsert can't tell whether it revived a row
+        and not bulk_undeleted.has_listeners(model)
+    ):
+        return upsert(manager, defaults, lookup, unique_fields, update_fields)
+    return get_or_revive(manager, "update_or_create", defaults, lookup)
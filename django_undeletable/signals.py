@@ -0,0 +1,18 @@
+# coding=utf-8
+"""
+Signals sent once per operation (or chunk of rows) instead of once per instance,
+so receivers can handle all rows at once. They get the model as sender, the
+primary keys of the affected rows as pks and the database alias as using.
+The chunks of one operation share the UUID passed as operation.
+"""
+from __future__ import absolute_import, unicode_literals
+
+from django.dispatch import Signal
+
+# additionally gets the deletion_batch of the rows
+bulk_soft_deleted = Signal()
+bulk_undeleted = Signal()
+bulk_concealed = Signal()
+bulk_revealed = Signal()
+# really deleted by purge()
+bulk_purged = Signal()
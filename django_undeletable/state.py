@@ -0,0 +1,121 @@
+# coding=utf-8
+"""
+The compact lifecycle state of models extending CompactBaseModel.
+
+Next to deleted and concealed these models keep a small integer state column,
+so live, deleted and visible rows can be found with a single indexed column:
+
+    live        state < DELETED     (instead of deleted IS NULL)
+    visible     state = LIVE        (instead of deleted IS NULL AND NOT concealed)
+    deleted     state = DELETED     (instead of deleted IS NOT NULL)
+
+The managers use the predicates below, and DataQuerySet.update() keeps the
+state in line whenever deleted or concealed get written, so every soft delete
+operation keeps working. deleted and concealed stay as they were and can
+still be filtered on.
+"""
+from __future__ import absolute_import, unicode_literals
+
+from django.db.models import Case, Q, Value, When
+from django.db.models.query import QuerySet
+from django.utils.translation import gettext_lazy as _
+
+LIVE = 0
+CONCEALED = 1
+DELETED = 2
+
+CHOICES = ((LIVE, _("live")), (CONCEALED, _("concealed")), (DELETED, _("deleted")))
+
+_MISSING = object()
+
+
+def is_compact(model):
+    return getattr(model, "compact_state", False)
+
+
+def live_q(model):
+    if is_compact(model):
+        return Q(state__lt=DELETED)
+    return Q(deleted__isnull=True)
+
+
+def deleted_q(model):
+    if is_compact(model):
+        return Q(state=DELETED)
+    return Q(deleted__isnull=False)
+
+
+def visible_q(model):
+    if is_compact(model):
+        return Q(state=LIVE)
+    return Q(deleted__isnull=True, concealed=False)
+
+
+def concealed_q(model):
+    """Live rows hidden from the public."""
+    if is_compact(model):
+        return Q(state=CONCEALED)
+    return Q(deleted__isnull=True, concealed=True)
+
+
+def state_of(deleted, concealed):
+    if deleted is not None:
+        return DELETED
+    return CONCEALED if concealed else LIVE
+
+
+def state_case():
+    """The state of every row computed from its deleted and concealed columns."""
+    return Case(
+        When(deleted__isnull=False, then=Value(DELETED)),
+        When(concealed=True, then=Value(CONCEALED)),
+        default=Value(LIVE),
+    )
+
+
+def state_update(values):
+    """
+    The new state for an update() writing values, None if the update
+    doesn't write deleted or concealed.
+    """
+    deleted = values.get("deleted", _MISSING)
+    concealed = values.get("concealed", _MISSING)
+    if deleted is _MISSING and concealed is _MISSING:
+        return None
+    if deleted is not _MISSING and concealed is not _MISSING:
+        return state_of(deleted, concealed)
+    if deleted is not _MISSING:
+        if deleted is not None:
+            return DELETED
+        # undeleted rows keep their concealed flag
+        return Case(When(concealed=True, then=Value(CONCEALED)), default=Value(LIVE))
+    # deleted rows stay deleted when concealed or revealed
+    return Case(
+        When(deleted__isnull=False, then=Value(DELETED)),
+        default=Value(CONCEALED if concealed else LIVE),
+    )
+
+
+def backfill(queryset, batch_size=1000):
+    """
+    Compute the state of all rows of queryset from deleted and concealed,
+    in chunks walking the primary key. Returns the number of updated rows.
+    """
+    queryset = queryset.order_by("pk")
+    count = 0
+    last_pk = None
+    while True:
+        chunk = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+        pks = list(chunk.values_list("pk", flat=True)[:batch_size])
+        if not pks:
+            break
+        # a plain queryset doesn't filter by the state that isn't in sync yet
+        count += (
+            QuerySet(queryset.model, using=queryset.db)
+            .filter(pk__in=pks)
+            .update(state=state_case())
+        )
+        last_pk = pks[-1]
+        if len(pks) < batch_size:
+            break
+    return count
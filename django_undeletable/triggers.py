@@ -0,0 +1,159 @@
+# coding=utf-8
+"""
+BEFORE DELETE triggers turning every DELETE of an undeletable table into a soft
+delete - whoever runs it. Install them with a migration operation:
+
+    from django_undeletable.operations import InstallDeleteTrigger
+
+    operations = [InstallDeleteTrigger("book")]
+
+and set delete_trigger = True on the model, so force deletes, purge() and
+archive() switch the triggers off for the rest of their transaction (see
+bypass_triggers). Supported are SQLite and PostgreSQL. Deleted rows get deleted
+and modified set to the current time (and the state of compact models), but no
+deletion batch.
+"""
+from __future__ import absolute_import, unicode_literals
+
+from contextlib import contextmanager
+
+from django.db import NotSupportedError, connections, transaction
+
+from .state import DELETED
+
+VENDORS = ("sqlite", "postgresql")
+
+# SQLite has no session variables - a row only the own transaction can see does it
+SQLITE_BYPASS_TABLE = "undeletable_bypass"
+
+
+def trigger_name(model):
+    return "%s_soft_delete" % model._meta.db_table
+
+
+def soft_delete_columns(model, now):
+    """The SET clause of the UPDATE replacing the DELETE."""
+    names = {f.name for f in model._meta.local_concrete_fields}
+    if "deleted" not in names:
+        raise ValueError(
+            "%s has no deleted column of its own, multi table inheritance "
+            "needs the trigger on the parent table." % model._meta.label
+        )
+    assignments = ["deleted = %s" % now, "modified = %s" % now]
+    if "state" in names:
+        # CompactBaseModel, see django_undeletable.state
+        assignments.append("state = %d" % DELETED)
+    return ", ".join(assignments)
+
+
+def check_vendor(connection):
+    if connection.vendor not in VENDORS:
+        raise NotSupportedError(
+            "Delete triggers are only available for %s, not %s."
+            % (" and ".join(VENDORS), connection.vendor)
+        )
+
+
+def create_bypass_table_sql(connection):
+    return "CREATE TABLE IF NOT EXISTS %s (active integer)" % (
+        connection.ops.quote_name(SQLITE_BYPASS_TABLE)
+    )
+
+
+def uses_bypass_table(connection, exclude):
+    """Whether any SQLite trigger but the exclude one checks the bypass table."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name != %s "
+            "AND sql LIKE %s",
+            [exclude, "%%%s%%" % SQLITE_BYPASS_TABLE],
+        )
+        return cursor.fetchone() is not None
+
+
+def install_sql(model, connection):
+    check_vendor(connection)
+    qn = connection.ops.quote_name
+    table = qn(model._meta.db_table)
+    pk = qn(model._meta.pk.column)
+    name = qn(trigger_name(model))
+
+    if connection.vendor == "sqlite":
+        columns = soft_delete_columns(
+            model, "strftime('%Y-%m-%d %H:%M:%f', 'now')"
+        )
+        return [
+            create_bypass_table_sql(connection),
+            "CREATE TRIGGER %s BEFORE DELETE ON %s FOR EACH ROW "
+            "WHEN NOT EXISTS (SELECT 1 FROM %s) BEGIN "
+            "UPDATE %s SET %s WHERE %s = OLD.%s AND deleted IS NULL; "
+            "SELECT RAISE(IGNORE); END"
+            % (name, table, qn(SQLITE_BYPASS_TABLE), table, columns, pk, pk),
+        ]
+
+    columns = soft_delete_columns(model, "now()")
+    return [
+        "CREATE OR REPLACE FUNCTION %s() RETURNS trigger AS $$ BEGIN "
+        "IF current_setting('undeletable.bypass', true) = 'on' THEN RETURN OLD; END IF; "
+        "UPDATE %s SET %s WHERE %s = OLD.%s AND deleted IS NULL; "
+        "RETURN NULL; END; $$ LANGUAGE plpgsql" % (name, table, columns, pk, pk),
+        "CREATE TRIGGER %s BEFORE DELETE ON %s FOR EACH ROW EXECUTE PROCEDURE %s()"
+        % (name, table, name),
+    ]
+
+
+def uninstall_sql(model, connection):
+    check_vendor(connection)
+    qn = connection.ops.quote_name
+    name = qn(trigger_name(model))
+    if connection.vendor == "sqlite":
+        sql = ["DROP TRIGGER IF EXISTS %s" % name]
+        # the bypass table is shared by the triggers of all models
+        if not uses_bypass_table(connection, trigger_name(model)):
+            sql.append("DROP TABLE IF EXISTS %s" % qn(SQLITE_BYPASS_TABLE))
+        return sql
+    return [
+        "DROP TRIGGER IF EXISTS %s ON %s" % (name, qn(model._meta.db_table)),
+        "DROP FUNCTION IF EXISTS %s()" % name,
+    ]
+
+
+def _set_bypass(connection, active):
+    with connection.cursor() as cursor:
+        if connection.vendor == "sqlite":
+            table = connection.ops.quote_name(SQLITE_BYPASS_TABLE)
+            if active:
+                # missing if the trigger migration hasn't run (MIGRATION_MODULES e.g.)
+                cursor.execute(create_bypass_table_sql(connection))
+                cursor.execute("INSERT INTO %s (active) VALUES (1)" % table)
+            else:
+                cursor.execute("DELETE FROM %s" % table)
+        else:
+            cursor.execute(
+                "SELECT set_config('undeletable.bypass', %s, true)",
+                ["on" if active else "off"],
+            )
+
+
+@contextmanager
+def bypass_triggers(model, using):
+    """
+    Really delete within the block: switch the delete triggers off for the
+    current transaction - if model has delete_trigger = True.
+    """
+    connection = connections[using]
+    if not getattr(model, "delete_trigger", False) or connection.vendor not in VENDORS:
+        yield
+        return
+    with transaction.atomic(using=using, savepoint=False):
+        depth = getattr(connection, "undeletable_bypass", 0)
+        if not depth:
+            _set_bypass(connection, True)
+        connection.undeletable_bypass = depth + 1
+        try:
+            yield
+        finally:
+            connection.undeletable_bypass = depth
+        # after an error the transaction gets rolled back anyway
+        if not depth:
+            _set_bypass(connection, False)
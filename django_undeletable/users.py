@@ -0,0 +1,183 @@
+# coding=utf-8
+"""
+The abstract user model - the only module importing django.contrib.auth.
+"""
+from __future__ import absolute_import, unicode_literals
+
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.auth.models import UserManager, AbstractBaseUser, PermissionsMixin
+from django.contrib.auth.validators import UnicodeUsernameValidator
+from django.db import models
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+
+from .base import BaseModel
+from .managers import DataManager, DataQuerySet
+from .state import visible_q
+
+
+def override_address():
+    """The address all mails go to instead of the users' ones, if any."""
+    return getattr(settings, "EMAIL_OVERRIDE_ADDRESS", None) or None
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class UserDataQuerySet(DataQuerySet):
+    def email_users(
+        self,
+        subject,
+        message,
+        from_email=None,
+        chunk_size=500,
+        workers=None,
+        fail_silently=False,
+    ):
+        """
+        Send the same mail to every visible user of the queryset having an
+        email address - one message each, chunk_size of them over one
+        connection. The users are streamed from the database, so the queryset
+        may be large. With workers the chunks are sent by a thread pool of
+        that size (at most twice as many chunks waiting). Honours
+        settings.EMAIL_OVERRIDE_ADDRESS like email_user(). Returns the number
+        of sent messages.
+        """
+        # the mail stack is only needed when sending
+        from django.core.mail import get_connection, send_mass_mail
+
+        if from_email is None:
+            from_email = settings.DEFAULT_FROM_EMAIL
+        override = override_address()
+        field = self.model.get_email_field_name()
+        addresses = (
+            self.filter(visible_q(self.model))
+            .exclude(**{field: ""})
+            .order_by("pk")
+            .values_list(field, flat=True)
+            .iterator(chunk_size=chunk_size)
+        )
+
+        def send(chunk):
+            connection = get_connection(fail_silently=fail_silently)
+            return send_mass_mail(
+                [(subject, message, from_email, [override or a]) for a in chunk],
+                fail_silently=fail_silently,
+                connection=connection,
+            )
+
+        if not workers:
+            return sum(send(chunk) for chunk in chunked(addresses, chunk_size))
+
+        sent = 0
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            pending = set()
+            for chunk in chunked(addresses, chunk_size):
+                if len(pending) >= 2 * workers:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    sent += sum(future.result() for future in done)
+                pending.add(executor.submit(send, chunk))
+            sent += sum(future.result() for future in pending)
+        return sent
+
+
+class UserDataManager(UserManager, DataManager):
+    _queryset_class = UserDataQuerySet
+
+    def email_users(self, subject, message, from_email=None, **kwargs):
+        return self.get_queryset().email_users(subject, message, from_email, **kwargs)
+
+
+# abstract base user with data manager
+# please copy this user definition into your code and enhance it as needed
+############################################################################
+class AbstractUser(AbstractBaseUser, PermissionsMixin, BaseModel):
+    """
+    An abstract base class implementing a fully featured User model with
+    admin-compliant permissions.
+
+    Username, email and  password are required. Other fields are optional.
+    """
+
+    username_validator = UnicodeUsernameValidator()
+
+    username = models.CharField(
+        _("username"),
+        max_length=150,
+        unique=True,
+        help_text=_(
+            "Required. 150 characters or fewer. Letters, digits and @/./+/-/_ only."
+        ),
+        validators=[username_validator],
+        error_messages={"unique": _("A user with that username already exists.")},
+    )
+    first_name = models.CharField(_("first name"), max_length=30, blank=True)
+    last_name = models.CharField(_("last name"), max_length=150, blank=True)
+    email = models.EmailField(_("email address"), blank=True)
+    is_staff = models.BooleanField(
+        _("staff status"),
+        default=False,
+        help_text=_("Designates whether the user can log into this admin site."),
+    )
+    is_active = models.BooleanField(
+        _("active"),
+        default=True,
+        help_text=_(
+            "Designates whether this user should be treated as active. "
+            "Unselect this instead of deleting accounts."
+        ),
+    )
+    date_joined = models.DateTimeField(_("date joined"), default=timezone.now)
+
+    data = UserDataManager()
+    objects = (
+        UserDataManager()
+    )  # this should stay due to compatibilty issues with 3rd party libs
+
+    EMAIL_FIELD = "email"
+    USERNAME_FIELD = "username"
+    REQUIRED_FIELDS = ["email"]
+
+    class Meta(BaseModel.Meta):
+        verbose_name = _("user")
+        verbose_name_plural = _("users")
+        abstract = True
+
+    def clean(self):
+        super(AbstractBaseUser, self).clean()
+        self.email = self.__class__.data.normalize_email(self.email)
+
+    def get_full_name(self):
+        """
+        Return the first_name plus the last_name, with a space in between.
+        """
+        full_name = "%s %s" % (self.first_name, self.last_name)
+        return full_name.strip()
+
+    def get_short_name(self):
+        """Return the short name for the user."""
+        return self.first_name
+
+    def email_user(self, subject, message, from_email=None, **kwargs):
+        """
+         Sends an email to this User.
+         If settings.EMAIL_OVERRIDE_ADDRESS is set, this mail will be redirected to the alternate mail address.
+
+        """
+        # the mail stack is only needed when sending
+        from django.core.mail import send_mail
+
+        receiver = override_address() or self.email
+
+        if from_email is None:
+            from_email = settings.DEFAULT_FROM_EMAIL
+        send_mail(subject, message, from_email, [receiver], **kwargs)
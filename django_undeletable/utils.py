@@ -0,0 +1,40 @@
+# coding=utf-8
+from __future__ import absolute_import, unicode_literals
+
+import hashlib
+
+
+def live_index_name(model, fields, suffix):
+    """
+    Build a stable index name that fits into the 30 chars Django allows,
+    following the scheme of Index.set_name_with_model().
+    """
+    table_name = model._meta.db_table
+    column = fields[0].lstrip("-")
+    digest = hashlib.md5(
+        ":".join([table_name] + list(fields) + [suffix]).encode()
+    ).hexdigest()[:6]
+    name = "%s_%s_%s_%s" % (table_name[:11], column[:7], digest, suffix)
+    if name[0] == "_" or name[0].isdigit():
+        name = "D%s" % name[1:]
+    return name
+
+
+def live_index_fields(model):
+    """
+    The columns default queries sort by - taken from Meta.ordering as long as
+    they are plain local fields, falling back to the primary key.
+    """
+    opts = model._meta
+    local_fields = {f.name for f in opts.local_concrete_fields}
+    fields = []
+    for item in opts.ordering:
+        if not isinstance(item, str) or item == "?" or "__" in item:
+            continue
+        name = item.lstrip("-")
+        if name == "pk":
+            name = opts.pk.name
+        if name not in local_fields:
+            return []
+        fields.append("-" + name if item.startswith("-") else name)
+    return fields or [opts.pk.name]
@@ -56,33 +56,36 @@ setup(
     url=url,
     download_url=url + "/tarball/" + version,
     keywords=["orm", "undelete", "shadow db"],
-    packages=["django_undeletable"],
+    packages=[
+        "django_undeletable",
+        "django_undeletable.audit",
+        "django_undeletable.audit.migrations",
+        "django_undeletable.management",
+        "django_undeletable.management.commands",
+    ],
     include_package_data=True,
     zip_safe=False,
-    python_requires='>=3.3',
+    python_requires=">=3.8",
     classifiers=[
         "Development Status :: 5 - Production/Stable",
         "Framework :: Django",
-        "Framework :: Django :: 1.10",
+        "Framework :: Django :: 4.2",
+        "Framework :: Django :: 5.0",
+        "Framework :: Django :: 5.1",
+        "Framework :: Django :: 5.2",
         "Intended Audience :: Developers",
         "License :: OSI Approved :: MIT License",
         "Operating System :: OS Independent",
         "Programming Language :: Python",
         "Natural Language :: English",
         "Programming Language :: Python :: 3",
-        "Programming Language :: Python :: 3.3",
-        "Programming Language :: Python :: 3.4",
-        "Programming Language :: Python :: 3.5",
-        "Programming Language :: Python :: 3.6",
-        "Programming Language :: Python :: 3.7",
         "Programming Language :: Python :: 3.8",
         "Programming Language :: Python :: 3.9",
         "Programming Language :: Python :: 3.10",
-        "Framework :: Django :: 2.0",
-        "Framework :: Django :: 3.0",
-        "Framework :: Django :: 4.0",
+        "Programming Language :: Python :: 3.11",
+        "Programming Language :: Python :: 3.12",
         "Topic :: Software Development :: Libraries :: Python Modules",
     ],
-    install_requires=["Django>=2.0.13"],
+    install_requires=["Django>=4.2"],
     license="MIT",
 )
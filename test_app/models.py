@@ -2,6 +2,7 @@ from django.db import models
 from django.utils.translation import gettext_lazy as _
 
 from django_undeletable.models import (
+    CompactBaseModel,
     NamedModel,
     BaseModel,
     AbstractUser,
@@ -27,6 +28,47 @@ class Book(NamedModel):
     )
 
 
+class Chapter(NamedModel):
+    book = models.ForeignKey(Book, related_name="chapters", on_delete=models.CASCADE)
+    editor = models.ForeignKey(
+        Author,
+        related_name="edited_chapters",
+        null=True,
+        on_delete=models.PROTECT,
+    )
+
+
+class Note(NamedModel):
+    author = models.ForeignKey(
+        Author, related_name="notes", null=True, on_delete=models.CASCADE
+    )
+    parent = models.ForeignKey(
+        "self", related_name="replies", null=True, on_delete=models.CASCADE
+    )
+
+    archive_deleted = True
+
+
+class Tag(NamedModel):
+    track_counts = True
+    cache_rows = True
+    history_index = True
+    audit_log = True
+
+
+class Label(CompactBaseModel):
+    name = models.CharField(max_length=50)
+
+    archive_deleted = True
+
+
+class Account(BaseModel):
+    handle = models.CharField(max_length=50, unique=True)
+    email = models.EmailField(blank=True)
+
+    live_unique = True
+
+
 class BookQuerySet(DataQuerySet):
     def not_null(self):
         return self.filter(author__isnull=False)
@@ -19,6 +19,7 @@ INSTALLED_APPS = [
     "django.contrib.contenttypes",
     "django.contrib.sites",
     "django_undeletable",
+    "django_undeletable.audit",
     "test_app",
 ]
 
@@ -37,5 +38,6 @@ MIGRATION_MODULES = {
     "auth": None,
     "contenttypes": None,
     "django_undeletable": None,
+    "undeletable_audit": None,
     "test_app": None,
 }
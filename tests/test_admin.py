@@ -0,0 +1,170 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Tests for the admin integration.
+"""
+from django.contrib.admin import AdminSite
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase
+
+from django_undeletable.admin import (
+    EstimatedCountPaginator,
+    SoftDeleteAdmin,
+    StateFilter,
+)
+from django_undeletable.counters import reconcile
+from test_app.models import Author, Label, Tag, TestUser
+
+
+class SoftDeleteAdminTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = TestUser.data.create(username="admin", is_superuser=True)
+        cls.live = Author.data.create(name="live")
+        cls.hidden = Author.data.create(name="hidden", concealed=True)
+        cls.gone = Author.data.create(name="gone")
+        cls.gone.delete()
+
+    def setUp(self):
+        self.admin = SoftDeleteAdmin(Author, AdminSite())
+
+    def request(self, **params):
+        request = RequestFactory().get("/", params)
+        request.user = self.user
+        request._messages = CookieStorage(request)
+        return request
+
+    def changelist(self, **params):
+        return self.admin.get_changelist_instance(self.request(**params))
+
+    def names(self, **params):
+        return sorted(author.name for author in self.changelist(**params).queryset)
+
+    def test_state_filter(self):
+        self.assertEqual(self.names(), ["hidden", "live"])
+        self.assertEqual(self.names(state="deleted"), ["gone"])
+        self.assertEqual(self.names(state="concealed"), ["hidden"])
+        self.assertEqual(self.names(state="all"), ["gone", "hidden", "live"])
+
+    def test_state_filter_is_always_there(self):
+        self.admin.list_filter = ["concealed"]
+        self.assertEqual(
+            self.admin.get_list_filter(self.request()), [StateFilter, "concealed"]
+        )
+
+    def test_compact_models(self):
+        Label.data.create(name="live")
+        Label.data.create(name="hidden", concealed=True)
+        Label.data.create(name="gone").delete()
+        self.admin = SoftDeleteAdmin(Label, AdminSite())
+        self.assertEqual(self.names(), ["hidden", "live"])
+        self.assertEqual(self.names(state="deleted"), ["gone"])
+        self.assertEqual(self.names(state="concealed"), ["hidden"])
+
+    def test_deleted_rows_can_be_changed(self):
+        request = self.request()
+        obj = self.admin.get_object(request, str(self.gone.pk))
+        self.assertEqual(obj, self.gone)
+
+        form = self.admin.get_form(request, obj)({"name": "renamed"}, instance=obj)
+        self.assertTrue(form.is_valid(), form.errors)
+        obj = self.admin.save_form(request, form, change=True)
+        self.admin.save_model(request, obj, form, change=True)
+        self.admin.save_related(request, form, [], change=True)
+
+        self.assertEqual(Author.data.get_full_queryset().count(), 3)
+        gone = Author.data.get_full_queryset().get(pk=self.gone.pk)
+        self.assertEqual(gone.name, "renamed")
+        self.assertIsNotNone(gone.deleted)
+        self.assertGreater(gone.modified, gone.deleted)
+
+    def test_live_rows_are_saved(self):
+        request = self.request()
+        form = self.admin.get_form(request, self.live)(
+            {"name": "changed"}, instance=self.live
+        )
+        self.assertTrue(form.is_valid(), form.errors)
+        self.admin.save_model(request, form.save(commit=False), form, change=True)
+        self.assertEqual(Author.data.get(pk=self.live.pk).name, "changed")
+
+    def test_actions(self):
+        request = self.request()
+        queryset = self.admin.get_queryset(request)
+        self.assertEqual(
+            set(self.admin.get_actions(request)) - {"delete_selected"},
+            {
+                "undelete_selected",
+                "conceal_selected",
+                "reveal_selected",
+                "purge_selected",
+            },
+        )
+
+        self.admin.undelete_selected(request, queryset.all())
+        self.assertEqual(self.names(), ["gone", "hidden", "live"])
+
+        self.admin.reveal_selected(request, queryset.filter(pk=self.hidden.pk))
+        self.admin.conceal_selected(request, queryset.filter(pk=self.live.pk))
+        self.assertEqual(self.names(state="concealed"), ["live"])
+
+        Author.data.get(pk=self.gone.pk).delete()
+        self.admin.purge_selected(request, queryset.all())
+        self.assertEqual(self.names(state="all"), ["hidden", "live"])
+        self.assertEqual(
+            [str(m) for m in request._messages],
+            [
+                "1 row undeleted.",
+                "1 row revealed.",
+                "1 row concealed.",
+                "1 row purged.",
+            ],
+        )
+
+    def test_paginator_state(self):
+        changelist = self.changelist(state="deleted")
+        self.assertIsInstance(changelist.paginator, EstimatedCountPaginator)
+        self.assertEqual(changelist.paginator.state, "deleted")
+        self.assertEqual(changelist.paginator.count, 1)
+        # searching or filtering by anything else needs a real count
+        self.assertIsNone(self.changelist(concealed="1").paginator.state)
+
+
+class EstimatedCountPaginatorTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for name in "abc":
+            Tag.data.create(name=name)
+        Tag.data.create(name="d").delete()
+
+    def setUp(self):
+        cache.clear()
+
+    def test_small_tables_are_counted(self):
+        paginator = EstimatedCountPaginator(Tag.data.all(), 10, state="live")
+        with self.assertNumQueries(1):
+            # the count stopping at the threshold is the count itself
+            self.assertEqual(paginator.count, 3)
+
+    def test_cached_counts(self):
+        reconcile(Tag)
+        counts = (("live", 3), ("deleted", 1), ("concealed", 0), ("all", 4))
+        for state, count in counts:
+            paginator = EstimatedCountPaginator(
+                Tag.data.get_full_queryset(), 10, threshold=2, state=state
+            )
+            with self.assertNumQueries(1):
+                # only the count stopping at the threshold
+                self.assertEqual(paginator.count, count)
+
+    def test_filtered_querysets_are_counted(self):
+        paginator = EstimatedCountPaginator(Tag.data.filter(name="a"), 10, threshold=2)
+        self.assertEqual(paginator.count, 1)
+
+    def test_untracked_models_are_counted(self):
+        paginator = EstimatedCountPaginator(
+            Author.data.all(), 10, threshold=0, state="live"
+        )
+        with self.assertNumQueries(1):
+            self.assertEqual(paginator.count, 0)
@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Tests for moving deleted data into archive tables.
+"""
+from datetime import timedelta
+
+from django.test import TestCase
+
+from django_undeletable.archive import unreferenced
+from test_app.models import Author, Note
+
+
+class ArchiveTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = Author.data.create(name="author")
+        for i in range(5):
+            Note.data.create(name="note %s" % i, author=cls.author)
+        Note.data.exclude(name="note 4").delete()
+
+    def test_the_archive_model(self):
+        NoteArchive = Note.archive_model
+        self.assertEqual(NoteArchive._meta.db_table, "test_app_note_archive")
+        self.assertEqual(
+            [f.column for f in NoteArchive._meta.concrete_fields],
+            [f.column for f in Note._meta.concrete_fields],
+        )
+        self.assertFalse(NoteArchive._meta.get_field("created").auto_now_add)
+        self.assertFalse(NoteArchive._meta.get_field("author").db_constraint)
+        self.assertFalse(hasattr(Author, "archive_model"))
+        # "self" is the live model, not the archive
+        self.assertIs(NoteArchive._meta.get_field("parent").related_model, Note)
+
+    def test_archived_replies(self):
+        note = Note.data.get(name="note 4")
+        reply = Note.data.create(name="reply", parent=note)
+        reply.delete()
+        Note.data.archive()
+        archived = Note.data.archived().get(name="reply")
+        self.assertEqual(archived.parent, note)
+
+    def test_archiving(self):
+        created = set(Note.data.deleted().values_list("created", flat=True))
+
+        self.assertEqual(Note.data.archive(batch_size=3), 4)
+        self.assertEqual(Note.data.get_full_queryset().count(), 1)
+        self.assertEqual(Note.archive_model.objects.count(), 4)
+        self.assertEqual(
+            set(Note.archive_model.objects.values_list("created", flat=True)), created
+        )
+        # nothing left to do
+        self.assertEqual(Note.data.archive(), 0)
+
+    def test_deleted_stays_filterable(self):
+        Note.data.get_full_queryset().filter(name__in=["note 0", "note 1"]).archive()
+        deleted = Note.data.deleted()
+        self.assertEqual(deleted.count(), 2)
+        self.assertEqual(deleted.filter(name="note 2").get().name, "note 2")
+        self.assertEqual(deleted.exclude(name="note 2").update(concealed=True), 1)
+        self.assertEqual(
+            sorted(Note.data.archived().values_list("name", flat=True)),
+            ["note 0", "note 1"],
+        )
+        self.assertEqual(Note.data.archived().filter(name="note 0").count(), 1)
+        self.assertFalse(Author.data.archived().exists())
+
+    def test_deleted_spans_both_tables(self):
+        Note.data.get_full_queryset().filter(name__in=["note 0", "note 1"]).archive()
+        self.assertEqual(Note.archive_model.objects.count(), 2)
+
+        deleted = Note.data.deleted(include_archived=True)
+        self.assertEqual(deleted.count(), 4)
+        self.assertEqual(
+            [note.name for note in deleted.order_by("name")],
+            ["note 0", "note 1", "note 2", "note 3"],
+        )
+        self.assertTrue(all(isinstance(note, Note) for note in deleted))
+
+        Note.data.deleted(include_archived=True).undelete()
+        self.assertEqual(Note.data.count(), 5)
+        self.assertEqual(Note.data.deleted(include_archived=True).count(), 0)
+        self.assertEqual(Note.archive_model.objects.count(), 0)
+
+    def test_undeleting_archived_instances(self):
+        note = Note.data.deleted().order_by("name")[0]
+        Note.data.archive()
+
+        note.undelete()
+        restored = Note.data.get(name=note.name)
+        self.assertEqual(restored.pk, note.pk)
+        self.assertEqual(restored.created, note.created)
+        self.assertIsNone(restored.deleted)
+
+    def test_restoring_archived_batches(self):
+        Note.data.all().delete()
+        batch = Note.data.get_full_queryset().get(name="note 4").deletion_batch
+        Note.data.archive()
+
+        total, per_model = Note.data.restore_batch(batch)
+        self.assertEqual(per_model, {"test_app.Note": 1})
+        self.assertEqual(list(Note.data.all()), [Note.data.get(name="note 4")])
+
+    def test_referenced_rows_stay(self):
+        lonely = Author.data.create(name="lonely")
+        self.assertEqual(
+            list(unreferenced(Author.data.get_full_queryset())), [lonely]
+        )
+
+    def test_purging_archived_rows(self):
+        Note.data.get_full_queryset().update(deleted=Note.data.get(name="note 4").created)
+        Note.data.archive()
+        self.assertEqual(Note.data.purge(timedelta(0)), 5)
+        self.assertEqual(Note.archive_model.objects.count(), 0)
@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Tests for the async API.
+"""
+from django.db.models.signals import pre_delete, post_delete, post_save
+from django.test import TestCase
+
+from test_app.models import Author, Book, Chapter
+
+
+class AsyncTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = Author.data.create(name="author")
+        cls.book = Book.data.create(name="book", author=cls.author)
+        Chapter.data.create(name="chapter", book=cls.book)
+        Book.data.create(name="other book")
+
+    async def test_queryset_delete_and_undelete(self):
+        count = await Book.data.filter(name="book").adelete()
+        self.assertEqual(count, 1)
+        self.assertEqual(await Book.data.acount(), 1)
+        self.assertEqual([b.name async for b in Book.data.deleted()], ["book"])
+
+        await Book.data.deleted().aundelete()
+        self.assertEqual(await Book.data.acount(), 2)
+        self.assertIsNone((await Book.data.aget(name="book")).deletion_batch)
+
+    async def test_queryset_delete_sends_signals(self):
+        received = []
+
+        def receiver(sender, instance, **kwargs):
+            received.append(instance.name)
+
+        async def async_receiver(sender, instance, **kwargs):
+            received.append(instance.name.upper())
+
+        pre_delete.connect(receiver, sender=Book)
+        post_delete.connect(async_receiver, sender=Book)
+        try:
+            await Book.data.filter(name="book").adelete()
+        finally:
+            pre_delete.disconnect(receiver, sender=Book)
+            post_delete.disconnect(async_receiver, sender=Book)
+        self.assertEqual(received, ["book", "BOOK"])
+
+    async def test_cascading_delete(self):
+        await Book.data.filter(name="book").adelete(cascade=True)
+        self.assertEqual(await Chapter.data.acount(), 0)
+
+    async def test_conceal_and_reveal(self):
+        await Book.data.filter(name="book").aconceal()
+        self.assertEqual([b.name async for b in Book.data.visible()], ["other book"])
+        await Book.data.all().areveal()
+        self.assertEqual(await Book.data.visible().acount(), 2)
+
+    async def test_instance_methods(self):
+        received = []
+
+        def receiver(sender, instance, update_fields, **kwargs):
+            received.append(sorted(update_fields))
+
+        post_save.connect(receiver, sender=Book)
+        try:
+            await self.book.adelete(touch=False)
+        finally:
+            post_save.disconnect(receiver, sender=Book)
+        self.assertEqual(received, [["deleted", "deletion_batch"]])
+        self.assertIsNotNone(self.book.deleted)
+        self.assertFalse(await Book.data.filter(name="book").aexists())
+
+        await self.book.aundelete()
+        self.assertIsNone(self.book.deleted)
+        self.assertTrue(await Book.data.filter(name="book").aexists())
+
+        await self.book.aconceal()
+        self.assertTrue(self.book.concealed)
+        self.assertFalse(await Book.data.visible().filter(name="book").aexists())
+        await self.book.areveal()
+        self.assertTrue(await Book.data.visible().filter(name="book").aexists())
+
+    async def test_force_delete(self):
+        await self.book.adelete(force=True)
+        self.assertFalse(await Book.data.get_full_queryset().filter(name="book").aexists())
@@ -0,0 +1,226 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Tests for the audit log.
+"""
+import uuid
+from datetime import timedelta
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.signals import request_finished
+from django.db import close_old_connections, transaction
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils.timezone import now
+
+from django_undeletable.audit.log import (
+    AuditActorMiddleware,
+    AuditBuffer,
+    Entry,
+    PendingEntries,
+    actor,
+    buffer,
+    current_actor,
+)
+from django_undeletable.audit.models import AuditEntry, compact_ids, expand_ids
+from test_app.models import Author, Tag
+
+
+class AuditLogTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.tags = [Tag.data.create(name=name) for name in "abcd"]
+
+    def entries(self):
+        return [
+            (entry.action, entry.pks(), entry.actor)
+            for entry in AuditEntry.objects.order_by("pk")
+        ]
+
+    def test_bulk_operations_are_one_entry(self):
+        pks = [tag.pk for tag in self.tags]
+        with self.captureOnCommitCallbacks(execute=True):
+            with actor("alice"):
+                Tag.data.all().delete()
+            Tag.data.deleted().undelete()
+        self.assertEqual(
+            self.entries(), [("delete", pks, "alice"), ("undelete", pks, "")]
+        )
+        entry = AuditEntry.objects.get(action="delete")
+        self.assertEqual(entry.count, 4)
+        self.assertEqual(entry.object_ids, "%s-%s" % (pks[0], pks[-1]))
+        self.assertEqual(entry.content_type, ContentType.objects.get_for_model(Tag))
+        self.assertIsNotNone(entry.deletion_batch)
+
+    def test_chunks_of_one_operation(self):
+        pks = [tag.pk for tag in self.tags]
+        with self.captureOnCommitCallbacks(execute=True):
+            Tag.data.all().delete(batch_size=2)
+            # separate operations right after each other
+            for pk in pks[:2]:
+                Tag.data.filter(pk=pk).undelete()
+        self.assertEqual(
+            self.entries(),
+            [
+                ("delete", pks, ""),
+                ("undelete", [pks[0]], ""),
+                ("undelete", [pks[1]], ""),
+            ],
+        )
+
+    def test_written_once_committed(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.tags[0].delete()
+            self.tags[1].conceal()
+            self.tags[1].reveal()
+        self.assertEqual(AuditEntry.objects.count(), 0)
+        pending = [c for c in callbacks if isinstance(c, PendingEntries)]
+        self.assertEqual(len(pending), 1)
+
+        # a single INSERT once the content type is cached
+        ContentType.objects.get_for_model(Tag)
+        with self.assertNumQueries(1):
+            pending[0]()
+        self.assertEqual(
+            self.entries(),
+            [
+                ("delete", [self.tags[0].pk], ""),
+                ("conceal", [self.tags[1].pk], ""),
+                ("reveal", [self.tags[1].pk], ""),
+            ],
+        )
+        entry = AuditEntry.objects.get(action="delete")
+        self.tags[0].refresh_from_db()
+        self.assertEqual(entry.deletion_batch, self.tags[0].deletion_batch)
+
+    def test_rolled_back_operations_are_not_logged(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    self.tags[0].delete()
+                    raise ValueError
+            except ValueError:
+                pass
+            self.tags[1].delete()
+        self.assertEqual(self.entries(), [("delete", [self.tags[1].pk], "")])
+
+    def test_savepoints(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    self.tags[0].delete()
+                    raise ValueError
+            except ValueError:
+                pass
+            # the next savepoint on the same level gets a callback of its own
+            with transaction.atomic():
+                self.tags[1].delete()
+            with transaction.atomic():
+                self.tags[2].conceal()
+        self.assertEqual(
+            self.entries(),
+            [("delete", [self.tags[1].pk], ""), ("conceal", [self.tags[2].pk], "")],
+        )
+
+    def test_one_callback_per_transaction(self):
+        for tag in self.tags[:2]:
+            with self.captureOnCommitCallbacks(execute=True) as callbacks:
+                tag.delete()
+            self.assertEqual(
+                len([c for c in callbacks if isinstance(c, PendingEntries)]), 1
+            )
+        self.assertEqual(AuditEntry.objects.count(), 2)
+
+    def test_purge(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Tag.data.filter(pk=self.tags[0].pk).delete()
+            Tag.data.purge(older_than=timedelta(0))
+        self.assertEqual(
+            [action for action, pks, name in self.entries()], ["delete", "purge"]
+        )
+
+    def test_other_models_are_not_logged(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Author.data.create(name="author").delete()
+        self.assertEqual(AuditEntry.objects.count(), 0)
+
+
+class AuditBufferTestCase(TestCase):
+    operation = uuid.uuid4()
+
+    def entry(self, action, pks, operation=operation):
+        return Entry("default", Tag, action, pks, None, None, now(), operation)
+
+    @override_settings(UNDELETABLE_AUDIT={"BUFFER_SIZE": 2, "FLUSH_INTERVAL": 60})
+    def test_buffer_size(self):
+        buffer = AuditBuffer()
+        buffer.add([self.entry("conceal", [1, 2])])
+        # another chunk of the same operation
+        buffer.add([self.entry("conceal", [2, 3])])
+        self.assertEqual(len(buffer), 1)
+        self.assertEqual(AuditEntry.objects.count(), 0)
+
+        buffer.add([self.entry("reveal", [1])])
+        self.assertEqual(len(buffer), 0)
+        self.assertEqual(
+            [
+                (e.action, e.object_ids, e.count)
+                for e in AuditEntry.objects.order_by("pk")
+            ],
+            [("conceal", "1-3", 3), ("reveal", "1", 1)],
+        )
+
+    @override_settings(UNDELETABLE_AUDIT={"BUFFER_SIZE": 100, "FLUSH_INTERVAL": 60})
+    def test_other_operations_are_not_merged(self):
+        buffer = AuditBuffer()
+        buffer.add([self.entry("conceal", [1])])
+        buffer.add([self.entry("conceal", [2], uuid.uuid4())])
+        buffer.add([self.entry("conceal", [3], None)])
+        buffer.add([self.entry("conceal", [4], None)])
+        self.assertEqual(len(buffer), 4)
+
+    @override_settings(UNDELETABLE_AUDIT={"BUFFER_SIZE": 100, "FLUSH_INTERVAL": 0})
+    def test_flush_interval(self):
+        buffer = AuditBuffer()
+        buffer.add([self.entry("conceal", [1])])
+        self.assertEqual(len(buffer), 0)
+        self.assertEqual(AuditEntry.objects.count(), 1)
+
+    def test_flushed_at_request_end(self):
+        buffer.add([self.entry("conceal", [1])])
+        self.assertEqual(AuditEntry.objects.count(), 0)
+        # like the test client, keep the connection of the test transaction
+        request_finished.disconnect(close_old_connections)
+        try:
+            request_finished.send(sender=self.__class__)
+        finally:
+            request_finished.connect(close_old_connections)
+        self.assertEqual(len(buffer), 0)
+        self.assertEqual(AuditEntry.objects.count(), 1)
+
+
+class CompactIdsTestCase(TestCase):
+    def test_ranges(self):
+        self.assertEqual(compact_ids([7, 1, 2, 3, 5, 2]), "1-3,5,7")
+        self.assertEqual(expand_ids("1-3,5,7"), [1, 2, 3, 5, 7])
+        self.assertEqual(compact_ids([]), "")
+        self.assertEqual(expand_ids(""), [])
+
+    def test_other_keys(self):
+        keys = ["4f5c-a1", "b"]
+        self.assertEqual(expand_ids(compact_ids(keys)), keys)
+
+
+class AuditActorMiddlewareTestCase(TestCase):
+    def test_username(self):
+        class User(object):
+            is_authenticated = True
+
+            def get_username(self):
+                return "bob"
+
+        request = RequestFactory().get("/")
+        request.user = User()
+        middleware = AuditActorMiddleware(lambda request: current_actor.get())
+        self.assertEqual(middleware(request), "bob")
+        self.assertIsNone(current_actor.get())
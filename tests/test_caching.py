@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Tests for the read-through cache of rows and querysets.
+"""
+from django.core.cache import cache
+from django.test import TestCase
+
+from django_undeletable import caching
+from test_app.models import Author, Tag
+
+
+class CachingTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.tags = [Tag.data.create(name=name) for name in ("a", "b", "c")]
+
+    def setUp(self):
+        cache.clear()
+
+    def names(self):
+        return [tag.name for tag in Tag.data.visible().order_by("name").cached()]
+
+    def test_cached_get(self):
+        pk = self.tags[0].pk
+        with self.assertNumQueries(1):
+            self.assertEqual(Tag.data.cached_get(pk), self.tags[0])
+            self.assertEqual(Tag.data.cached_get(pk).name, "a")
+        with self.assertRaises(Tag.DoesNotExist):
+            Tag.data.cached_get(0)
+
+        self.tags[0].delete()
+        with self.assertNumQueries(1):
+            self.assertIsNotNone(Tag.data.cached_get(pk).deleted)
+
+    def test_cached_querysets(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(self.names(), ["a", "b", "c"])
+            self.assertEqual(self.names(), ["a", "b", "c"])
+        # another query, another key
+        self.assertEqual(Tag.data.filter(name="a").cached(), [self.tags[0]])
+        self.assertEqual(Tag.data.none().cached(), [])
+
+    def test_lifecycle_operations_invalidate(self):
+        self.names()
+        Tag.data.filter(name="a").delete()
+        self.assertEqual(self.names(), ["b", "c"])
+        Tag.data.deleted().undelete()
+        self.assertEqual(self.names(), ["a", "b", "c"])
+        Tag.data.filter(name="b").conceal()
+        self.assertEqual(self.names(), ["a", "c"])
+        Tag.data.all().reveal()
+        self.assertEqual(self.names(), ["a", "b", "c"])
+
+        self.tags[2].conceal()
+        self.assertEqual(self.names(), ["a", "b"])
+        self.tags[2].reveal()
+        self.tags[2].delete()
+        self.assertEqual(self.names(), ["a", "b"])
+        self.tags[2].undelete()
+        Tag.data.create(name="d")
+        self.assertEqual(self.names(), ["a", "b", "c", "d"])
+        Tag.data.bulk_create([Tag(name="e")])
+        self.assertEqual(len(self.names()), 5)
+        Tag.data.filter(name="e").delete(force=True)
+        self.assertEqual(len(self.names()), 4)
+
+    def test_versions_survive_eviction(self):
+        self.names()
+        old = caching.get_version(Tag, "default")
+        cache.delete(caching.version_key(Tag, "default"))
+        self.assertGreater(caching.get_version(Tag, "default"), old)
+
+    def test_commit_bumps_again(self):
+        self.names()
+        with self.captureOnCommitCallbacks(execute=True):
+            Tag.data.filter(name="a").delete()
+            version = caching.get_version(Tag, "default")
+        self.assertEqual(caching.get_version(Tag, "default"), version + 1)
+
+    def test_settings(self):
+        self.assertEqual(caching.get_timeout(Tag), 300)
+        with self.settings(UNDELETABLE_CACHE={"TIMEOUT": 10, "KEY_PREFIX": "x"}):
+            self.assertEqual(caching.get_timeout(Tag), 10)
+            self.assertTrue(caching.version_key(Tag, "default").startswith("x:"))
+
+    def test_models_without_caching(self):
+        author = Author.data.create(name="author")
+        with self.assertNumQueries(2):
+            Author.data.cached_get(author.pk)
+            Author.data.all().cached()
+        with self.assertNumQueries(1):
+            Author.data.cached_get(author.pk)
@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Tests for the cached row counters.
+"""
+from datetime import timedelta
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command, CommandError
+from django.test import TestCase
+
+from test_app.models import Author, Tag
+
+
+class CounterTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            for name in ("a", "b", "c"):
+                Tag.data.create(name=name)
+
+    def counts(self):
+        return [Tag.data.fast_count(state) for state in ("live", "deleted", "visible")]
+
+    def test_counts_are_cached(self):
+        self.assertEqual(self.counts(), [3, 0, 3])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.counts(), [3, 0, 3])
+
+    def test_instance_operations_adjust_the_counters(self):
+        self.counts()
+        with self.captureOnCommitCallbacks(execute=True):
+            Tag.data.create(name="d")
+        tag = Tag.data.get(name="a")
+        with self.captureOnCommitCallbacks(execute=True):
+            tag.delete()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.counts(), [3, 1, 3])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            tag.undelete()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.counts(), [4, 0, 4])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            tag.delete(force=True)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.counts(), [3, 0, 3])
+
+    def test_concealing_an_instance(self):
+        self.counts()
+        tag = Tag.data.get(name="a")
+        with self.captureOnCommitCallbacks(execute=True):
+            tag.conceal()
+            tag.conceal()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.counts(), [3, 0, 2])
+
+    def test_deleting_twice_only_counts_once(self):
+        self.counts()
+        tag = Tag.data.get(name="a")
+        with self.captureOnCommitCallbacks(execute=True):
+            tag.delete()
+            tag.delete()
+        self.assertEqual(self.counts(), [2, 1, 2])
+
+    def test_bulk_operations_adjust_the_counters(self):
+        self.counts()
+        with self.captureOnCommitCallbacks(execute=True):
+            Tag.data.filter(name="a").conceal()
+            # already concealed
+            Tag.data.filter(name="a").conceal()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.counts(), [3, 0, 2])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(Tag.data.get_full_queryset().delete(), 3)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.counts(), [0, 3, 0])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            # deleted rows don't count as visible either way
+            Tag.data.get_full_queryset().filter(name="b").reveal()
+            Tag.data.get_full_queryset().filter(name="c").conceal()
+            self.assertEqual(Tag.data.get_full_queryset().undelete(), 3)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.counts(), [3, 0, 1])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Tag.data.filter(name="b").delete(batch_size=1)
+            Tag.data.purge(older_than=timedelta(0))
+        with self.assertNumQueries(0):
+            self.assertEqual(self.counts(), [2, 0, 0])
+
+    def test_bulk_create_resets_the_counters(self):
+        self.counts()
+        with self.captureOnCommitCallbacks(execute=True):
+            Tag.data.bulk_create([Tag(name="d")])
+        self.assertEqual(self.counts(), [4, 0, 4])
+
+    def test_rolled_back_changes_are_not_counted(self):
+        self.counts()
+        Tag.data.get(name="a").delete()
+        self.assertEqual(self.counts(), [3, 0, 3])
+
+    def test_untracked_models_are_counted(self):
+        Author.data.create(name="author")
+        with self.assertNumQueries(1):
+            self.assertEqual(Author.data.fast_count(), 1)
+
+    def test_unknown_state(self):
+        with self.assertRaises(ValueError):
+            Tag.data.fast_count("concealed")
+
+    def test_reconcile_command(self):
+        self.counts()
+        # plain updates bypass the counters
+        Tag.data.filter(name="a").update(concealed=True)
+        self.assertEqual(self.counts(), [3, 0, 3])
+
+        out = StringIO()
+        call_command("reconcile_counts", stdout=out)
+        self.assertIn("test_app.Tag: deleted 0, live 3, visible 2", out.getvalue())
+        self.assertEqual(self.counts(), [3, 0, 2])
+
+        with self.assertRaises(CommandError):
+            call_command("reconcile_counts", "test_app.Author")
@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Tests for the streaming exports.
+"""
+import csv
+import json
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command, CommandError
+from django.test import TestCase
+
+from test_app.models import Author, Note
+
+
+class ExportTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.authors = [Author.data.create(name="author %s" % i) for i in range(3)]
+        cls.authors[0].delete()
+
+    def lines(self, output):
+        return [json.loads(line) for line in output.getvalue().splitlines()]
+
+    def test_jsonl(self):
+        output = StringIO()
+        with self.assertNumQueries(1):
+            count, mark = Author.data.get_full_queryset().export(output, chunk_size=2)
+        self.assertEqual(count, 3)
+        rows = self.lines(output)
+        self.assertEqual(
+            sorted(row["name"] for row in rows), ["author 0", "author 1", "author 2"]
+        )
+        self.assertEqual(
+            set(rows[0]),
+            {"id", "created", "modified", "deleted", "deletion_batch", "concealed", "name"},
+        )
+        self.assertEqual(mark, self.authors[0].deleted)
+
+    def test_csv(self):
+        output = StringIO()
+        count, mark = Author.data.deleted().export(
+            output, format="csv", fields=["id", "deleted"]
+        )
+        rows = list(csv.reader(StringIO(output.getvalue())))
+        self.assertEqual(rows[0], ["id", "deleted"])
+        self.assertEqual(
+            rows[1], [str(self.authors[0].pk), self.authors[0].deleted.isoformat()]
+        )
+        self.assertEqual(count, 1)
+
+        with self.assertRaises(ValueError):
+            Author.data.all().export(output, format="xml")
+
+    def test_incremental(self):
+        output = StringIO()
+        _, mark = Author.data.get_full_queryset().export(output)
+        self.assertEqual(
+            Author.data.get_full_queryset().export(StringIO(), since=mark), (0, None)
+        )
+
+        self.authors[1].delete()
+        output = StringIO()
+        count, new_mark = Author.data.get_full_queryset().export(output, since=mark)
+        self.assertEqual(count, 1)
+        self.assertEqual(self.lines(output)[0]["name"], "author 1")
+        self.assertGreater(new_mark, mark)
+
+    def test_incremental_state_changes(self):
+        self.authors[1].delete()
+        _, mark = Author.data.get_full_queryset().export(StringIO())
+
+        Author.data.deleted().undelete()
+        Author.data.filter(pk=self.authors[0].pk).conceal()
+        output = StringIO()
+        count, mark = Author.data.get_full_queryset().export(output, since=mark)
+        self.assertEqual(count, 2)
+        self.assertEqual(
+            sorted(line["name"] for line in self.lines(output)),
+            ["author 0", "author 1"],
+        )
+
+        self.authors[0].reveal()
+        output = StringIO()
+        count, _ = Author.data.get_full_queryset().export(output, since=mark)
+        self.assertEqual(count, 1)
+
+    def test_archived_rows(self):
+        notes = [Note.data.create(name="note %s" % i) for i in range(2)]
+        notes[0].delete()
+        Note.data.archive()
+        notes[1].delete()
+        since = notes[0].deleted - timedelta(seconds=1)
+
+        output = StringIO()
+        deleted = Note.data.deleted(include_archived=True)
+        count, mark = deleted.export(output, fields=["name"], since=since)
+        self.assertEqual(count, 2)
+        self.assertEqual(mark, notes[1].deleted)
+        self.assertEqual(deleted.export(StringIO(), since=mark), (0, None))
+
+
+class ExportCommandTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Author.data.create(name="live")
+        Author.data.create(name="deleted").delete()
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def export(self, *args, **kwargs):
+        out = StringIO()
+        call_command("export_rows", *args, stdout=out, stderr=StringIO(), **kwargs)
+        return out.getvalue()
+
+    def test_states(self):
+        self.assertEqual(len(self.export("test_app.Author").splitlines()), 2)
+        output = self.export("test_app.Author", state="deleted", fields="name")
+        self.assertEqual(json.loads(output), {"name": "deleted"})
+        output = self.export("test_app.Author", state="live", format="csv")
+        self.assertEqual(len(output.splitlines()), 2)
+
+    def test_state_file(self):
+        state_file = os.path.join(self.directory, "marks.json")
+        output = os.path.join(self.directory, "authors.jsonl")
+        self.export("test_app.Author", output=output, state_file=state_file)
+        with open(output) as f:
+            self.assertEqual(len(f.readlines()), 2)
+        with open(state_file) as f:
+            self.assertEqual(list(json.load(f)), ["default:test_app.Author:all"])
+
+        self.assertEqual(self.export("test_app.Author", state_file=state_file), "")
+        Author.data.get(name="live").delete()
+        output = self.export("test_app.Author", state_file=state_file)
+        self.assertEqual(json.loads(output)["name"], "live")
+
+    def test_errors(self):
+        with self.assertRaises(CommandError):
+            self.export("test_app.Nothing")
+        with self.assertRaises(CommandError):
+            self.export("auth.Permission")
+        with self.assertRaises(CommandError):
+            self.export("test_app.Author", since="yesterday")
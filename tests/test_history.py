@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Tests for the time travel queries.
+"""
+from datetime import datetime, timedelta, timezone
+
+from django.test import TestCase
+
+from django_undeletable.history import Event, between
+from django_undeletable.models import live_index_name
+from test_app.models import Note, Tag
+
+
+def day(number):
+    return datetime(2020, 1, number, tzinfo=timezone.utc)
+
+
+class HistoryTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        # (name, created, deleted)
+        for name, created, deleted in (
+            ("a", 1, None),
+            ("b", 2, 4),
+            ("c", 3, None),
+            ("d", 5, 6),
+        ):
+            tag = Tag.data.create(name=name)
+            Tag.data.get_full_queryset().filter(pk=tag.pk).update(
+                created=day(created), deleted=deleted and day(deleted)
+            )
+
+    def names(self, queryset):
+        return sorted(tag.name for tag in queryset)
+
+    def test_as_of(self):
+        self.assertEqual(self.names(Tag.data.as_of(day(1))), ["a"])
+        self.assertEqual(self.names(Tag.data.as_of(day(3))), ["a", "b", "c"])
+        # deleted exactly then
+        self.assertEqual(self.names(Tag.data.as_of(day(4))), ["a", "c"])
+        self.assertEqual(self.names(Tag.data.as_of(day(5))), ["a", "c", "d"])
+        self.assertEqual(
+            self.names(Tag.data.as_of(day(3)).filter(name__in=["b", "c"])), ["b", "c"]
+        )
+        self.assertEqual(self.names(Tag.data.as_of(day(1) - timedelta(1))), [])
+
+    def test_between(self):
+        with self.assertNumQueries(2):
+            events = list(Tag.data.between(day(2), day(5)))
+        self.assertEqual(
+            [(event.timestamp, event.action, event.instance.name) for event in events],
+            [
+                (day(3), "created", "c"),
+                (day(4), "deleted", "b"),
+                (day(5), "created", "d"),
+            ],
+        )
+        self.assertIsInstance(events[0], Event)
+
+        # consecutive windows don't overlap
+        events = list(Tag.data.between(day(1) - timedelta(1), day(2), chunk_size=1))
+        events += list(Tag.data.between(day(2), day(6)))
+        self.assertEqual(len(events), 6)
+        self.assertEqual(events, sorted(events, key=lambda event: event.timestamp))
+
+        queryset = Tag.data.get_full_queryset().filter(name="d")
+        self.assertEqual(
+            [event.action for event in queryset.between(day(1), day(9))],
+            ["created", "deleted"],
+        )
+
+    def test_archived_rows(self):
+        note = Note.data.create(name="note")
+        note.delete()
+        Note.data.archive()
+        self.assertEqual(list(Note.data.between(day(1), note.deleted)), [])
+        archived = between(Note.archive_model.objects.all(), day(1), note.deleted)
+        self.assertEqual([event.action for event in archived], ["created", "deleted"])
+
+    def test_history_index(self):
+        names = {index.name for index in Tag._meta.indexes}
+        self.assertIn(live_index_name(Tag, ["created", "deleted"], "hc"), names)
+        self.assertIn(live_index_name(Tag, ["deleted"], "hd"), names)
+        self.assertFalse(
+            any(index.name.endswith("_hc") for index in Note._meta.indexes)
+        )
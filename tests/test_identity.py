@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Tests for the identity map of primary key lookups.
+"""
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase
+
+from django_undeletable.identity import (
+    IdentityMapMiddleware,
+    current_map,
+    identity_map,
+)
+from test_app.models import Author, Book, CoverBook
+
+
+class IdentityMapTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.authors = [Author.data.create(name="author %s" % i) for i in range(3)]
+        cls.authors[2].delete()
+
+    def test_no_map(self):
+        with self.assertNumQueries(2):
+            Author.data.get(pk=self.authors[0].pk)
+            Author.data.get(pk=self.authors[0].pk)
+
+    def test_pk_lookups(self):
+        pk = self.authors[0].pk
+        with identity_map():
+            with self.assertNumQueries(1):
+                author = Author.data.get(pk=pk)
+                self.assertIs(Author.data.get(id=pk), author)
+                self.assertIs(Author.data.get(pk=str(pk)), author)
+            # deleted rows are still found by their primary key
+            deleted = Author.data.get(pk=self.authors[2].pk)
+            with self.assertNumQueries(0):
+                self.assertIs(Author.data.get(pk=self.authors[2].pk), deleted)
+
+            # anything else is a normal query
+            with self.assertNumQueries(2):
+                Author.data.get(pk=pk, name="author 0")
+                Author.data.get(name="author 0")
+        with self.assertNumQueries(1):
+            Author.data.get(pk=pk)
+
+    def test_in_bulk(self):
+        pks = [author.pk for author in self.authors]
+        with identity_map():
+            first = Author.data.get(pk=pks[0])
+            with self.assertNumQueries(1):
+                authors = Author.data.in_bulk(pks)
+            # like in_bulk() of the live rows
+            self.assertEqual(sorted(authors), pks[:2])
+            self.assertIs(authors[pks[0]], first)
+            with self.assertNumQueries(0):
+                self.assertIs(Author.data.get(pk=pks[1]), authors[pks[1]])
+                self.assertEqual(Author.data.in_bulk(pks[:2]), authors)
+
+            with self.assertNumQueries(1):
+                self.assertEqual(len(Author.data.in_bulk()), 2)
+
+    def test_invalidation(self):
+        pk = self.authors[0].pk
+        with identity_map():
+            author = Author.data.get(pk=pk)
+            Author.data.filter(pk=pk).delete()
+            author = Author.data.get(pk=pk)
+            self.assertIsNotNone(author.deleted)
+
+            author.undelete()
+            self.assertIsNone(Author.data.get(pk=pk).deleted)
+
+            Author.data.get(pk=pk).conceal()
+            self.assertTrue(Author.data.get(pk=pk).concealed)
+
+            other = Author.data.get(pk=self.authors[1].pk)
+            other.name = "renamed"
+            other.save()
+            with self.assertNumQueries(1):
+                self.assertEqual(Author.data.get(pk=other.pk).name, "renamed")
+
+            Author.data.get(pk=pk).delete(force=True)
+            with self.assertRaises(Author.DoesNotExist):
+                Author.data.get(pk=pk)
+
+    def test_related_models(self):
+        book = CoverBook.data.create(name="cover")
+        with identity_map():
+            self.assertIsInstance(Book.data.get(pk=book.pk), Book)
+            self.assertIsInstance(CoverBook.data.get(pk=book.pk), CoverBook)
+            CoverBook.data.filter(pk=book.pk).delete()
+            self.assertIsNotNone(Book.data.get(pk=book.pk).deleted)
+
+    def test_nesting(self):
+        with identity_map() as outer:
+            with identity_map() as inner:
+                self.assertIs(inner, outer)
+            self.assertIs(current_map.get(), outer)
+        self.assertIsNone(current_map.get())
+
+    async def test_async_lookups(self):
+        pk = self.authors[0].pk
+        with identity_map():
+            author = await Author.data.aget(pk=pk)
+            self.assertIs(await Author.data.aget(pk=pk), author)
+
+    def test_middleware(self):
+        seen = []
+
+        def view(request):
+            seen.append(current_map.get())
+            return HttpResponse()
+
+        middleware = IdentityMapMiddleware(view)
+        request = RequestFactory().get("/")
+        middleware(request)
+        middleware(request)
+        self.assertIsNotNone(seen[0])
+        self.assertIsNot(seen[0], seen[1])
+        self.assertIsNone(current_map.get())
+
+    async def test_async_middleware(self):
+        seen = []
+
+        async def view(request):
+            seen.append(current_map.get())
+            return HttpResponse()
+
+        await IdentityMapMiddleware(view)(RequestFactory().get("/"))
+        self.assertIsNotNone(seen[0])
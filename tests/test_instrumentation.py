@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Tests for the instrumentation of the soft delete operations.
+"""
+from django.db.models.signals import pre_delete
+from django.test import TestCase, override_settings
+
+from django_undeletable.instrumentation import get_backend
+from test_app.models import Author, Book, Chapter, Note
+
+metrics = []
+
+
+def collect_metric(name, value, tags):
+    metrics.append((name, tags["model"]))
+
+
+@override_settings(
+    UNDELETABLE_INSTRUMENTATION={
+        "BACKEND": "django_undeletable.instrumentation.MemoryBackend"
+    }
+)
+class InstrumentationTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = Author.data.create(name="author")
+        cls.book = Book.data.create(name="book", author=cls.author)
+        Chapter.data.create(name="chapter", book=cls.book)
+        Book.data.create(name="other book")
+
+    def setUp(self):
+        del get_backend().records[:]
+
+    @property
+    def records(self):
+        return get_backend().records
+
+    def test_disabled(self):
+        with self.settings(UNDELETABLE_INSTRUMENTATION=None):
+            self.assertIsNone(get_backend())
+            Book.data.all().delete()
+
+    def test_queryset_operations(self):
+        def receiver(sender, instance, **kwargs):
+            Author.data.count()
+
+        pre_delete.connect(receiver, sender=Book)
+        try:
+            Book.data.all().delete()
+        finally:
+            pre_delete.disconnect(receiver, sender=Book)
+        Book.data.deleted().undelete()
+        Book.data.filter(name="book").conceal()
+
+        delete, undelete, conceal = self.records
+        self.assertEqual(
+            (delete.operation, delete.model, delete.rows),
+            ("delete", "test_app.Book", 2),
+        )
+        # loading the instances, the receivers and the UPDATE
+        self.assertEqual(delete.queries, 4)
+        self.assertGreater(delete.signal_seconds, 0)
+        self.assertGreaterEqual(delete.seconds, delete.signal_seconds)
+        self.assertEqual((undelete.operation, undelete.rows), ("undelete", 2))
+        self.assertEqual(
+            (conceal.operation, conceal.rows, conceal.queries), ("conceal", 1, 1)
+        )
+
+    def test_nested_operations_are_part_of_the_outer_record(self):
+        self.book.delete(cascade=True)
+        Note.data.create(name="note").delete()
+        Note.data.archive()
+        Note.data.deleted(include_archived=True).undelete()
+
+        self.assertEqual(
+            [(r.operation, r.model, r.rows) for r in self.records],
+            [
+                ("delete", "test_app.Book", 1),
+                ("delete", "test_app.Note", 1),
+                ("archive", "test_app.Note", 1),
+                ("undelete", "test_app.Note", 1),
+            ],
+        )
+        self.assertGreater(self.records[0].queries, 1)
+
+    def test_failing_operations_are_not_recorded(self):
+        with self.assertRaises(TypeError):
+            Book.data.all().delete(unknown=True)
+        Book.data.all().delete()
+        self.assertEqual(len(self.records), 1)
+
+    async def test_async_operations(self):
+        await Book.data.filter(name="book").adelete()
+        await self.author.adelete()
+
+        queryset, instance = self.records
+        self.assertEqual((queryset.operation, queryset.rows), ("adelete", 1))
+        self.assertEqual(queryset.queries, 1)
+        self.assertEqual(
+            (instance.operation, instance.model, instance.rows, instance.queries),
+            ("adelete", "test_app.Author", 1, 1),
+        )
+
+    def test_logging_backend(self):
+        config = {"BACKEND": "django_undeletable.instrumentation.LoggingBackend"}
+        with self.settings(UNDELETABLE_INSTRUMENTATION=config):
+            with self.assertLogs("django_undeletable", "INFO") as logs:
+                Book.data.all().conceal()
+        self.assertIn("test_app.Book conceal: 2 rows, 1 queries", logs.output[0])
+
+    def test_callback_backend(self):
+        config = {
+            "BACKEND": "django_undeletable.instrumentation.CallbackBackend",
+            "OPTIONS": {"callback": "tests.test_instrumentation.collect_metric"},
+        }
+        del metrics[:]
+        with self.settings(UNDELETABLE_INSTRUMENTATION=config):
+            self.book.undelete()
+        self.assertEqual(
+            metrics,
+            [
+                ("undeletable.undelete.ms", "test_app.Book"),
+                ("undeletable.undelete.signal_ms", "test_app.Book"),
+                ("undeletable.undelete.queries", "test_app.Book"),
+                ("undeletable.undelete.rows", "test_app.Book"),
+            ],
+        )
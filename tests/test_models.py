@@ -7,11 +7,20 @@ test_django-undeletable
 
 Tests for `django-undeletable` models module.
 """
+from unittest import mock
+
+from django.apps import apps
 from django.conf import settings
 from django.core import mail
+from django.db import connection
+from django.db.models import Count, F, ProtectedError
+from django.db.models.signals import pre_delete, post_delete, pre_save, post_save
 from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 
-from test_app.models import Author, Book, TestUser, CoverBook
+from django_undeletable.base import add_live_indexes
+from django_undeletable.deletion import is_undeletable
+from test_app.models import Author, Book, Chapter, TestUser, CoverBook
 
 
 class TestDeletion(TestCase):
@@ -58,11 +67,17 @@ class HideDeletedBooks(GeneralTestCase):
         self.deleted_author.delete()
         self.assertEqual(self.visible_book.co_authors.count(), 1)
 
-        # TODO: the join sadly will include deleted data
-        # we need some way to filter that out by default
-        self.assertEqual(Book.data.filter(co_authors__name__contains="del").count(), 2)
+        # joins leave out deleted data
+        self.assertEqual(Book.data.filter(co_authors__name__contains="del").count(), 0)
+        # unless asked for
+        self.assertEqual(
+            Book.data.with_deleted_relations()
+            .filter(co_authors__name__contains="del")
+            .count(),
+            2,
+        )
 
-        # but manually filtering still works of course
+        # manually filtering still works of course
         self.assertEqual(
             Book.data.filter(
                 co_authors__name__contains="del", co_authors__deleted__isnull=True
@@ -144,6 +159,83 @@ class RealDeletionTestCase(GeneralTestCase):
         self.assertEqual(Author.data.deleted().count(), 0)
 
 
+class DeletedAwareJoinsTestCase(GeneralTestCase):
+    def setUp(self):
+        self.deleted_author.delete()
+
+    def test_filter(self):
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(
+                Book.data.filter(co_authors__name="deleted").count(), 0
+            )
+        self.assertEqual(len(context.captured_queries), 1)
+        self.assertNotIn("IN (SELECT", context.captured_queries[0]["sql"])
+        self.assertEqual(Book.data.filter(co_authors__name="visible").count(), 2)
+
+    def test_exclude(self):
+        self.assertEqual(Book.data.exclude(co_authors__name="deleted").count(), 2)
+        self.assertEqual(
+            Book.data.with_deleted_relations()
+            .exclude(co_authors__name="deleted")
+            .count(),
+            0,
+        )
+
+    def test_annotate(self):
+        books = Book.data.annotate(authors=Count("co_authors")).order_by("name")
+        self.assertEqual([book.authors for book in books], [1, 1])
+
+        authors = Author.data.get_full_queryset().annotate(book_count=Count("author"))
+        self.deleted_book.delete()
+        self.assertEqual(authors.get(pk=self.visible_author.pk).book_count, 1)
+
+    def test_order_by(self):
+        self.visible_book.author = self.deleted_author
+        self.visible_book.save()
+        books = Book.data.order_by("-author__name")
+        self.assertEqual(
+            [(book.name, book.author_name) for book in books.annotate(
+                author_name=F("author__name")
+            )],
+            [("deleted book", "visible"), ("visible book", None)],
+        )
+
+    def test_non_null_foreign_keys(self):
+        Chapter.data.create(name="c1", book=self.visible_book)
+        Chapter.data.create(name="c2", book=self.deleted_book)
+        self.deleted_book.delete()
+        self.assertEqual(Chapter.data.count(), 2)
+        # ordering or selecting a related column doesn't drop any row
+        self.assertEqual(Chapter.data.order_by("book__name").count(), 2)
+        self.assertEqual(
+            sorted(
+                Chapter.data.values_list("name", "book__name"), key=lambda row: row[0]
+            ),
+            [("c1", "visible book"), ("c2", None)],
+        )
+        self.assertEqual(
+            sorted(
+                Chapter.data.values_list("name", "book__author__name"),
+                key=lambda row: row[0],
+            ),
+            [("c1", "visible"), ("c2", None)],
+        )
+        # filtering still ignores the deleted book
+        chapters = Chapter.data.filter(book__author__name="visible")
+        self.assertEqual(list(chapters.values_list("name", flat=True)), ["c1"])
+
+    def test_select_related_still_finds_deleted_objects(self):
+        self.visible_book.author = self.deleted_author
+        self.visible_book.save()
+        book = Book.data.select_related("author").get(pk=self.visible_book.pk)
+        self.assertEqual(book.author, self.deleted_author)
+
+    def test_inherited_models(self):
+        cover = CoverBook.data.create(name="cover", author=self.visible_author)
+        cover.delete()
+        self.assertEqual(list(CoverBook.data.deleted()), [cover])
+
+
 class ModelTests(GeneralTestCase):
     def test_model_functions(self):
         self.assertEqual(str(self.visible_author), "visible")
@@ -213,6 +305,346 @@ class USerTestCase(TestCase):
         self.assertEqual(mail.outbox[0].recipients(), [self.user.email])
 
 
+class EmailUsersTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for i in range(5):
+            TestUser.data.create(username="user%s" % i, email="user%s@example.com" % i)
+        TestUser.data.create(username="nomail", email="")
+        TestUser.data.create(username="hidden", email="hidden@example.com", concealed=True)
+        TestUser.data.create(username="gone", email="gone@example.com").delete()
+
+    def test_override_address(self):
+        self.assertEqual(TestUser.data.email_users("foo", "bar"), 5)
+        self.assertEqual(len(mail.outbox), 5)
+        for message in mail.outbox:
+            self.assertEqual(message.recipients(), [settings.EMAIL_OVERRIDE_ADDRESS])
+            self.assertEqual(message.from_email, settings.DEFAULT_FROM_EMAIL)
+
+    @override_settings(EMAIL_OVERRIDE_ADDRESS=None)
+    def test_skips_deleted_and_concealed(self):
+        sent = TestUser.data.get_full_queryset().email_users("foo", "bar", chunk_size=2)
+        self.assertEqual(sent, 5)
+        self.assertEqual(
+            sorted(m.recipients()[0] for m in mail.outbox),
+            ["user%s@example.com" % i for i in range(5)],
+        )
+
+    def test_one_connection_per_chunk(self):
+        with mock.patch(
+            "django.core.mail.get_connection", wraps=mail.get_connection
+        ) as get_connection:
+            TestUser.data.email_users("foo", "bar", chunk_size=2)
+        self.assertEqual(get_connection.call_count, 3)
+
+    def test_workers(self):
+        sent = TestUser.data.filter(username__startswith="user").email_users(
+            "foo", "bar", chunk_size=1, workers=2
+        )
+        self.assertEqual(sent, 5)
+        self.assertEqual(len(mail.outbox), 5)
+
+
+class TargetedDeleteTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = TestUser.data.create(
+            username="tester", email="tester@example.com", first_name="John"
+        )
+
+    def capture(self, func):
+        with CaptureQueriesContext(connection) as context:
+            func()
+        return context.captured_queries
+
+    def test_delete_writes_less_than_save(self):
+        saved = self.capture(self.user.save)
+        deleted = self.capture(self.user.delete)
+
+        self.assertEqual(len(deleted), 1)
+        self.assertLessEqual(len(deleted), len(saved))
+        # only the deleted and modified columns are written
+        sql = deleted[0]["sql"]
+        self.assertNotIn('"username"', sql)
+        self.assertIn('"deleted"', sql)
+        self.assertIn('"modified"', sql)
+        set_clause = sql.partition(" WHERE ")[0]
+        saved_set_clause = saved[0]["sql"].partition(" WHERE ")[0]
+        self.assertLess(len(set_clause), len(saved_set_clause) / 2)
+
+        self.assertEqual(TestUser.data.count(), 0)
+        deleted_user = TestUser.data.get(pk=self.user.pk)
+        self.assertEqual(deleted_user.deleted, self.user.deleted)
+        self.assertEqual(deleted_user.modified, self.user.deleted)
+
+    def test_deleting_twice(self):
+        stale = TestUser.data.get(pk=self.user.pk)
+        self.user.delete()
+        batch = self.user.deletion_batch
+        received = []
+
+        def receiver(sender, **kwargs):
+            received.append(kwargs["signal"])
+
+        post_save.connect(receiver, sender=TestUser)
+        post_delete.connect(receiver, sender=TestUser)
+        try:
+            with self.assertNumQueries(0):
+                self.user.delete()
+            # deleted by someone else meanwhile
+            stale.delete()
+        finally:
+            post_save.disconnect(receiver, sender=TestUser)
+            post_delete.disconnect(receiver, sender=TestUser)
+
+        self.assertEqual(received, [])
+        self.assertIsNone(stale.deleted)
+        self.assertEqual(self.user.deletion_batch, batch)
+        self.assertEqual(
+            TestUser.data.get_full_queryset().get(pk=self.user.pk).deletion_batch,
+            batch,
+        )
+        self.assertEqual(TestUser.data.restore_batch(batch)[0], 1)
+
+    def test_delete_without_touching(self):
+        modified = self.user.modified
+        self.user.delete(touch=False)
+        self.assertEqual(TestUser.data.get(pk=self.user.pk).modified, modified)
+
+    def test_save_signals(self):
+        received = []
+
+        def receiver(sender, instance, update_fields, **kwargs):
+            received.append((kwargs["signal"], update_fields))
+
+        pre_save.connect(receiver, sender=TestUser)
+        post_save.connect(receiver, sender=TestUser)
+        try:
+            self.user.delete()
+            self.assertEqual(
+                received,
+                [
+                    (pre_save, frozenset(["deleted", "deletion_batch", "modified"])),
+                    (post_save, frozenset(["deleted", "deletion_batch", "modified"])),
+                ],
+            )
+
+            received.clear()
+            self.user.undelete()
+            self.user.delete(save_signals=False)
+            self.assertEqual(received, [])
+        finally:
+            pre_save.disconnect(receiver, sender=TestUser)
+            post_save.disconnect(receiver, sender=TestUser)
+
+
+class BatchDeletionTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for i in range(5):
+            Author.data.create(name="author %s" % i)
+
+    def test_deleting_in_batches(self):
+        # 3 batches with a pk query and an update each
+        with self.assertNumQueries(6):
+            self.assertEqual(Author.data.all().delete(batch_size=2), 5)
+
+        self.assertEqual(Author.data.count(), 0)
+        self.assertEqual(Author.data.deleted().count(), 5)
+        # the whole operation shares one timestamp
+        self.assertEqual(
+            Author.data.deleted().values("deleted").distinct().count(), 1
+        )
+
+    def test_batches_only_touch_matching_rows(self):
+        Author.data.filter(name__in=["author 1", "author 3"]).delete(batch_size=1)
+        self.assertEqual(
+            list(Author.data.deleted().values_list("name", flat=True)),
+            ["author 1", "author 3"],
+        )
+
+    def test_signals_are_sent_per_instance(self):
+        received = []
+
+        def receiver(sender, instance, **kwargs):
+            received.append((kwargs["signal"], instance.name))
+
+        pre_delete.connect(receiver, sender=Author)
+        post_delete.connect(receiver, sender=Author)
+        try:
+            Author.data.all().delete(batch_size=2)
+        finally:
+            pre_delete.disconnect(receiver, sender=Author)
+            post_delete.disconnect(receiver, sender=Author)
+
+        self.assertEqual(len(received), 10)
+        self.assertEqual(received[0], (pre_delete, "author 0"))
+        self.assertEqual(received[2], (post_delete, "author 0"))
+
+    def test_instances_are_not_loaded_without_receivers(self):
+        with self.assertNumQueries(1):
+            Author.data.all().delete()
+        self.assertEqual(Author.data.deleted().count(), 5)
+
+
+class CascadeTestCase(GeneralTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super(CascadeTestCase, cls).setUpTestData()
+        for book in (cls.visible_book, cls.deleted_book):
+            for i in range(3):
+                Chapter.data.create(name="chapter %s" % i, book=book)
+
+    def test_cascading_instance_deletion(self):
+        # collect the chapters, update the book and the chapters
+        with self.assertNumQueries(3):
+            self.deleted_book.delete(cascade=True)
+
+        self.assertEqual(Chapter.data.count(), 3)
+        self.assertEqual(Chapter.data.deleted().count(), 3)
+        self.assertEqual(
+            set(Chapter.data.deleted().values_list("deleted", flat=True)),
+            {self.deleted_book.deleted},
+        )
+
+    def test_cascading_queryset_deletion(self):
+        Book.data.all().delete(cascade=True)
+        self.assertEqual(Chapter.data.count(), 0)
+
+        Book.data.deleted().undelete()
+        Chapter.data.deleted().undelete()
+        Book.data.all().delete(cascade=True, batch_size=1)
+        self.assertEqual(Chapter.data.count(), 0)
+
+    def test_deletion_does_not_cascade_by_default(self):
+        self.deleted_book.delete()
+        Book.data.all().delete()
+        self.assertEqual(Chapter.data.count(), 6)
+
+    def test_set_null(self):
+        self.deleted_author.delete(cascade=True)
+        self.assertEqual(Book.data.filter(author__isnull=False).count(), 2)
+
+        self.visible_author.delete(cascade=True)
+        self.assertEqual(Book.data.filter(author__isnull=True).count(), 2)
+        self.assertEqual(Book.data.count(), 2)
+
+    def test_protect(self):
+        Chapter.data.filter(name="chapter 0").update(editor=self.visible_author)
+
+        with self.assertRaises(ProtectedError):
+            self.visible_author.delete(cascade=True)
+        with self.assertRaises(ProtectedError):
+            Author.data.all().delete(cascade=True)
+
+        self.assertEqual(Author.data.count(), 2)
+        self.assertEqual(Book.data.filter(author=self.visible_author).count(), 2)
+
+        # deleted chapters don't protect anything
+        Chapter.data.all().delete()
+        self.visible_author.delete(cascade=True)
+        self.assertEqual(Author.data.count(), 1)
+
+
+class RestoreBatchTestCase(CascadeTestCase):
+    def test_restoring_a_cascaded_deletion(self):
+        Book.data.filter(pk=self.visible_book.pk).delete(cascade=True)
+        self.deleted_book.delete(cascade=True)
+        batch = self.deleted_book.deletion_batch
+        self.assertIsNotNone(batch)
+        self.assertEqual(Chapter.data.filter(deletion_batch=batch).count(), 0)
+        self.assertEqual(Chapter.data.deleted().filter(deletion_batch=batch).count(), 3)
+
+        # one update per table plus a lookup in every archive table
+        tables = [
+            model
+            for model in apps.get_models()
+            if is_undeletable(model) and not model._meta.parents
+        ]
+        archives = [model for model in tables if model.archive_deleted]
+        with self.assertNumQueries(len(tables) + len(archives)):
+            total, per_model = Author.data.restore_batch(batch)
+        self.assertEqual(total, 4)
+        self.assertEqual(per_model, {"test_app.Book": 1, "test_app.Chapter": 3})
+
+        self.assertEqual(Book.data.count(), 1)
+        self.assertEqual(Chapter.data.count(), 3)
+        self.assertFalse(Chapter.data.filter(deletion_batch__isnull=False).exists())
+
+    def test_deleted_rows_keep_their_batch(self):
+        self.visible_author.delete()
+        batch = self.visible_author.deletion_batch
+        received = []
+
+        def receiver(sender, instance, **kwargs):
+            received.append(instance.pk)
+
+        pre_delete.connect(receiver, sender=Author)
+        try:
+            # a pk filter reaches deleted rows as well
+            self.assertEqual(Author.data.filter(pk=self.visible_author.pk).delete(), 0)
+            Author.data.get_full_queryset().delete(batch_size=1)
+        finally:
+            pre_delete.disconnect(receiver, sender=Author)
+        self.assertEqual(received, [self.deleted_author.pk])
+        self.assertEqual(Author.data.restore_batch(batch), (1, {"test_app.Author": 1}))
+
+    def test_queryset_deletion_shares_one_batch(self):
+        Author.data.all().delete(batch_size=1)
+        batches = set(Author.data.deleted().values_list("deletion_batch", flat=True))
+        self.assertEqual(len(batches), 1)
+
+        Author.data.restore_batch(batches.pop())
+        self.assertEqual(Author.data.count(), 2)
+
+    def test_undelete_resets_the_batch(self):
+        self.deleted_author.delete()
+        self.deleted_author.undelete()
+        self.assertIsNone(self.deleted_author.deletion_batch)
+        self.assertFalse(Author.data.filter(deletion_batch__isnull=False).exists())
+
+
+class LiveIndexTestCase(TestCase):
+    def live_indexes(self, model):
+        return {
+            index.name: index for index in model._meta.indexes if index.condition
+        }
+
+    def test_ordering_columns_are_indexed_for_live_rows(self):
+        indexes = self.live_indexes(Author)
+        self.assertEqual(len(indexes), 2)
+        self.assertEqual(
+            sorted(index.fields for index in indexes.values()), [["name"], ["name"]]
+        )
+
+        indexes = self.live_indexes(TestUser)
+        self.assertEqual(
+            sorted(index.fields for index in indexes.values()),
+            [["-created"], ["-created"]],
+        )
+        for name in indexes:
+            self.assertLessEqual(len(name), 30)
+
+    def test_inherited_tables_are_skipped(self):
+        self.assertEqual(self.live_indexes(CoverBook), {})
+
+    def test_indexes_dont_depend_on_the_database(self):
+        with mock.patch.object(Author._meta, "indexes", []):
+            with mock.patch.object(
+                connection.features, "supports_partial_indexes", False
+            ):
+                add_live_indexes(Author)
+            self.assertEqual(len(self.live_indexes(Author)), 2)
+
+    def test_indexes_exist_in_the_database(self):
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(
+                cursor, Book._meta.db_table
+            )
+        for name in self.live_indexes(Book):
+            self.assertIn(name, constraints)
+
+
 class AppConfigTest(TestCase):
     def test_the_config(self):
         from django.apps import apps
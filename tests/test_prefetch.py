@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Tests for the prefetches leaving out deleted related rows.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from django.test import TestCase
+
+from django_undeletable.prefetch import live_prefetches
+from test_app.models import Author, Book, Chapter
+
+
+class PrefetchLiveTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = Author.data.create(name="author")
+        cls.gone = Author.data.create(name="gone")
+        cls.hidden = Author.data.create(name="hidden", concealed=True)
+        cls.book = Book.data.create(name="book", author=cls.author)
+        Book.data.create(name="deleted book", author=cls.author).delete()
+        cls.book.co_authors.add(cls.author, cls.gone, cls.hidden)
+        Chapter.data.create(name="chapter", book=cls.book, editor=cls.gone)
+        Chapter.data.create(name="deleted chapter", book=cls.book).delete()
+        cls.gone.delete()
+
+    def test_one_query_per_level(self):
+        with self.assertNumQueries(3):
+            author = Author.data.prefetch_live("books__chapters").get(pk=self.author.pk)
+            books = list(author.books.all())
+            chapters = list(books[0].chapters.all())
+        self.assertEqual(books, [self.book])
+        self.assertEqual([c.name for c in chapters], ["chapter"])
+
+    def test_many_to_many(self):
+        with self.assertNumQueries(2):
+            book = Book.data.prefetch_live("co_authors").get(pk=self.book.pk)
+            self.assertEqual(list(book.co_authors.all()), [self.author, self.hidden])
+
+    def test_visible(self):
+        with self.assertNumQueries(2):
+            book = Book.data.prefetch_live("co_authors", visible=True).get(
+                pk=self.book.pk
+            )
+            self.assertEqual(list(book.co_authors.all()), [self.author])
+
+    def test_foreign_keys_are_selected(self):
+        with self.assertNumQueries(2):
+            book = Book.data.prefetch_live("chapters__editor").get(pk=self.book.pk)
+            # like select_related() the foreign key still finds the deleted editor
+            self.assertEqual(
+                [c.editor.name for c in book.chapters.all()], ["gone"]
+            )
+
+        with self.assertNumQueries(2):
+            chapter = Chapter.data.prefetch_live("book__co_authors").get(
+                name="chapter"
+            )
+            self.assertEqual(
+                list(chapter.book.co_authors.all()), [self.author, self.hidden]
+            )
+
+    def test_shared_levels(self):
+        select, prefetches = live_prefetches(
+            Chapter, ["book__chapters__editor", "book__chapters", "book__author"]
+        )
+        self.assertEqual(select, ["book", "book__author"])
+        self.assertEqual([p.prefetch_through for p in prefetches], ["book__chapters"])
+        self.assertEqual(prefetches[0].queryset.query.select_related, {"editor": {}})
+
+    def test_prefetch_objects(self):
+        prefetch = Prefetch("books", queryset=Book.data.get_full_queryset())
+        author = Author.data.prefetch_live(prefetch).get(pk=self.author.pk)
+        self.assertEqual(len(author.books.all()), 2)
+
+    def test_unknown_relation(self):
+        with self.assertRaises(FieldDoesNotExist):
+            Author.data.prefetch_live("name")
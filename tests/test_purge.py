@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Tests for purging soft deleted data.
+"""
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command, CommandError
+from django.test import TestCase, override_settings
+from django.utils.timezone import now
+
+from test_app.models import Author, Book
+
+
+class PurgeTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for i in range(5):
+            Author.data.create(name="author %s" % i)
+        Author.data.exclude(name="author 4").delete()
+        # three of the deletions are old enough
+        Author.data.deleted().exclude(name="author 3").update(
+            deleted=now() - timedelta(days=40)
+        )
+        Author.data.deleted().filter(name="author 0").update(
+            deleted=now() - timedelta(days=5)
+        )
+
+    def test_purging_old_deletions(self):
+        progress = []
+        count = Author.data.purge(
+            timedelta(days=30),
+            batch_size=2,
+            progress=lambda purged, last_pk: progress.append(purged),
+        )
+        self.assertEqual(count, 2)
+        self.assertEqual(progress, [2])
+        self.assertEqual(Author.data.count(), 1)
+        self.assertEqual(Author.data.deleted().count(), 2)
+
+    def test_live_data_is_never_purged(self):
+        Author.data.all().purge(timedelta(0))
+        self.assertEqual(Author.data.count(), 1)
+        self.assertEqual(Author.data.deleted().count(), 4)
+
+    def test_dry_run(self):
+        self.assertEqual(Author.data.purge(timedelta(days=1), dry_run=True), 3)
+        self.assertEqual(Author.data.deleted().count(), 4)
+
+    def test_resume(self):
+        first = Author.data.deleted().order_by("pk").first()
+        self.assertEqual(Author.data.purge(timedelta(0), after=first.pk), 3)
+        self.assertEqual(list(Author.data.deleted()), [first])
+
+    @override_settings(UNDELETABLE_RETENTION={"test_app.Author": 30})
+    def test_configured_retention(self):
+        self.assertEqual(Author.data.purge(), 2)
+
+    def test_missing_retention(self):
+        with self.assertRaises(ValueError):
+            Author.data.purge()
+
+
+class PurgeCommandTestCase(PurgeTestCase):
+    def call(self, *args, **kwargs):
+        out = StringIO()
+        call_command("purge_deleted", *args, stdout=out, **kwargs)
+        return out.getvalue()
+
+    def test_command(self):
+        output = self.call("test_app.Author", days=30, batch_size=1)
+        self.assertIn("test_app.Author: 2 rows purged", output)
+        self.assertIn("test_app.Author: 1 rows purged (last pk", output)
+        self.assertEqual(Author.data.deleted().count(), 2)
+
+    def test_command_dry_run(self):
+        output = self.call("test_app.Author", days=1, dry_run=True)
+        self.assertIn("test_app.Author: 3 rows would be purged", output)
+        self.assertEqual(Author.data.deleted().count(), 4)
+
+    @override_settings(UNDELETABLE_RETENTION={"test_app.author": 30})
+    def test_command_uses_the_retention(self):
+        Book.data.create(name="book").delete()
+        Book.data.deleted().update(deleted=now() - timedelta(days=100))
+
+        output = self.call()
+        self.assertIn("test_app.Author: 2 rows purged", output)
+        self.assertNotIn("test_app.Book", output)
+        self.assertEqual(Book.data.deleted().count(), 1)
+
+    def test_command_errors(self):
+        with self.assertRaises(CommandError):
+            self.call("test_app.Author")
+        with self.assertRaises(CommandError):
+            self.call("test_app.Author", "test_app.Book", days=1, after="1")
+        with self.assertRaises(CommandError):
+            self.call("auth.Permission", days=1)
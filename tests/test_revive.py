@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Tests for reviving deleted rows instead of creating new ones.
+"""
+from django.db import IntegrityError, models
+from django.test import TestCase
+
+from django_undeletable.signals import bulk_undeleted
+from test_app.models import Account, Author, TestUser
+
+
+class ReviveTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = Author.data.create(name="author")
+        cls.author.delete()
+
+    def test_get_or_create(self):
+        author, created = Author.data.get_or_create(name="author")
+        self.assertTrue(created)
+        author.delete()
+        self.assertEqual(Author.data.deleted().count(), 2)
+
+        with self.assertNumQueries(3):
+            author, created = Author.data.get_or_create(name="author", revive=True)
+        self.assertFalse(created)
+        # the most recently deleted one
+        self.assertNotEqual(author.pk, self.author.pk)
+        self.assertIsNone(author.deleted)
+        self.assertEqual(Author.data.deleted().count(), 1)
+
+        # live rows are simply returned
+        self.assertEqual(
+            Author.data.get_or_create(name="author", revive=True), (author, False)
+        )
+
+    def test_update_or_create(self):
+        received = []
+
+        def receiver(sender, pks, **kwargs):
+            received.append(pks)
+
+        bulk_undeleted.connect(receiver, sender=Author)
+        try:
+            author, created = Author.data.update_or_create(
+                name="author", defaults={"concealed": True}, revive=True
+            )
+        finally:
+            bulk_undeleted.disconnect(receiver, sender=Author)
+        self.assertEqual((author.pk, created, author.concealed), (self.author.pk, False, True))
+        self.assertEqual(received, [[self.author.pk]])
+
+        author, created = Author.data.update_or_create(
+            name="author", defaults={"concealed": False}, revive=True
+        )
+        self.assertEqual((author.pk, created, author.concealed), (self.author.pk, False, False))
+
+        author, created = Author.data.update_or_create(name="new", revive=True)
+        self.assertTrue(created)
+
+    def test_revive_or_create_falls_back_without_unique_lookup(self):
+        author, created = Author.data.revive_or_create(name="author")
+        self.assertEqual((author.pk, created), (self.author.pk, False))
+
+        author, created = Author.data.revive_or_create(name="other")
+        self.assertTrue(created)
+
+
+class UniqueReviveTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = TestUser.data.create(username="bob", email="bob@example.com")
+        cls.user.delete()
+
+    def test_creating_a_deleted_unique_value_fails(self):
+        with self.assertRaises(IntegrityError):
+            TestUser.data.create(username="bob")
+
+    def test_revive_or_create_upserts(self):
+        with self.assertNumQueries(2):
+            user, created = TestUser.data.revive_or_create(
+                username="bob", defaults={"email": "robert@example.com"}
+            )
+        self.assertFalse(created)
+        self.assertEqual(user.pk, self.user.pk)
+        self.assertEqual(user.email, "robert@example.com")
+        self.assertIsNone(user.deleted)
+
+        # live rows get updated
+        user, created = TestUser.data.revive_or_create(
+            username="bob", defaults={"first_name": "Bob"}
+        )
+        self.assertEqual((user.pk, created, user.first_name), (self.user.pk, False, "Bob"))
+
+        user, created = TestUser.data.revive_or_create(username="alice")
+        self.assertTrue(created)
+        self.assertEqual(TestUser.data.count(), 2)
+
+    def test_revive_or_create_with_receivers(self):
+        received = []
+
+        def receiver(sender, pks, **kwargs):
+            received.append(pks)
+
+        bulk_undeleted.connect(receiver, sender=TestUser)
+        try:
+            user, created = TestUser.data.revive_or_create(username="bob")
+        finally:
+            bulk_undeleted.disconnect(receiver, sender=TestUser)
+        self.assertEqual((user.pk, created), (self.user.pk, False))
+        self.assertEqual(received, [[self.user.pk]])
+
+
+class LiveUniqueTestCase(TestCase):
+    def test_uniqueness_is_scoped_to_live_rows(self):
+        field = Account._meta.get_field("handle")
+        self.assertFalse(field.unique)
+        self.assertTrue(field.db_index)
+        constraint = Account._meta.constraints[-1]
+        self.assertIsInstance(constraint, models.UniqueConstraint)
+        self.assertEqual(constraint.fields, ("handle",))
+
+        first = Account.data.create(handle="bob")
+        first.delete()
+        second = Account.data.create(handle="bob")
+        self.assertNotEqual(first.pk, second.pk)
+
+        with self.assertRaises(IntegrityError):
+            Account.data.create(handle="bob")
@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Tests for the bulk lifecycle signals.
+"""
+from django.test import TestCase
+
+from django_undeletable.signals import (
+    bulk_soft_deleted,
+    bulk_undeleted,
+    bulk_concealed,
+    bulk_revealed,
+)
+from test_app.models import Author, Book, Chapter, Note
+
+
+class BulkSignalTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = Author.data.create(name="author")
+        cls.books = [
+            Book.data.create(name="book %s" % i, author=cls.author) for i in range(3)
+        ]
+        cls.chapter = Chapter.data.create(name="chapter", book=cls.books[0])
+
+    def setUp(self):
+        self.received = []
+        for signal in (bulk_soft_deleted, bulk_undeleted, bulk_concealed, bulk_revealed):
+            signal.connect(self.receiver)
+            self.addCleanup(signal.disconnect, self.receiver)
+
+    def receiver(self, signal, sender, pks, using, **kwargs):
+        name = {
+            bulk_soft_deleted: "deleted",
+            bulk_undeleted: "undeleted",
+            bulk_concealed: "concealed",
+            bulk_revealed: "revealed",
+        }[signal]
+        self.received.append((name, sender, sorted(pks), using))
+        if signal is bulk_soft_deleted:
+            self.batch = kwargs["deletion_batch"]
+
+    def pks(self, *books):
+        return sorted(book.pk for book in books)
+
+    def test_queryset_operations(self):
+        with self.assertNumQueries(2):
+            Book.data.all().delete()
+        Book.data.deleted().filter(name="book 0").undelete()
+        Book.data.all().conceal()
+        Book.data.all().reveal()
+
+        everything = self.pks(*self.books)
+        self.assertEqual(
+            self.received,
+            [
+                ("deleted", Book, everything, "default"),
+                ("undeleted", Book, self.pks(self.books[0]), "default"),
+                ("concealed", Book, self.pks(self.books[0]), "default"),
+                ("revealed", Book, self.pks(self.books[0]), "default"),
+            ],
+        )
+        self.assertEqual(
+            Book.data.deleted().get(pk=everything[1]).deletion_batch, self.batch
+        )
+
+    def test_chunked_and_cascading_deletes(self):
+        Book.data.all().delete(batch_size=2, cascade=True)
+        self.assertEqual(
+            self.received,
+            [
+                ("deleted", Book, self.pks(*self.books[:2]), "default"),
+                ("deleted", Chapter, [self.chapter.pk], "default"),
+                ("deleted", Book, self.pks(self.books[2]), "default"),
+            ],
+        )
+
+        del self.received[:]
+        Book.data.restore_batch(self.batch)
+        self.assertEqual(
+            self.received,
+            [
+                ("undeleted", Book, self.pks(*self.books), "default"),
+                ("undeleted", Chapter, [self.chapter.pk], "default"),
+            ],
+        )
+
+    def test_instance_operations(self):
+        book = self.books[0]
+        book.delete()
+        book.undelete()
+        book.conceal()
+        book.conceal()
+        book.reveal()
+        self.assertEqual(
+            [name for name, sender, pks, using in self.received],
+            ["deleted", "undeleted", "concealed", "revealed"],
+        )
+
+    def test_archived_rows(self):
+        note = Note.data.create(name="note")
+        note.delete()
+        Note.data.archive()
+        del self.received[:]
+
+        Note.data.deleted(include_archived=True).undelete()
+        self.assertEqual(self.received, [("undeleted", Note, [note.pk], "default")])
+
+    async def test_async_operations(self):
+        await Book.data.filter(name="book 1").adelete()
+        await Book.data.deleted().aundelete()
+        await self.books[2].adelete()
+        self.assertEqual(
+            [(name, pks) for name, sender, pks, using in self.received],
+            [
+                ("deleted", self.pks(self.books[1])),
+                ("undeleted", self.pks(self.books[1])),
+                ("deleted", self.pks(self.books[2])),
+            ],
+        )
+
+    def test_no_extra_queries_without_receivers(self):
+        for signal in (bulk_soft_deleted, bulk_undeleted, bulk_concealed, bulk_revealed):
+            signal.disconnect(self.receiver)
+        with self.assertNumQueries(1):
+            Book.data.all().delete()
+        with self.assertNumQueries(1):
+            Book.data.deleted().undelete()
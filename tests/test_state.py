@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Tests for the compact lifecycle state column.
+"""
+from types import SimpleNamespace
+
+from django.apps import apps
+from django.db import connection
+from django.db.migrations.state import ProjectState
+from django.test import TestCase
+
+from django_undeletable.operations import BackfillState
+from django_undeletable.state import CONCEALED, DELETED, LIVE, backfill
+from test_app.models import Label
+
+
+class CompactStateTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.labels = [Label.data.create(name=name) for name in "abcd"]
+
+    def states(self):
+        return dict(Label.data.get_full_queryset().values_list("name", "state"))
+
+    def test_queries_filter_on_the_state(self):
+        sql = str(Label.data.all().query)
+        self.assertIn('"state" < 2', sql)
+        self.assertNotIn("deleted", sql.split("WHERE")[1])
+        self.assertIn('"state" = 0', str(Label.data.visible().query))
+        self.assertIn('"state" = 2', str(Label.data.deleted().query))
+
+    def test_queryset_operations(self):
+        Label.data.filter(name__in="ab").conceal()
+        Label.data.filter(name__in="bc").delete()
+        self.assertEqual(
+            self.states(), {"a": CONCEALED, "b": DELETED, "c": DELETED, "d": LIVE}
+        )
+        self.assertEqual(Label.data.count(), 2)
+        self.assertEqual([label.name for label in Label.data.visible()], ["d"])
+
+        # concealing deleted rows keeps them deleted
+        Label.data.get_full_queryset().reveal()
+        Label.data.get_full_queryset().filter(name="c").conceal()
+        self.assertEqual(
+            self.states(), {"a": LIVE, "b": DELETED, "c": DELETED, "d": LIVE}
+        )
+
+        Label.data.deleted().undelete()
+        self.assertEqual(
+            self.states(), {"a": LIVE, "b": LIVE, "c": CONCEALED, "d": LIVE}
+        )
+
+    def test_instance_operations(self):
+        label = self.labels[0]
+        label.conceal()
+        self.assertEqual((label.state, self.states()["a"]), (CONCEALED, CONCEALED))
+        label.delete()
+        self.assertEqual((label.state, self.states()["a"]), (DELETED, DELETED))
+        label.undelete()
+        self.assertEqual((label.state, self.states()["a"]), (CONCEALED, CONCEALED))
+        label.reveal()
+        self.assertEqual((label.state, self.states()["a"]), (LIVE, LIVE))
+
+        label.concealed = True
+        label.save(update_fields=["concealed"])
+        self.assertEqual(self.states()["a"], CONCEALED)
+
+        Label.data.bulk_create([Label(name="e", concealed=True)])
+        self.assertEqual(self.states()["e"], CONCEALED)
+
+    def test_archived_rows(self):
+        self.labels[0].conceal()
+        Label.data.filter(name__in="ab").delete()
+        Label.data.archive()
+        self.assertEqual(Label.data.get_full_queryset().count(), 2)
+        Label.data.deleted(include_archived=True).undelete()
+        self.assertEqual(
+            self.states(), {"a": CONCEALED, "b": LIVE, "c": LIVE, "d": LIVE}
+        )
+
+    def test_backfill(self):
+        Label.data.filter(name="a").conceal()
+        Label.data.filter(name="b").delete()
+        Label.data.get_full_queryset().update(state=LIVE)
+        self.assertEqual(backfill(Label.data.get_full_queryset(), batch_size=3), 4)
+        self.assertEqual(
+            self.states(), {"a": CONCEALED, "b": DELETED, "c": LIVE, "d": LIVE}
+        )
+
+    def test_backfill_operation(self):
+        Label.data.filter(name="b").delete()
+        Label.data.get_full_queryset().update(state=LIVE)
+        operation = BackfillState("label")
+        self.assertEqual(
+            operation.deconstruct(), ("BackfillState", [], {"model_name": "label"})
+        )
+        state = ProjectState.from_apps(apps)
+        operation.database_forwards(
+            "test_app", SimpleNamespace(connection=connection), state, state
+        )
+        self.assertEqual(self.states()["b"], DELETED)
@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Tests for the delete triggers.
+"""
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest import mock
+
+from django.apps import apps
+from django.db import NotSupportedError, connection
+from django.db.migrations.state import ProjectState
+from django.db.models.query import QuerySet
+from django.test import TestCase
+
+from django_undeletable.operations import InstallDeleteTrigger
+from django_undeletable.triggers import SQLITE_BYPASS_TABLE, install_sql
+from test_app.models import Author, Label
+
+
+class SchemaEditor(object):
+    connection = connection
+
+    def execute(self, sql, params=()):
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+
+
+class DeleteTriggerTestCase(TestCase):
+    def setUp(self):
+        self.operation = InstallDeleteTrigger("author")
+        self.state = ProjectState.from_apps(apps)
+        self.operation.database_forwards(
+            "test_app", SchemaEditor(), self.state, self.state
+        )
+        self.author = Author.data.create(name="author")
+
+    def raw_delete(self):
+        with connection.cursor() as cursor:
+            cursor.execute("DELETE FROM test_app_author WHERE id = %s", [self.author.pk])
+
+    def test_raw_deletes_become_soft_deletes(self):
+        self.raw_delete()
+        author = Author.data.get_full_queryset().get(pk=self.author.pk)
+        self.assertIsNotNone(author.deleted)
+        self.assertEqual(author.modified, author.deleted)
+        self.assertEqual(Author.data.count(), 0)
+
+        # deleted rows stay as they are
+        QuerySet(Author).all().delete()
+        self.assertEqual(
+            Author.data.get_full_queryset().get(pk=self.author.pk).deleted,
+            author.deleted,
+        )
+
+    def test_forced_deletes_bypass_the_trigger(self):
+        with mock.patch.object(Author, "delete_trigger", True):
+            Author.data.filter(pk=self.author.pk).delete(force=True)
+            self.assertFalse(Author.data.get_full_queryset().exists())
+
+            # only the forced delete
+            other = Author.data.create(name="other")
+            self.raw_delete()
+            QuerySet(Author).filter(pk=other.pk).delete()
+            self.assertIsNotNone(Author.data.deleted().get().deleted)
+
+            other.delete(force=True)
+            self.assertFalse(Author.data.get_full_queryset().exists())
+
+    def test_purge_bypasses_the_trigger(self):
+        with mock.patch.object(Author, "delete_trigger", True):
+            self.author.delete()
+            self.assertEqual(Author.data.purge(timedelta(0)), 1)
+        self.assertFalse(Author.data.get_full_queryset().exists())
+
+    def test_uninstall(self):
+        self.operation.database_backwards(
+            "test_app", SchemaEditor(), self.state, self.state
+        )
+        self.raw_delete()
+        self.assertFalse(Author.data.get_full_queryset().exists())
+        self.assertNotIn(SQLITE_BYPASS_TABLE, connection.introspection.table_names())
+
+    def test_uninstall_keeps_the_bypass_table_of_others(self):
+        label = InstallDeleteTrigger("label")
+        label.database_forwards("test_app", SchemaEditor(), self.state, self.state)
+        self.operation.database_backwards(
+            "test_app", SchemaEditor(), self.state, self.state
+        )
+        self.assertIn(SQLITE_BYPASS_TABLE, connection.introspection.table_names())
+        label.database_backwards("test_app", SchemaEditor(), self.state, self.state)
+        self.assertNotIn(SQLITE_BYPASS_TABLE, connection.introspection.table_names())
+
+    def test_sql(self):
+        self.assertEqual(
+            self.operation.deconstruct(),
+            ("InstallDeleteTrigger", [], {"model_name": "author"}),
+        )
+        postgresql = SimpleNamespace(vendor="postgresql", ops=connection.ops)
+        function, trigger = install_sql(Label, postgresql)
+        self.assertIn("current_setting('undeletable.bypass', true)", function)
+        self.assertIn("state = 2", function)
+        self.assertIn("BEFORE DELETE ON", trigger)
+
+        with self.assertRaises(NotSupportedError):
+            install_sql(Author, SimpleNamespace(vendor="mysql", ops=connection.ops))
+
+
+class MissingTriggerTestCase(TestCase):
+    def test_bypass_without_the_migration(self):
+        # delete_trigger = True, but the trigger migration hasn't run
+        with mock.patch.object(Author, "delete_trigger", True):
+            author = Author.data.create(name="author")
+            author.delete(force=True)
+        self.assertFalse(Author.data.get_full_queryset().exists())